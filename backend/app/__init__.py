@@ -2,13 +2,29 @@ from flask import Flask, jsonify, request
 from flask_cors import CORS
 from flask_migrate import Migrate
 from flasgger import Swagger
+import atexit
 import logging
+import logging.handlers
 import os
+import queue
 
+from app.cli import register_cli, running_cli_command
 from app.config import config
 from app.models import db
+from app.services.cache import analytics_cache
+from app.services.db_pools import configure_db_pools
+from app.services.events import slot_event_bus
+from app.services.replicas import replica_router
+from app.services.slow_queries import slow_query_log
 from app.services.scheduler import reservation_scheduler
 from app.utils.auth import generate_token
+from app.utils.capture import register_capture
+from app.utils.compression import register_compression
+from app.utils.logs import JsonFormatter, LazyQueueHandler, RateLimitFilter, parse_rate_limits
+from app.utils.metrics import register_metrics
+from app.utils.profiling import register_profiling
+from app.utils.tracing import register_tracing
+from app.utils.serialization import OrjsonProvider
 
 # Import blueprints
 from app.routes.areas import areas_bp
@@ -16,9 +32,14 @@ from app.routes.customers import customers_bp
 from app.routes.reservations import reservations_bp
 from app.routes.analytics import analytics_bp
 from app.routes.external import external_bp
+from app.routes.dashboard import dashboard_bp
+from app.routes.admin import admin_bp
 
 migrate = Migrate()
 
+# Thread writing the queued log records, see setup_logging
+_log_listener = None
+
 
 def create_app(config_name='default'):
     """Application factory pattern"""
@@ -27,10 +48,18 @@ def create_app(config_name='default'):
     # Load configuration
     app.config.from_object(config[config_name])
     
+    if app.config['JSON_PROVIDER'] == 'orjson':
+        app.json = OrjsonProvider(app)
+    
     # Initialize extensions
+    configure_db_pools(app)
     db.init_app(app)
+    replica_router.init_app(app)
+    slow_query_log.init_app(app)
     migrate.init_app(app, db)
     CORS(app, origins=app.config['CORS_ORIGINS'])
+    analytics_cache.init_app(app)
+    slot_event_bus.init_app(app)
     
     # Initialize Swagger
     swagger_config = {
@@ -65,7 +94,9 @@ def create_app(config_name='default'):
             {"name": "Customers", "description": "Manage customer registrations"},
             {"name": "Reservation Slots", "description": "Schedule reservation processing"},
             {"name": "Analytics", "description": "View statistics and reports"},
-            {"name": "External Integration", "description": "UiPath webhook endpoints"}
+            {"name": "External Integration", "description": "UiPath webhook endpoints"},
+            {"name": "Dashboard", "description": "Aggregated data for the admin UI"},
+            {"name": "Administration", "description": "Operational statistics"}
         ],
         "securityDefinitions": {
             "Bearer": {
@@ -135,7 +166,11 @@ def create_app(config_name='default'):
                     "response_status": {"type": "string"},
                     "response_code": {"type": "integer"},
                     "response_message": {"type": "string"},
-                    "response_payload": {"type": "object"},
+                    "response_payload": {
+                        "type": "object",
+                        "description": "additional_data sent by UiPath; in lists, large payloads are "
+                                       "{overflow_id, size} stubs, expanded by GET /api/analytics/attempts/{id}"
+                    },
                     "created_at": {"type": "string", "format": "date-time"},
                     "updated_at": {"type": "string", "format": "date-time"}
                 }
@@ -148,31 +183,59 @@ def create_app(config_name='default'):
     # Setup logging
     setup_logging(app)
     
+    # Tracing, before the scheduler starts sending
+    register_tracing(app)
+    
     # Register blueprints
     app.register_blueprint(areas_bp)
     app.register_blueprint(customers_bp)
     app.register_blueprint(reservations_bp)
     app.register_blueprint(analytics_bp)
     app.register_blueprint(external_bp)
+    app.register_blueprint(dashboard_bp)
+    app.register_blueprint(admin_bp)
     
     # Register auth routes
     register_auth_routes(app)
     
-    # Initialize scheduler
+    # Initialize scheduler; maintenance commands leave it stopped
+    if running_cli_command():
+        app.config['SCHEDULER_ENABLED'] = False
     reservation_scheduler.init_app(app)
     
     # Reschedule pending slots on startup
-    with app.app_context():
-        reservation_scheduler.reschedule_all_pending_slots()
+    if app.config['SCHEDULER_ENABLED']:
+        with app.app_context():
+            reservation_scheduler.reschedule_all_pending_slots()
     
     # Error handlers
     register_error_handlers(app)
     
+    # Prometheus metrics; registered first so its timing includes compression
+    register_metrics(app)
+    
+    # Opt-in profiling and traffic capture
+    register_profiling(app)
+    register_capture(app)
+    
+    # Response compression
+    register_compression(app)
+    
+    # flask CLI maintenance commands
+    register_cli(app)
+    
     return app
 
 
 def setup_logging(app):
-    """Configure application logging"""
+    """
+    Configure application logging
+    
+    Loggers only put records on an in-memory queue; a listener thread
+    formats them and does the file and console I/O, so a slow disk never
+    stalls a request. LOG_RATE_LIMITS caps hot-path loggers below WARNING.
+    """
+    global _log_listener
     log_level = getattr(logging, app.config['LOG_LEVEL'])
     
     # Create logs directory if it doesn't exist
@@ -180,19 +243,57 @@ def setup_logging(app):
     if log_dir and not os.path.exists(log_dir):
         os.makedirs(log_dir)
     
-    # Configure logging
-    logging.basicConfig(
-        level=log_level,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler(app.config['LOG_FILE']),
-            logging.StreamHandler()
-        ]
-    )
+    if app.config['LOG_ROTATION'] == 'size':
+        file_handler = logging.handlers.RotatingFileHandler(
+            app.config['LOG_FILE'],
+            maxBytes=app.config['LOG_MAX_BYTES'],
+            backupCount=app.config['LOG_BACKUP_COUNT']
+        )
+    elif app.config['LOG_ROTATION'] == 'time':
+        file_handler = logging.handlers.TimedRotatingFileHandler(
+            app.config['LOG_FILE'],
+            when=app.config['LOG_ROTATE_WHEN'],
+            backupCount=app.config['LOG_BACKUP_COUNT'],
+            utc=True
+        )
+    else:
+        file_handler = logging.FileHandler(app.config['LOG_FILE'])
+    
+    handlers = [file_handler, logging.StreamHandler()]
+    for handler in handlers:
+        if app.config['LOG_FORMAT'] == 'json':
+            handler.setFormatter(JsonFormatter())
+        else:
+            handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    
+    log_queue = queue.SimpleQueue()
+    queue_handler = LazyQueueHandler(log_queue)
+    queue_handler.addFilter(RateLimitFilter(parse_rate_limits(app.config['LOG_RATE_LIMITS'])))
+    
+    # Replace the pipeline of a previous create_app() in this process
+    root = logging.getLogger()
+    _stop_log_listener()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+    
+    root.addHandler(queue_handler)
+    root.setLevel(log_level)
+    _log_listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _log_listener.start()
     
     app.logger.setLevel(log_level)
 
 
+@atexit.register
+def _stop_log_listener():
+    """Write out the queued records"""
+    global _log_listener
+    if _log_listener is not None:
+        _log_listener.stop()
+        _log_listener = None
+
+
 def register_auth_routes(app):
     """Register authentication routes"""
     
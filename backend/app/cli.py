@@ -0,0 +1,111 @@
+import click
+from flask import current_app
+from datetime import datetime
+import sys
+
+import orjson
+
+from app.models import db, Area
+from app.services.partitions import (
+    archive_attempt_partitions,
+    create_attempt_partitions,
+    iter_archived_attempts,
+    list_attempt_partitions
+)
+from app.schema_updates import apply_schema_updates
+from app.services.synthetic import generate, truncate
+
+
+def _month(value):
+    return datetime.strptime(value, '%Y-%m').date() if value else None
+
+
+def running_cli_command() -> bool:
+    """
+    Whether the app is being loaded for a ``flask`` command other than
+    ``run`` (init-db, seed-synthetic, ...): such processes end with the
+    command, so they must not start background jobs
+    """
+    ctx = click.get_current_context(silent=True)
+    return ctx is not None and ctx.info_name != 'run'
+
+
+def register_cli(app):
+    """Register the ``flask`` maintenance commands"""
+    
+    @app.cli.command('init-db')
+    def init_db_command():
+        """Create missing tables and apply the idempotent schema updates"""
+        db.create_all()
+        apply_schema_updates()
+        click.echo('Database schema is up to date')
+    
+    @app.cli.command('attempt-partitions')
+    def attempt_partitions_command():
+        """Create upcoming reservation_attempts partitions and list them"""
+        create_attempt_partitions()
+        for name, month in list_attempt_partitions():
+            click.echo(f"{month:%Y-%m}  {name}")
+    
+    @app.cli.command('archive-attempts')
+    def archive_attempts_command():
+        """Archive and drop partitions older than ATTEMPT_RETENTION_MONTHS"""
+        archived = archive_attempt_partitions()
+        click.echo(f"Archived {archived} partitions to {current_app.config['ATTEMPT_ARCHIVE_DIR']}")
+    
+    @app.cli.command('query-archived-attempts')
+    @click.option('--archive-dir', help='Defaults to ATTEMPT_ARCHIVE_DIR')
+    @click.option('--from-month', help='First month, YYYY-MM')
+    @click.option('--to-month', help='Last month, YYYY-MM')
+    @click.option('--national-id', help='Customer national ID')
+    @click.option('--customer-id', type=int)
+    @click.option('--slot-id', type=int, help='Reservation slot ID')
+    @click.option('--area-id', type=int)
+    @click.option('--status', type=click.Choice(['SUCCESS', 'FAILED']), help='Response status')
+    @click.option('--limit', type=int, default=0, help='Stop after this many rows (0: no limit)')
+    def query_archived_attempts_command(archive_dir, from_month, to_month, national_id,
+                                        customer_id, slot_id, area_id, status, limit):
+        """Print archived reservation attempts as NDJSON; needs no database"""
+        filters = {
+            'customer_national_id': national_id,
+            'customer_id': customer_id,
+            'reservation_slot_id': slot_id,
+            'area_id': area_id,
+            'response_status': status
+        }
+        rows = iter_archived_attempts(
+            archive_dir or current_app.config['ATTEMPT_ARCHIVE_DIR'],
+            from_month=_month(from_month),
+            to_month=_month(to_month),
+            filters={field: value for field, value in filters.items() if value is not None}
+        )
+        
+        for count, row in enumerate(rows, start=1):
+            sys.stdout.buffer.write(orjson.dumps(row) + b'\n')
+            if limit and count >= limit:
+                break
+    
+    @app.cli.command('seed-synthetic')
+    @click.option('--areas', type=int, default=200)
+    @click.option('--customers', type=int, default=1_000_000)
+    @click.option('--attempts', type=int, default=10_000_000)
+    @click.option('--days', type=int, default=180, help='Days of slot history, ending today')
+    @click.option('--slots-per-day', type=int, default=4)
+    @click.option('--seed', type=int, default=1, help='Same seed and sizes, same data')
+    @click.option('--chunk-rows', type=int, default=100_000, help='Rows per COPY')
+    @click.option('--truncate', 'replace', is_flag=True, help='Empty the tables first; required when they hold data')
+    def seed_synthetic_command(areas, customers, attempts, days, slots_per_day, seed, chunk_rows, replace):
+        """Bulk-load a synthetic dataset for load testing and reproductions"""
+        if replace:
+            truncate()
+        elif db.session.query(Area.query.exists()).scalar():
+            raise click.ClickException('The tables already hold data; pass --truncate to replace it')
+        
+        try:
+            counts = generate(
+                areas=areas, customers=customers, attempts=attempts, days=days,
+                slots_per_day=slots_per_day, seed=seed, chunk_rows=chunk_rows, progress=click.echo
+            )
+        except ValueError as e:
+            raise click.UsageError(str(e))
+        click.echo(', '.join(f"{count} {table}" for table, count in counts.items()))
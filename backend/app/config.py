@@ -12,6 +12,28 @@ class Config:
     )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # Connection pools, per worker process: the web tier (and each replica)
+    # and the scheduler jobs get separate pools, see app/services/db_pools.py.
+    # DB_PGBOUNCER=true leaves pooling to PgBouncer in transaction mode;
+    # DATABASE_DIRECT_URL then bypasses it for the LISTEN connection.
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 10))
+    DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', 10))
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))
+    DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'True').lower() == 'true'
+    SCHEDULER_DB_POOL_SIZE = int(os.getenv('SCHEDULER_DB_POOL_SIZE', 2))
+    SCHEDULER_DB_MAX_OVERFLOW = int(os.getenv('SCHEDULER_DB_MAX_OVERFLOW', 5))
+    DB_PGBOUNCER = os.getenv('DB_PGBOUNCER', 'False').lower() == 'true'
+    DATABASE_DIRECT_URL = os.getenv('DATABASE_DIRECT_URL', '')
+    
+    # Read replicas, comma separated. GET requests read from a replica whose
+    # replay lag is within REPLICA_MAX_LAG_SECONDS (capped at
+    # SYNC_OVERLAP_SECONDS) and that has replayed the client's last write.
+    SQLALCHEMY_REPLICA_URIS = [url for url in os.getenv('DATABASE_REPLICA_URLS', '').split(',') if url]
+    SQLALCHEMY_BINDS = {f'replica_{index}': url for index, url in enumerate(SQLALCHEMY_REPLICA_URIS)}
+    REPLICA_MAX_LAG_SECONDS = float(os.getenv('REPLICA_MAX_LAG_SECONDS', 5))
+    REPLICA_CHECK_SECONDS = float(os.getenv('REPLICA_CHECK_SECONDS', 2))
+    
     # UiPath API Configuration
     UIPATH_API_URL = os.getenv('UIPATH_API_URL', 'https://api.uipath.com/endpoint')
     UIPATH_API_KEY = os.getenv('UIPATH_API_KEY', '')
@@ -27,15 +49,147 @@ class Config:
     JWT_ACCESS_TOKEN_EXPIRES = 3600  # 1 hour
     
     # Scheduler Configuration
+    # Run slot dispatch and maintenance jobs in this process (never during
+    # flask maintenance commands such as init-db)
+    SCHEDULER_ENABLED = os.getenv('SCHEDULER_ENABLED', 'True').lower() == 'true'
     SCHEDULER_API_ENABLED = True
     SCHEDULER_TIMEZONE = 'Asia/Riyadh'
     
+    # Area status counters (served by /api/analytics/summary)
+    STATUS_COUNTS_COMPACT_SECONDS = int(os.getenv('STATUS_COUNTS_COMPACT_SECONDS', 60))
+    STATUS_COUNTS_RECONCILE_MINUTES = int(os.getenv('STATUS_COUNTS_RECONCILE_MINUTES', 30))
+    
+    # Attempt throughput rollups (served by /api/analytics/timeseries)
+    ATTEMPT_ROLLUPS_COMPACT_SECONDS = int(os.getenv('ATTEMPT_ROLLUPS_COMPACT_SECONDS', 60))
+    
+    # Processed slots older than this are final; their latency stats are cached
+    LATENCY_SETTLE_MINUTES = int(os.getenv('LATENCY_SETTLE_MINUTES', 60))
+    
+    # How often slot reports pick up newly received webhook responses
+    SLOT_REPORT_REFRESH_SECONDS = int(os.getenv('SLOT_REPORT_REFRESH_SECONDS', 10))
+    
+    # Analytics response cache: memory (per process), filesystem (shared by
+    # the workers of one host), redis (any Redis-compatible server) or none
+    ANALYTICS_CACHE_BACKEND = os.getenv('ANALYTICS_CACHE_BACKEND', 'memory')
+    ANALYTICS_CACHE_TTL = int(os.getenv('ANALYTICS_CACHE_TTL', 15))
+    ANALYTICS_CACHE_MAX_ENTRIES = int(os.getenv('ANALYTICS_CACHE_MAX_ENTRIES', 1000))
+    ANALYTICS_CACHE_DIR = os.getenv('ANALYTICS_CACHE_DIR', '/tmp/hedri-sakni-cache')
+    ANALYTICS_CACHE_REDIS_URL = os.getenv('ANALYTICS_CACHE_REDIS_URL', 'redis://localhost:6379/0')
+    
+    # Live slot events: postgres (LISTEN/NOTIFY, reaches every worker) or
+    # memory (single process only)
+    EVENT_BUS_BACKEND = os.getenv('EVENT_BUS_BACKEND', 'postgres')
+    # With postgres, committed events are sent in batches this often (ms) from
+    # one connection per process: a NOTIFY holds a database-wide lock while
+    # its transaction commits, which would serialize the webhook commits
+    EVENT_BUS_FLUSH_MS = int(os.getenv('EVENT_BUS_FLUSH_MS', 100))
+    EVENT_STREAM_MAX_SECONDS = int(os.getenv('EVENT_STREAM_MAX_SECONDS', 300))
+    EVENT_STREAM_HEARTBEAT_SECONDS = int(os.getenv('EVENT_STREAM_HEARTBEAT_SECONDS', 15))
+    # Lifetime of the single-slot tokens passed to event streams in the URL
+    EVENT_STREAM_TOKEN_SECONDS = int(os.getenv('EVENT_STREAM_TOKEN_SECONDS', 60))
+    
+    # JSON encoder for responses: orjson or default (Flask's json module)
+    JSON_PROVIDER = os.getenv('JSON_PROVIDER', 'orjson')
+    
+    # Response compression (brotli when the Brotli package is installed, else gzip)
+    COMPRESSION_ENABLED = os.getenv('COMPRESSION_ENABLED', 'True').lower() == 'true'
+    COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', 1024))
+    COMPRESSION_GZIP_LEVEL = int(os.getenv('COMPRESSION_GZIP_LEVEL', 6))
+    COMPRESSION_BROTLI_QUALITY = int(os.getenv('COMPRESSION_BROTLI_QUALITY', 4))
+    
+    # How often the per-table change counters behind ETags are folded
+    TABLE_VERSIONS_COMPACT_SECONDS = int(os.getenv('TABLE_VERSIONS_COMPACT_SECONDS', 60))
+    
+    # Delta sync (?updated_since=&cursor=) on customers, slots and attempts
+    SYNC_PAGE_SIZE = int(os.getenv('SYNC_PAGE_SIZE', 500))
+    SYNC_MAX_PAGE_SIZE = int(os.getenv('SYNC_MAX_PAGE_SIZE', 5000))
+    SYNC_OVERLAP_SECONDS = int(os.getenv('SYNC_OVERLAP_SECONDS', 60))
+    SYNC_TOMBSTONE_RETENTION_DAYS = int(os.getenv('SYNC_TOMBSTONE_RETENTION_DAYS', 7))
+    
+    # Dashboard bootstrap list sizes
+    DASHBOARD_UPCOMING_SLOTS = int(os.getenv('DASHBOARD_UPCOMING_SLOTS', 20))
+    DASHBOARD_RECENT_ATTEMPTS = int(os.getenv('DASHBOARD_RECENT_ATTEMPTS', 20))
+    
+    # Matches ranked per customer search query
+    CUSTOMER_SEARCH_MAX_CANDIDATES = int(os.getenv('CUSTOMER_SEARCH_MAX_CANDIDATES', 2000))
+    
+    # Area deletion: larger areas are deleted in chunks by a background job
+    AREA_DELETE_INLINE_MAX_CUSTOMERS = int(os.getenv('AREA_DELETE_INLINE_MAX_CUSTOMERS', 5000))
+    AREA_DELETE_CHUNK_SIZE = int(os.getenv('AREA_DELETE_CHUNK_SIZE', 5000))
+    AREA_DELETE_STALE_SECONDS = int(os.getenv('AREA_DELETE_STALE_SECONDS', 300))
+    
+    # reservation_attempts monthly partitions; expired months are archived to
+    # ATTEMPT_ARCHIVE_DIR as zstd (or gzip) NDJSON and dropped (0 keeps all)
+    ATTEMPT_PARTITION_MONTHS_AHEAD = int(os.getenv('ATTEMPT_PARTITION_MONTHS_AHEAD', 2))
+    ATTEMPT_RETENTION_MONTHS = int(os.getenv('ATTEMPT_RETENTION_MONTHS', 12))
+    ATTEMPT_ARCHIVE_DIR = os.getenv('ATTEMPT_ARCHIVE_DIR', 'archives')
+    ATTEMPT_ARCHIVE_ZSTD_LEVEL = int(os.getenv('ATTEMPT_ARCHIVE_ZSTD_LEVEL', 10))
+    
+    # Attempt payloads larger than this (JSON bytes) are compressed into
+    # payload_overflow; additional_data keys to GIN index, comma separated
+    PAYLOAD_MAX_BYTES = int(os.getenv('PAYLOAD_MAX_BYTES', 2048))
+    PAYLOAD_INDEXED_KEYS = [key for key in os.getenv('PAYLOAD_INDEXED_KEYS', '').split(',') if key]
+    
+    # Prometheus /metrics; when set, scrapes must send it as a bearer token
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+    
+    # Tracing exporters, comma separated: file, console, otlp or a
+    # module:factory path (empty disables tracing). New traces are sampled at
+    # TRACING_SAMPLE_RATIO, at most TRACING_MAX_TRACES_PER_SECOND per worker
+    # (0 for no limit).
+    TRACING_EXPORTERS = os.getenv('TRACING_EXPORTERS', '')
+    TRACING_FILE = os.getenv('TRACING_FILE', 'logs/traces.jsonl')
+    TRACING_SERVICE_NAME = os.getenv('TRACING_SERVICE_NAME', 'hedri-sakni-backend')
+    TRACING_SAMPLE_RATIO = float(os.getenv('TRACING_SAMPLE_RATIO', 1.0))
+    TRACING_MAX_TRACES_PER_SECOND = float(os.getenv('TRACING_MAX_TRACES_PER_SECOND', 10))
+    
+    # Profiles (sampled stacks, SQL timing, tracemalloc) written to
+    # PROFILING_DIR for every request / slot dispatch when switched on, or
+    # for single requests sent by an admin with an X-Profile: 1 header
+    PROFILING_DIR = os.getenv('PROFILING_DIR', 'logs/profiles')
+    PROFILING_REQUESTS = os.getenv('PROFILING_REQUESTS', 'False').lower() == 'true'
+    PROFILING_JOBS = os.getenv('PROFILING_JOBS', 'False').lower() == 'true'
+    PROFILING_INTERVAL_MS = float(os.getenv('PROFILING_INTERVAL_MS', 5))
+    PROFILING_MEMORY = os.getenv('PROFILING_MEMORY', 'True').lower() == 'true'
+    
+    # Statements slower than SLOW_QUERY_MS (0 disables) are logged and stored
+    # in slow_queries, with their plan when SLOW_QUERY_EXPLAIN is on
+    SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', 500))
+    SLOW_QUERY_EXPLAIN = os.getenv('SLOW_QUERY_EXPLAIN', 'True').lower() == 'true'
+    SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS = int(os.getenv('SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS', 300))
+    SLOW_QUERY_EXPLAIN_TIMEOUT_MS = int(os.getenv('SLOW_QUERY_EXPLAIN_TIMEOUT_MS', 30000))
+    SLOW_QUERY_RETENTION_DAYS = int(os.getenv('SLOW_QUERY_RETENTION_DAYS', 14))
+    
+    # Requests to TRAFFIC_CAPTURE_PATHS (path prefixes) recorded, credentials
+    # removed, to TRAFFIC_CAPTURE_DIR for replay with benchmarks/replay.py
+    TRAFFIC_CAPTURE = os.getenv('TRAFFIC_CAPTURE', 'False').lower() == 'true'
+    TRAFFIC_CAPTURE_DIR = os.getenv('TRAFFIC_CAPTURE_DIR', 'logs/capture')
+    TRAFFIC_CAPTURE_PATHS = os.getenv(
+        'TRAFFIC_CAPTURE_PATHS',
+        '/api/external/update,/api/areas,/api/customers,/api/reservations,/api/analytics,/api/dashboard,/api/admin'
+    )
+    TRAFFIC_CAPTURE_MAX_BODY_BYTES = int(os.getenv('TRAFFIC_CAPTURE_MAX_BODY_BYTES', 65536))
+    TRAFFIC_CAPTURE_MAX_FILE_MB = int(os.getenv('TRAFFIC_CAPTURE_MAX_FILE_MB', 100))
+    
     # CORS
     CORS_ORIGINS = os.getenv('CORS_ORIGINS', 'http://localhost:5173').split(',')
     
     # Logging
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
     LOG_FILE = os.getenv('LOG_FILE', 'logs/app.log')
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')  # json or text
+    # none (default), size (LOG_MAX_BYTES) or time (LOG_ROTATE_WHEN, e.g. midnight).
+    # Rollovers are not coordinated between processes: only pick size or time
+    # with a single process; otherwise rotate externally (logrotate copytruncate).
+    LOG_ROTATION = os.getenv('LOG_ROTATION', 'none')
+    LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024))
+    LOG_ROTATE_WHEN = os.getenv('LOG_ROTATE_WHEN', 'midnight')
+    LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', 5))
+    # Records per second let through below WARNING, as logger=rate,...
+    LOG_RATE_LIMITS = os.getenv(
+        'LOG_RATE_LIMITS',
+        'app.services.uipath_client.requests=20,app.services.scheduler.dispatch=20,app.routes.external.updates=20'
+    )
 
 
 class DevelopmentConfig(Config):
@@ -1,7 +1,28 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import DDL, event
+from sqlalchemy.dialects.postgresql import JSONB
 from datetime import datetime
 
-db = SQLAlchemy()
+from app.utils.db_routing import RoutingSession
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+# Search form of Arabic text: diacritics and tatweel removed, alef/hamza
+# variants folded to bare alef, taa marbuta to haa, alef maqsura to yaa,
+# Arabic-Indic digits to ASCII, lowercased, whitespace collapsed. IMMUTABLE so
+# it can back a generated column and be constant-folded on query arguments.
+NORMALIZE_ARABIC_FUNCTION = r"""
+CREATE OR REPLACE FUNCTION normalize_arabic(value text) RETURNS text AS $$
+    SELECT btrim(regexp_replace(
+        translate(
+            regexp_replace(lower(value), '[\u064B-\u065F\u0670\u0640]', '', 'g'),
+            'أإآٱىةؤئ٠١٢٣٤٥٦٧٨٩',
+            'اااايهوي0123456789'
+        ),
+        '\s+', ' ', 'g'
+    ))
+$$ LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE
+"""
 
 
 class Area(db.Model):
@@ -17,8 +38,10 @@ class Area(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
-    customers = db.relationship('Customer', back_populates='area', cascade='all, delete-orphan')
-    reservation_slots = db.relationship('ReservationSlot', back_populates='area', cascade='all, delete-orphan')
+    # Children are removed by ON DELETE CASCADE foreign keys; passive_deletes
+    # keeps the ORM from loading them just to delete them row by row
+    customers = db.relationship('Customer', back_populates='area', cascade='all, delete-orphan', passive_deletes=True)
+    reservation_slots = db.relationship('ReservationSlot', back_populates='area', cascade='all, delete-orphan', passive_deletes=True)
     
     def to_dict(self):
         return {
@@ -40,18 +63,19 @@ class Customer(db.Model):
     name = db.Column(db.String(200), nullable=False)  # الاسم
     phone_number = db.Column(db.String(20), nullable=False)  # رقم الهاتف
     national_id = db.Column(db.String(50), nullable=False, unique=True)  # الرقم الوطني
-    area_id = db.Column(db.Integer, db.ForeignKey('areas.id'), nullable=False)  # المنطقة
+    area_id = db.Column(db.Integer, db.ForeignKey('areas.id', ondelete='CASCADE'), nullable=False, index=True)  # المنطقة
     reservation_status = db.Column(
         db.String(20), 
         nullable=False, 
         default='OPEN'
     )  # حالة الحجز (OPEN, SUCCESS, FAILED)
+    name_normalized = db.Column(db.Text, db.Computed('normalize_arabic(name)', persisted=True))  # search only
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
     area = db.relationship('Area', back_populates='customers')
-    reservation_attempts = db.relationship('ReservationAttempt', back_populates='customer', cascade='all, delete-orphan')
+    reservation_attempts = db.relationship('ReservationAttempt', back_populates='customer', cascade='all, delete-orphan', passive_deletes=True)
     
     def to_dict(self):
         return {
@@ -67,12 +91,16 @@ class Customer(db.Model):
         }
 
 
+# The generated column needs the function to exist when create_all builds the table
+event.listen(Customer.__table__, 'before_create', DDL(NORMALIZE_ARABIC_FUNCTION))
+
+
 class ReservationSlot(db.Model):
     """Reservation slots per area with scheduled date and time"""
     __tablename__ = 'reservation_slots'
     
     id = db.Column(db.Integer, primary_key=True)
-    area_id = db.Column(db.Integer, db.ForeignKey('areas.id'), nullable=False)
+    area_id = db.Column(db.Integer, db.ForeignKey('areas.id', ondelete='CASCADE'), nullable=False, index=True)
     scheduled_datetime = db.Column(db.DateTime, nullable=False)
     is_processed = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -80,7 +108,7 @@ class ReservationSlot(db.Model):
     
     # Relationships
     area = db.relationship('Area', back_populates='reservation_slots')
-    reservation_attempts = db.relationship('ReservationAttempt', back_populates='reservation_slot', cascade='all, delete-orphan')
+    reservation_attempts = db.relationship('ReservationAttempt', back_populates='reservation_slot', cascade='all, delete-orphan', passive_deletes=True)
     
     def to_dict(self):
         return {
@@ -95,27 +123,39 @@ class ReservationSlot(db.Model):
 
 
 class ReservationAttempt(db.Model):
-    """Tracks reservation attempts and responses from external API"""
+    """
+    Tracks reservation attempts and responses from external API.
+    
+    The table is partitioned by month on ``created_at`` (partitions are
+    managed by app/services/partitions.py), so the primary key has to include
+    it; the mapper still identifies rows by ``id`` alone.
+    """
     __tablename__ = 'reservation_attempts'
+    __table_args__ = (
+        db.PrimaryKeyConstraint('id', 'created_at'),
+        {'postgresql_partition_by': 'RANGE (created_at)'},
+    )
     
-    id = db.Column(db.Integer, primary_key=True)
-    customer_id = db.Column(db.Integer, db.ForeignKey('customers.id'), nullable=False)
-    reservation_slot_id = db.Column(db.Integer, db.ForeignKey('reservation_slots.id'), nullable=False)
+    id = db.Column(db.Integer, autoincrement=True)
+    customer_id = db.Column(db.Integer, db.ForeignKey('customers.id', ondelete='CASCADE'), nullable=False, index=True)
+    reservation_slot_id = db.Column(db.Integer, db.ForeignKey('reservation_slots.id', ondelete='CASCADE'), nullable=False)
     
     # Request data
     request_sent_at = db.Column(db.DateTime)
-    request_payload = db.Column(db.JSON)
+    request_payload = db.Column(JSONB)  # see app/services/payloads.py
     
     # Response data
     response_received_at = db.Column(db.DateTime)
     response_status = db.Column(db.String(20))  # SUCCESS, FAILED
     response_code = db.Column(db.Integer)
     response_message = db.Column(db.Text)  # Stored exactly as received
-    response_payload = db.Column(db.JSON)  # Full response for traceability
+    response_payload = db.Column(JSONB)  # Data not already held in the response_* columns
     
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # partition key
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __mapper_args__ = {'primary_key': [id]}
+    
     # Relationships
     customer = db.relationship('Customer', back_populates='reservation_attempts')
     reservation_slot = db.relationship('ReservationSlot', back_populates='reservation_attempts')
@@ -139,3 +179,197 @@ class ReservationAttempt(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
+
+
+class PayloadOverflow(db.Model):
+    """
+    Reservation attempt payloads larger than PAYLOAD_MAX_BYTES, compressed.
+    The attempt's payload column then holds ``{"overflow_id": id, "size": n}``.
+    
+    The foreign key to the partitioned reservation_attempts (id, created_at)
+    is added by app/schema_updates.py, after the table has been partitioned.
+    """
+    __tablename__ = 'payload_overflow'
+    __table_args__ = (
+        db.Index('ix_payload_overflow_attempt', 'attempt_id', 'attempt_created_at'),
+    )
+    
+    id = db.Column(db.BigInteger, primary_key=True)
+    attempt_id = db.Column(db.Integer, nullable=False)
+    attempt_created_at = db.Column(db.DateTime, nullable=False)
+    field = db.Column(db.String(32), nullable=False)  # request_payload, response_payload
+    codec = db.Column(db.String(10), nullable=False)  # zstd, zlib
+    size = db.Column(db.Integer, nullable=False)  # uncompressed JSON bytes
+    data = db.Column(db.LargeBinary, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class AreaStatusCount(db.Model):
+    """
+    Incrementally maintained customer counts per area and reservation status.
+    
+    Rows are signed deltas appended by triggers on ``customers`` (see
+    ``app/schema_updates.py``), so concurrent writers never contend on a
+    shared counter row. The maintenance job folds them back into a single
+    row per (area_id, reservation_status); readers simply ``SUM(count)``.
+    """
+    __tablename__ = 'area_status_counts'
+    
+    id = db.Column(db.BigInteger, primary_key=True)
+    area_id = db.Column(db.Integer, nullable=False, index=True)
+    reservation_status = db.Column(db.String(20), nullable=False)
+    count = db.Column(db.BigInteger, nullable=False, default=0)
+
+
+class AttemptRollup(db.Model):
+    """
+    Per-minute reservation attempt throughput per area and slot.
+    
+    Like ``AreaStatusCount`` the rows are signed deltas appended by triggers on
+    ``reservation_attempts``; ``compacted`` marks rows already folded by the
+    maintenance job so it only has to revisit freshly touched buckets.
+    """
+    __tablename__ = 'attempt_rollups'
+    __table_args__ = (
+        db.Index('ix_attempt_rollups_bucket_slot', 'bucket_start', 'reservation_slot_id'),
+        db.Index(
+            'ix_attempt_rollups_pending',
+            'id',
+            postgresql_where=db.text('NOT compacted')
+        ),
+    )
+    
+    id = db.Column(db.BigInteger, primary_key=True)
+    bucket_start = db.Column(db.DateTime, nullable=False)  # minute, UTC
+    area_id = db.Column(db.Integer)
+    reservation_slot_id = db.Column(db.Integer)
+    attempts_sent = db.Column(db.BigInteger, nullable=False, default=0)
+    responses_received = db.Column(db.BigInteger, nullable=False, default=0)
+    success_count = db.Column(db.BigInteger, nullable=False, default=0)
+    failed_count = db.Column(db.BigInteger, nullable=False, default=0)
+    compacted = db.Column(db.Boolean, nullable=False, default=False)
+
+
+class SlotReport(db.Model):
+    """Frozen per-slot outcome report, written when dispatch finishes and refreshed as webhooks arrive"""
+    __tablename__ = 'slot_reports'
+    
+    reservation_slot_id = db.Column(
+        db.Integer,
+        db.ForeignKey('reservation_slots.id', ondelete='CASCADE'),
+        primary_key=True
+    )
+    
+    # Dispatch outcome, fixed once the slot has been processed
+    customers_targeted = db.Column(db.Integer, nullable=False, default=0)
+    requests_sent = db.Column(db.Integer, nullable=False, default=0)
+    send_failures = db.Column(db.Integer, nullable=False, default=0)
+    first_sent_at = db.Column(db.DateTime)
+    last_sent_at = db.Column(db.DateTime)
+    completed_at = db.Column(db.DateTime)
+    
+    # Webhook outcome, refreshed by the maintenance job
+    responses_received = db.Column(db.Integer, nullable=False, default=0)
+    success_count = db.Column(db.Integer, nullable=False, default=0)
+    failed_count = db.Column(db.Integer, nullable=False, default=0)
+    response_codes = db.Column(db.JSON)  # {"<response_code>": count}
+    latency = db.Column(db.JSON)  # {"round_trip": {...}, "dispatch_delay": {...}}
+    refreshed_at = db.Column(db.DateTime)
+    
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Relationships
+    reservation_slot = db.relationship('ReservationSlot')
+
+
+class TableVersion(db.Model):
+    """
+    Change counters of the tables behind cacheable GET routes.
+    
+    Every write statement on a tracked table appends a row through a
+    statement-level trigger (see ``app/schema_updates.py``); a table's
+    version is ``SUM(changes)``. Appending instead of incrementing one row
+    keeps concurrent writers from queueing on a shared counter, and the
+    maintenance job folds the rows back into one per table.
+    """
+    __tablename__ = 'table_versions'
+    
+    id = db.Column(db.BigInteger, primary_key=True)
+    table_name = db.Column(db.String(63), nullable=False, index=True)
+    changes = db.Column(db.BigInteger, nullable=False, default=1)
+
+
+class DeletedRow(db.Model):
+    """Tombstones of deleted rows, recorded by triggers for delta sync clients"""
+    __tablename__ = 'deleted_rows'
+    __table_args__ = (
+        db.Index('ix_deleted_rows_table_deleted_at', 'table_name', 'deleted_at'),
+    )
+    
+    id = db.Column(db.BigInteger, primary_key=True)
+    table_name = db.Column(db.String(63), nullable=False)
+    row_id = db.Column(db.Integer, nullable=False)
+    deleted_at = db.Column(db.DateTime, nullable=False)  # UTC, same clock as updated_at
+
+
+class AreaDeletion(db.Model):
+    """Progress of an area deleted in chunks by a background job"""
+    __tablename__ = 'area_deletions'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    area_id = db.Column(db.Integer, nullable=False)  # no FK, the area goes away
+    area_name = db.Column(db.String(200), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='PENDING')  # PENDING, RUNNING, DONE, FAILED
+    deleted_attempts = db.Column(db.BigInteger, nullable=False, default=0)
+    deleted_customers = db.Column(db.BigInteger, nullable=False, default=0)
+    deleted_slots = db.Column(db.BigInteger, nullable=False, default=0)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'area_id': self.area_id,
+            'area_name': self.area_name,
+            'status': self.status,
+            'deleted_attempts': self.deleted_attempts,
+            'deleted_customers': self.deleted_customers,
+            'deleted_slots': self.deleted_slots,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+
+class SlowQuery(db.Model):
+    """Statements slower than SLOW_QUERY_MS, see ``app/services/slow_queries.py``"""
+    __tablename__ = 'slow_queries'
+    __table_args__ = (
+        db.Index('ix_slow_queries_fingerprint_created_at', 'fingerprint', 'created_at'),
+    )
+    
+    id = db.Column(db.BigInteger, primary_key=True)
+    fingerprint = db.Column(db.String(16), nullable=False)
+    statement = db.Column(db.Text, nullable=False)
+    parameters = db.Column(JSONB)  # types and lengths only, never values
+    source = db.Column(db.String(200))  # 'GET /api/analytics/attempts' or 'job:<name>'
+    pool = db.Column(db.String(63))
+    duration_ms = db.Column(db.Float, nullable=False)
+    plan = db.Column(JSONB)  # EXPLAIN (FORMAT JSON) output
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'statement': self.statement,
+            'parameters': self.parameters,
+            'source': self.source,
+            'pool': self.pool,
+            'duration_ms': round(self.duration_ms, 1),
+            'plan': self.plan,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
@@ -0,0 +1,149 @@
+from flask import Blueprint, jsonify, request, send_from_directory
+from flasgger import swag_from
+
+from app.models import db
+from app.services.db_pools import db_pool_stats
+from app.services.slow_queries import ORDERS, worst_slow_queries
+from app.utils.auth import token_required
+from app.utils.profiling import list_profiles, profile_directory
+
+admin_bp = Blueprint('admin', __name__, url_prefix='/api/admin')
+
+
+@admin_bp.route('/db-pools', methods=['GET'])
+@token_required
+@swag_from({
+    'tags': ['Administration'],
+    'security': [{'Bearer': []}],
+    'summary': 'Get database connection pool statistics',
+    'description': 'Occupancy, checkout wait times and connection churn of each pool (web, scheduler, '
+                   'listener, replica_N) of the worker process that served the request. saturation is '
+                   'checked_out / (pool size + max overflow); checkout waits are counted in the '
+                   'lowest bucket (upper bound in seconds) they fit.',
+    'responses': {
+        200: {
+            'description': 'Pool statistics',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'success': {'type': 'boolean'},
+                    'data': {
+                        'type': 'object',
+                        'properties': {
+                            'pid': {'type': 'integer'},
+                            'pools': {'type': 'object'}
+                        }
+                    }
+                }
+            }
+        }
+    }
+})
+def get_db_pools():
+    """Get connection pool statistics of this worker process"""
+    return jsonify({
+        'success': True,
+        'data': db_pool_stats(db.engines)
+    }), 200
+
+
+@admin_bp.route('/profiles', methods=['GET'])
+@token_required
+@swag_from({
+    'tags': ['Administration'],
+    'security': [{'Bearer': []}],
+    'summary': 'List recent profiles',
+    'description': 'Profiles written by this host to PROFILING_DIR, newest first. Send X-Profile: 1 with '
+                   'any authenticated request to profile it; its X-Profile-Id response header names the '
+                   'profile.',
+    'parameters': [
+        {'name': 'limit', 'in': 'query', 'type': 'integer', 'default': 50}
+    ],
+    'responses': {
+        200: {
+            'description': 'Profile summaries',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'success': {'type': 'boolean'},
+                    'data': {'type': 'array', 'items': {'type': 'object'}}
+                }
+            }
+        }
+    }
+})
+def get_profiles():
+    """List recent profiles"""
+    limit = min(max(request.args.get('limit', 50, type=int), 1), 500)
+    return jsonify({
+        'success': True,
+        'data': list_profiles(limit)
+    }), 200
+
+
+@admin_bp.route('/profiles/<profile_id>.<any(json, folded):extension>', methods=['GET'])
+@token_required
+@swag_from({
+    'tags': ['Administration'],
+    'security': [{'Bearer': []}],
+    'summary': 'Download a profile',
+    'description': '.json holds timing, SQL statements and memory; .folded holds the sampled stacks in the '
+                   'collapsed format read by flamegraph.pl and speedscope.',
+    'parameters': [
+        {'name': 'profile_id', 'in': 'path', 'type': 'string', 'required': True},
+        {'name': 'extension', 'in': 'path', 'type': 'string', 'enum': ['json', 'folded'], 'required': True}
+    ],
+    'responses': {
+        200: {'description': 'Profile file'},
+        404: {'description': 'Profile not found'}
+    }
+})
+def get_profile(profile_id, extension):
+    """Download a profile file"""
+    return send_from_directory(profile_directory(), f"{profile_id}.{extension}", mimetype='text/plain')
+
+
+@admin_bp.route('/slow-queries', methods=['GET'])
+@token_required
+@swag_from({
+    'tags': ['Administration'],
+    'security': [{'Bearer': []}],
+    'summary': 'List the slowest statements',
+    'description': 'Statements that ran longer than SLOW_QUERY_MS, grouped by fingerprint (the statement '
+                   'with IN lists of any length folded together). latest holds the SQL, parameter types, '
+                   'source route or job and, when captured, the EXPLAIN plan of the most recent occurrence.',
+    'parameters': [
+        {'name': 'hours', 'in': 'query', 'type': 'number', 'default': 24},
+        {'name': 'order', 'in': 'query', 'type': 'string', 'enum': list(ORDERS), 'default': 'total'},
+        {'name': 'limit', 'in': 'query', 'type': 'integer', 'default': 20}
+    ],
+    'responses': {
+        200: {
+            'description': 'Slow statements',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'success': {'type': 'boolean'},
+                    'data': {'type': 'array', 'items': {'type': 'object'}}
+                }
+            }
+        },
+        400: {'description': 'Invalid order'}
+    }
+})
+def get_slow_queries():
+    """List the slowest statements"""
+    order = request.args.get('order', 'total')
+    if order not in ORDERS:
+        return jsonify({
+            'success': False,
+            'message': f"order must be one of {', '.join(ORDERS)}"
+        }), 400
+    
+    hours = min(max(request.args.get('hours', 24, type=float), 0.0), 24 * 90)
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+    return jsonify({
+        'success': True,
+        'data': worst_slow_queries(hours, order, limit)
+    }), 200
+
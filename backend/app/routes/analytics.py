@@ -1,20 +1,28 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from marshmallow import ValidationError
 from flasgger import swag_from
 from sqlalchemy import func, case
-from datetime import datetime
 
 from app.models import db, ReservationAttempt, Customer, Area, ReservationSlot
-from app.schemas import AnalyticsFilterSchema, ReservationAttemptSchema
+from app.schemas import AnalyticsFilterSchema, ReservationAttemptSchema, reservation_attempt_rows
+from app.services.cache import analytics_cache
+from app.services.latency import LATENCY_GROUPS, get_latency_stats
+from app.services.payloads import expand_payloads, payload_filters
+from app.services.rollups import GRANULARITIES, GROUP_BY_OPTIONS, get_attempt_timeseries
+from app.services.status_counts import get_status_summary
+from app.services.sync import changes_response, is_sync_request
+from app.services.table_versions import conditional
 from app.utils.auth import token_required
+from app.utils.timestamps import parse_utc_timestamp
 
 analytics_bp = Blueprint('analytics', __name__, url_prefix='/api/analytics')
 attempt_schema = ReservationAttemptSchema()
-attempts_schema = ReservationAttemptSchema(many=True)
 
 
 @analytics_bp.route('/summary', methods=['GET'])
 @token_required
+@conditional('customers', 'areas', 'reservation_attempts', 'reservation_slots')
+@analytics_cache.cached('analytics')
 @swag_from({
     'tags': ['Analytics'],
     'security': [{'Bearer': []}],
@@ -71,6 +79,14 @@ def get_summary():
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
     
+    # Without a date window the counts come straight from the
+    # incrementally maintained area_status_counts table
+    if not start_date and not end_date:
+        return jsonify({
+            'success': True,
+            'data': get_status_summary(area_id)
+        }), 200
+    
     # Build base query for customers
     customer_query = db.session.query(
         Customer.reservation_status,
@@ -84,10 +100,10 @@ def get_summary():
     if start_date or end_date:
         customer_query = customer_query.join(ReservationAttempt)
         if start_date:
-            start_dt = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
+            start_dt = parse_utc_timestamp(start_date)
             customer_query = customer_query.filter(ReservationAttempt.created_at >= start_dt)
         if end_date:
-            end_dt = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
+            end_dt = parse_utc_timestamp(end_date)
             customer_query = customer_query.filter(ReservationAttempt.created_at <= end_dt)
     
     status_counts = customer_query.group_by(Customer.reservation_status).all()
@@ -154,10 +170,14 @@ def get_summary():
 
 @analytics_bp.route('/attempts', methods=['GET'])
 @token_required
+@conditional('reservation_attempts', 'reservation_slots', 'areas')
+@analytics_cache.cached('analytics')
 @swag_from({
     'tags': ['Analytics'],
     'security': [{'Bearer': []}],
     'summary': 'Get detailed reservation attempts',
+    'description': 'Also filters on the UiPath additional_data keys listed in PAYLOAD_INDEXED_KEYS, '
+                   'e.g. ?payload.reference=ABC123',
     'parameters': [
         {
             'name': 'area_id',
@@ -185,11 +205,34 @@ def get_summary():
             'type': 'string',
             'format': 'date-time',
             'required': False
+        },
+        {
+            'name': 'updated_since',
+            'in': 'query',
+            'type': 'string',
+            'format': 'date-time',
+            'required': False,
+            'description': 'Delta sync: only rows changed since this UTC timestamp, oldest first, '
+                           'plus ids of deleted rows. Pass next_updated_since of the last sync.'
+        },
+        {
+            'name': 'cursor',
+            'in': 'query',
+            'type': 'string',
+            'required': False,
+            'description': 'Delta sync: next_cursor of the previous page'
+        },
+        {
+            'name': 'limit',
+            'in': 'query',
+            'type': 'integer',
+            'required': False,
+            'description': 'Delta sync page size'
         }
     ],
     'responses': {
         200: {
-            'description': 'List of reservation attempts',
+            'description': 'List of reservation attempts, or one page of changes in delta sync mode',
             'schema': {
                 'type': 'object',
                 'properties': {
@@ -200,7 +243,9 @@ def get_summary():
                     }
                 }
             }
-        }
+        },
+        400: {'description': 'Invalid updated_since or cursor, or a payload key that is not indexed'},
+        410: {'description': 'updated_since is older than the sync window'}
     }
 })
 def get_attempts():
@@ -218,24 +263,256 @@ def get_attempts():
     
     start_date = request.args.get('start_date')
     if start_date:
-        start_dt = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
+        start_dt = parse_utc_timestamp(start_date)
         query = query.filter(ReservationAttempt.created_at >= start_dt)
     
     end_date = request.args.get('end_date')
     if end_date:
-        end_dt = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
+        end_dt = parse_utc_timestamp(end_date)
         query = query.filter(ReservationAttempt.created_at <= end_dt)
     
-    attempts = query.order_by(ReservationAttempt.created_at.desc()).all()
+    try:
+        query = query.filter(*payload_filters(request.args))
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
+    
+    if is_sync_request():
+        return changes_response(
+            query.with_entities(*reservation_attempt_rows.columns),
+            ReservationAttempt,
+            'reservation_attempts',
+            reservation_attempt_rows
+        )
+    
+    attempts = query.with_entities(*reservation_attempt_rows.columns).order_by(
+        ReservationAttempt.created_at.desc()
+    ).all()
     
     return jsonify({
         'success': True,
-        'data': attempts_schema.dump(attempts)
+        'data': reservation_attempt_rows.dump(attempts)
+    }), 200
+
+
+@analytics_bp.route('/timeseries', methods=['GET'])
+@token_required
+@conditional('reservation_attempts', 'reservation_slots')
+@analytics_cache.cached('analytics')
+@swag_from({
+    'tags': ['Analytics'],
+    'security': [{'Bearer': []}],
+    'summary': 'Get attempt throughput over time',
+    'description': 'Attempts sent, responses received, success and failure per time bucket (UTC), '
+                   'served from incrementally maintained rollup tables',
+    'parameters': [
+        {
+            'name': 'granularity',
+            'in': 'query',
+            'type': 'string',
+            'enum': list(GRANULARITIES),
+            'default': 'hour',
+            'required': False
+        },
+        {
+            'name': 'group_by',
+            'in': 'query',
+            'type': 'string',
+            'enum': list(GROUP_BY_OPTIONS),
+            'default': 'area',
+            'required': False
+        },
+        {
+            'name': 'area_id',
+            'in': 'query',
+            'type': 'integer',
+            'required': False
+        },
+        {
+            'name': 'slot_id',
+            'in': 'query',
+            'type': 'integer',
+            'required': False
+        },
+        {
+            'name': 'start_date',
+            'in': 'query',
+            'type': 'string',
+            'format': 'date-time',
+            'required': False
+        },
+        {
+            'name': 'end_date',
+            'in': 'query',
+            'type': 'string',
+            'format': 'date-time',
+            'required': False
+        }
+    ],
+    'responses': {
+        200: {
+            'description': 'Time series points',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'success': {'type': 'boolean'},
+                    'data': {
+                        'type': 'array',
+                        'items': {
+                            'type': 'object',
+                            'properties': {
+                                'bucket': {'type': 'string', 'format': 'date-time'},
+                                'area_id': {'type': 'integer'},
+                                'reservation_slot_id': {'type': 'integer'},
+                                'attempts_sent': {'type': 'integer'},
+                                'responses_received': {'type': 'integer'},
+                                'success_count': {'type': 'integer'},
+                                'failed_count': {'type': 'integer'}
+                            }
+                        }
+                    }
+                }
+            }
+        },
+        400: {'description': 'Invalid granularity or group_by'}
+    }
+})
+def get_timeseries():
+    """Get attempt throughput per minute, hour or day"""
+    granularity = request.args.get('granularity', 'hour')
+    if granularity not in GRANULARITIES:
+        return jsonify({
+            'success': False,
+            'message': f"granularity must be one of: {', '.join(GRANULARITIES)}"
+        }), 400
+    
+    group_by = request.args.get('group_by', 'area')
+    if group_by not in GROUP_BY_OPTIONS:
+        return jsonify({
+            'success': False,
+            'message': f"group_by must be one of: {', '.join(GROUP_BY_OPTIONS)}"
+        }), 400
+    
+    start_date = request.args.get('start_date')
+    end_date = request.args.get('end_date')
+    
+    series = get_attempt_timeseries(
+        granularity=granularity,
+        group_by=group_by,
+        area_id=request.args.get('area_id', type=int),
+        slot_id=request.args.get('slot_id', type=int),
+        start=parse_utc_timestamp(start_date) if start_date else None,
+        end=parse_utc_timestamp(end_date) if end_date else None
+    )
+    
+    return jsonify({
+        'success': True,
+        'data': series
+    }), 200
+
+
+@analytics_bp.route('/latency', methods=['GET'])
+@token_required
+@conditional('reservation_attempts', 'reservation_slots', 'areas')
+@analytics_cache.cached('analytics')
+@swag_from({
+    'tags': ['Analytics'],
+    'security': [{'Bearer': []}],
+    'summary': 'Get reservation latency percentiles',
+    'description': 'p50/p90/p99/max of the UiPath round trip (request sent -> webhook received) and of '
+                   'the dispatch delay (slot scheduled time -> request sent), in milliseconds. '
+                   'Statistics of settled slots are cached.',
+    'parameters': [
+        {
+            'name': 'group_by',
+            'in': 'query',
+            'type': 'string',
+            'enum': list(LATENCY_GROUPS),
+            'default': 'area',
+            'required': False
+        },
+        {
+            'name': 'area_id',
+            'in': 'query',
+            'type': 'integer',
+            'required': False
+        },
+        {
+            'name': 'slot_id',
+            'in': 'query',
+            'type': 'integer',
+            'required': False
+        },
+        {
+            'name': 'start_date',
+            'in': 'query',
+            'type': 'string',
+            'format': 'date-time',
+            'required': False
+        },
+        {
+            'name': 'end_date',
+            'in': 'query',
+            'type': 'string',
+            'format': 'date-time',
+            'required': False
+        }
+    ],
+    'responses': {
+        200: {
+            'description': 'Latency statistics per group',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'success': {'type': 'boolean'},
+                    'data': {
+                        'type': 'array',
+                        'items': {
+                            'type': 'object',
+                            'properties': {
+                                'round_trip': {'type': 'object'},
+                                'dispatch_delay': {'type': 'object'}
+                            }
+                        }
+                    }
+                }
+            }
+        },
+        400: {'description': 'Invalid group_by'}
+    }
+})
+def get_latency():
+    """Get round-trip and dispatch latency percentiles"""
+    group_by = request.args.get('group_by', 'area')
+    if group_by not in LATENCY_GROUPS:
+        return jsonify({
+            'success': False,
+            'message': f"group_by must be one of: {', '.join(LATENCY_GROUPS)}"
+        }), 400
+    
+    start_date = request.args.get('start_date')
+    end_date = request.args.get('end_date')
+    
+    stats = get_latency_stats(
+        group_by=group_by,
+        area_id=request.args.get('area_id', type=int),
+        slot_id=request.args.get('slot_id', type=int),
+        start=parse_utc_timestamp(start_date) if start_date else None,
+        end=parse_utc_timestamp(end_date) if end_date else None,
+        settle_minutes=current_app.config['LATENCY_SETTLE_MINUTES']
+    )
+    
+    return jsonify({
+        'success': True,
+        'data': stats
     }), 200
 
 
 @analytics_bp.route('/attempts/<int:attempt_id>', methods=['GET'])
 @token_required
+@conditional('reservation_attempts', 'reservation_slots', 'areas')
 @swag_from({
     'tags': ['Analytics'],
     'security': [{'Bearer': []}],
@@ -267,5 +544,41 @@ def get_attempt(attempt_id):
     attempt = ReservationAttempt.query.get_or_404(attempt_id)
     return jsonify({
         'success': True,
-        'data': attempt_schema.dump(attempt)
+        'data': expand_payloads(attempt_schema.dump(attempt))
+    }), 200
+
+
+@analytics_bp.route('/cache/stats', methods=['GET'])
+@token_required
+@swag_from({
+    'tags': ['Analytics'],
+    'security': [{'Bearer': []}],
+    'summary': 'Get analytics response cache statistics',
+    'description': 'Hit and miss counters of the worker process that served the request',
+    'responses': {
+        200: {
+            'description': 'Cache statistics',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'success': {'type': 'boolean'},
+                    'data': {
+                        'type': 'object',
+                        'properties': {
+                            'backend': {'type': 'string'},
+                            'pid': {'type': 'integer'},
+                            'entries': {'type': 'integer'},
+                            'namespaces': {'type': 'object'}
+                        }
+                    }
+                }
+            }
+        }
+    }
+})
+def get_cache_stats():
+    """Get analytics response cache hit/miss statistics"""
+    return jsonify({
+        'success': True,
+        'data': analytics_cache.stats()
     }), 200
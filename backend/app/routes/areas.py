@@ -1,18 +1,35 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, abort, request, jsonify
 from marshmallow import ValidationError
 from flasgger import swag_from
+from sqlalchemy import insert, update
+from sqlalchemy.exc import IntegrityError
 
-from app.models import db, Area
-from app.schemas import AreaSchema
+from app.models import db, Area, AreaDeletion
+from app.schemas import AreaSchema, area_rows
+from app.services.area_deletion import (
+    delete_area_now,
+    get_active_deletion,
+    pending_slot_ids,
+    should_delete_in_background,
+    start_area_deletion
+)
+from app.services.cache import analytics_cache
+from app.services.scheduler import reservation_scheduler
+from app.services.table_versions import conditional
+from app.services.writes import UNIQUE_VIOLATION, execute_returning, integrity_error_response
 from app.utils.auth import token_required
 
 areas_bp = Blueprint('areas', __name__, url_prefix='/api/areas')
 area_schema = AreaSchema()
-areas_schema = AreaSchema(many=True)
+
+AREA_CONSTRAINT_MESSAGES = {
+    UNIQUE_VIOLATION: 'Area with this name already exists'
+}
 
 
 @areas_bp.route('', methods=['GET'])
 @token_required
+@conditional('areas')
 @swag_from({
     'tags': ['Areas'],
     'security': [{'Bearer': []}],
@@ -55,19 +72,20 @@ def get_areas():
     """Get all areas"""
     is_active = request.args.get('is_active', type=lambda v: v.lower() == 'true')
     
-    query = Area.query
+    query = db.session.query(*area_rows.columns)
     if is_active is not None:
-        query = query.filter_by(is_active=is_active)
+        query = query.filter(Area.is_active == is_active)
     
     areas = query.order_by(Area.name).all()
     return jsonify({
         'success': True,
-        'data': areas_schema.dump(areas)
+        'data': area_rows.dump(areas)
     }), 200
 
 
 @areas_bp.route('/<int:area_id>', methods=['GET'])
 @token_required
+@conditional('areas')
 @swag_from({
     'tags': ['Areas'],
     'security': [{'Bearer': []}],
@@ -147,22 +165,18 @@ def create_area():
             'errors': err.messages
         }), 400
     
-    # Check if area already exists
-    existing = Area.query.filter_by(name=data['name']).first()
-    if existing:
-        return jsonify({
-            'success': False,
-            'message': 'Area with this name already exists'
-        }), 409
+    try:
+        area = execute_returning(insert(Area).values(**data), area_rows)
+        db.session.commit()
+    except IntegrityError as e:
+        return integrity_error_response(e, AREA_CONSTRAINT_MESSAGES)
     
-    area = Area(**data)
-    db.session.add(area)
-    db.session.commit()
+    analytics_cache.invalidate('analytics')
     
     return jsonify({
         'success': True,
         'message': 'Area created successfully',
-        'data': area_schema.dump(area)
+        'data': area
     }), 201
 
 
@@ -204,13 +218,12 @@ def create_area():
     'responses': {
         200: {'description': 'Area updated successfully'},
         400: {'description': 'Validation error'},
-        404: {'description': 'Area not found'}
+        404: {'description': 'Area not found'},
+        409: {'description': 'Area with this name already exists'}
     }
 })
 def update_area(area_id):
     """Update an existing area"""
-    area = Area.query.get_or_404(area_id)
-    
     try:
         data = area_schema.load(request.json, partial=True)
     except ValidationError as err:
@@ -219,24 +232,21 @@ def update_area(area_id):
             'errors': err.messages
         }), 400
     
-    # Check for name conflict
-    if 'name' in data and data['name'] != area.name:
-        existing = Area.query.filter_by(name=data['name']).first()
-        if existing:
-            return jsonify({
-                'success': False,
-                'message': 'Area with this name already exists'
-            }), 409
+    try:
+        area = execute_returning(update(Area).where(Area.id == area_id).values(**data), area_rows)
+        db.session.commit()
+    except IntegrityError as e:
+        return integrity_error_response(e, AREA_CONSTRAINT_MESSAGES)
     
-    for key, value in data.items():
-        setattr(area, key, value)
+    if area is None:
+        abort(404)
     
-    db.session.commit()
+    analytics_cache.invalidate('analytics')
     
     return jsonify({
         'success': True,
         'message': 'Area updated successfully',
-        'data': area_schema.dump(area)
+        'data': area
     }), 200
 
 
@@ -246,6 +256,11 @@ def update_area(area_id):
     'tags': ['Areas'],
     'security': [{'Bearer': []}],
     'summary': 'Delete area',
+    'description': 'Small areas are deleted in one statement, their customers, slots and '
+                   'attempts following through ON DELETE CASCADE. Areas with more than '
+                   'AREA_DELETE_INLINE_MAX_CUSTOMERS customers, or any area with '
+                   'background=true, are deactivated and deleted in chunks by a background '
+                   'job whose progress is served by GET /api/areas/deletions/{deletion_id}.',
     'parameters': [
         {
             'name': 'Authorization',
@@ -259,10 +274,18 @@ def update_area(area_id):
             'in': 'path',
             'type': 'integer',
             'required': True
+        },
+        {
+            'name': 'background',
+            'in': 'query',
+            'type': 'boolean',
+            'required': False,
+            'description': 'Always delete in a background job'
         }
     ],
     'responses': {
         200: {'description': 'Area deleted successfully'},
+        202: {'description': 'Area deletion started, data holds its progress'},
         404: {'description': 'Area not found'}
     }
 })
@@ -270,10 +293,68 @@ def delete_area(area_id):
     """Delete an area"""
     area = Area.query.get_or_404(area_id)
     
-    db.session.delete(area)
-    db.session.commit()
+    deletion = get_active_deletion(area_id)
+    if deletion:
+        return jsonify({
+            'success': True,
+            'message': 'Area deletion already in progress',
+            'data': deletion.to_dict()
+        }), 202
+    
+    background = request.args.get('background', 'false').lower() == 'true'
+    slot_ids = pending_slot_ids(area_id)
+    
+    if background or should_delete_in_background(area_id):
+        deletion = start_area_deletion(area)
+        reservation_scheduler.unschedule_reservation_slots(slot_ids)
+        reservation_scheduler.schedule_area_deletion(deletion.id)
+        
+        return jsonify({
+            'success': True,
+            'message': 'Area deletion started',
+            'data': deletion.to_dict()
+        }), 202
+    
+    delete_area_now(area)
+    reservation_scheduler.unschedule_reservation_slots(slot_ids)
     
     return jsonify({
         'success': True,
         'message': 'Area deleted successfully'
     }), 200
+
+
+@areas_bp.route('/deletions/<int:deletion_id>', methods=['GET'])
+@token_required
+@swag_from({
+    'tags': ['Areas'],
+    'security': [{'Bearer': []}],
+    'summary': 'Get area deletion progress',
+    'parameters': [
+        {
+            'name': 'Authorization',
+            'in': 'header',
+            'type': 'string',
+            'required': True,
+            'description': 'Bearer token (example: Bearer eyJhbGci...)'
+        },
+        {
+            'name': 'deletion_id',
+            'in': 'path',
+            'type': 'integer',
+            'required': True
+        }
+    ],
+    'responses': {
+        200: {'description': 'Deletion status (PENDING, RUNNING, DONE or FAILED) and row counts deleted so far'},
+        404: {'description': 'Area deletion not found'}
+    }
+})
+def get_area_deletion(deletion_id):
+    """Get the progress of a background area deletion"""
+    deletion = AreaDeletion.query.get_or_404(deletion_id)
+    
+    return jsonify({
+        'success': True,
+        'data': deletion.to_dict()
+    }), 200
@@ -1,18 +1,36 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, abort, current_app, request, jsonify
 from marshmallow import ValidationError
 from flasgger import swag_from
+from sqlalchemy import insert, update
+from sqlalchemy.exc import IntegrityError
 
 from app.models import db, Customer, Area
-from app.schemas import CustomerSchema
+from app.schemas import CustomerSchema, customer_rows
+from app.services.area_deletion import get_active_deletion
+from app.services.cache import analytics_cache
+from app.services.customer_search import search_customers
+from app.services.sync import changes_response, is_sync_request
+from app.services.table_versions import conditional
+from app.services.writes import (
+    FOREIGN_KEY_VIOLATION,
+    UNIQUE_VIOLATION,
+    execute_returning,
+    integrity_error_response
+)
 from app.utils.auth import token_required
 
 customers_bp = Blueprint('customers', __name__, url_prefix='/api/customers')
 customer_schema = CustomerSchema()
-customers_schema = CustomerSchema(many=True)
+
+CUSTOMER_CONSTRAINT_MESSAGES = {
+    FOREIGN_KEY_VIOLATION: 'Area not found',
+    UNIQUE_VIOLATION: 'Customer with this national ID already exists'
+}
 
 
 @customers_bp.route('', methods=['GET'])
 @token_required
+@conditional('customers', 'areas')
 @swag_from({
     'tags': ['Customers'],
     'security': [{'Bearer': []}],
@@ -41,34 +59,144 @@ customers_schema = CustomerSchema(many=True)
             'enum': ['OPEN', 'SUCCESS', 'FAILED'],
             'required': False,
             'description': 'Filter by reservation status'
+        },
+        {
+            'name': 'updated_since',
+            'in': 'query',
+            'type': 'string',
+            'format': 'date-time',
+            'required': False,
+            'description': 'Delta sync: only rows changed since this UTC timestamp, oldest first, '
+                           'plus ids of deleted rows. Pass next_updated_since of the last sync.'
+        },
+        {
+            'name': 'cursor',
+            'in': 'query',
+            'type': 'string',
+            'required': False,
+            'description': 'Delta sync: next_cursor of the previous page'
+        },
+        {
+            'name': 'limit',
+            'in': 'query',
+            'type': 'integer',
+            'required': False,
+            'description': 'Delta sync page size'
         }
     ],
     'responses': {
-        200: {'description': 'List of customers'}
+        200: {'description': 'List of customers, or one page of changes in delta sync mode'},
+        400: {'description': 'Invalid updated_since or cursor'},
+        410: {'description': 'updated_since is older than the sync window'}
     }
 })
 def get_customers():
     """Get all customers with optional filtering"""
-    query = Customer.query
+    query = db.session.query(*customer_rows.columns).join(Area, Area.id == Customer.area_id)
     
     # Apply filters
     area_id = request.args.get('area_id', type=int)
     if area_id:
-        query = query.filter_by(area_id=area_id)
+        query = query.filter(Customer.area_id == area_id)
     
     status = request.args.get('reservation_status')
     if status:
-        query = query.filter_by(reservation_status=status)
+        query = query.filter(Customer.reservation_status == status)
+    
+    if is_sync_request():
+        return changes_response(query, Customer, 'customers', customer_rows)
     
     customers = query.order_by(Customer.created_at.desc()).all()
     return jsonify({
         'success': True,
-        'data': customers_schema.dump(customers)
+        'data': customer_rows.dump(customers)
+    }), 200
+
+
+@customers_bp.route('/search', methods=['GET'])
+@token_required
+@conditional('customers', 'areas')
+@swag_from({
+    'tags': ['Customers'],
+    'security': [{'Bearer': []}],
+    'summary': 'Search customers',
+    'description': 'Ranked search by name (Arabic spelling variants and diacritics are ignored), '
+                   'national ID or phone number prefix/substring',
+    'parameters': [
+        {
+            'name': 'q',
+            'in': 'query',
+            'type': 'string',
+            'required': True,
+            'description': 'Name, national ID or phone number, complete or partial'
+        },
+        {
+            'name': 'area_id',
+            'in': 'query',
+            'type': 'integer',
+            'required': False,
+            'description': 'Filter by area ID'
+        },
+        {
+            'name': 'reservation_status',
+            'in': 'query',
+            'type': 'string',
+            'enum': ['OPEN', 'SUCCESS', 'FAILED'],
+            'required': False,
+            'description': 'Filter by reservation status'
+        },
+        {
+            'name': 'limit',
+            'in': 'query',
+            'type': 'integer',
+            'required': False,
+            'description': 'Page size (default 20, max 100)'
+        },
+        {
+            'name': 'offset',
+            'in': 'query',
+            'type': 'integer',
+            'required': False
+        }
+    ],
+    'responses': {
+        200: {'description': 'Matching customers, best match first, each with a score'},
+        400: {'description': 'Missing search text'}
+    }
+})
+def search_customers_route():
+    """Search customers by name, national ID or phone number"""
+    q = (request.args.get('q') or '').strip()
+    if not q:
+        return jsonify({
+            'success': False,
+            'message': 'Search text (q) is required'
+        }), 400
+    
+    limit = max(1, min(request.args.get('limit', 20, type=int), 100))
+    offset = max(0, request.args.get('offset', 0, type=int))
+    
+    results, has_more = search_customers(
+        q,
+        area_id=request.args.get('area_id', type=int),
+        status=request.args.get('reservation_status'),
+        limit=limit,
+        offset=offset,
+        max_candidates=current_app.config['CUSTOMER_SEARCH_MAX_CANDIDATES']
+    )
+    
+    return jsonify({
+        'success': True,
+        'data': results,
+        'has_more': has_more,
+        'limit': limit,
+        'offset': offset
     }), 200
 
 
 @customers_bp.route('/<int:customer_id>', methods=['GET'])
 @token_required
+@conditional('customers', 'areas')
 @swag_from({
     'tags': ['Customers'],
     'security': [{'Bearer': []}],
@@ -143,7 +271,8 @@ def get_customer(customer_id):
     'responses': {
         201: {'description': 'Customer created successfully'},
         400: {'description': 'Validation error'},
-        409: {'description': 'Customer with this national ID already exists'}
+        404: {'description': 'Area not found'},
+        409: {'description': 'Customer with this national ID already exists, or the area is being deleted'}
     }
 })
 def create_customer():
@@ -156,30 +285,31 @@ def create_customer():
             'errors': err.messages
         }), 400
     
-    # Verify area exists
-    area = Area.query.get(data['area_id'])
-    if not area:
-        return jsonify({
-            'success': False,
-            'message': 'Area not found'
-        }), 404
-    
-    # Check if customer with this national_id already exists
-    existing = Customer.query.filter_by(national_id=data['national_id']).first()
-    if existing:
+    # Customers added to an area being deleted would be removed with it
+    if get_active_deletion(data['area_id']):
         return jsonify({
             'success': False,
-            'message': 'Customer with this national ID already exists'
+            'message': 'Area is being deleted'
         }), 409
     
-    customer = Customer(**data)
-    db.session.add(customer)
-    db.session.commit()
+    # The area and national ID checks are left to the foreign key and
+    # unique constraints
+    try:
+        customer = execute_returning(
+            insert(Customer).values(**data),
+            customer_rows,
+            (Area, Area.id == Customer.area_id)
+        )
+        db.session.commit()
+    except IntegrityError as e:
+        return integrity_error_response(e, CUSTOMER_CONSTRAINT_MESSAGES)
+    
+    analytics_cache.invalidate('analytics')
     
     return jsonify({
         'success': True,
         'message': 'Customer created successfully',
-        'data': customer_schema.dump(customer)
+        'data': customer
     }), 201
 
 
@@ -226,13 +356,12 @@ def create_customer():
     'responses': {
         200: {'description': 'Customer updated successfully'},
         400: {'description': 'Validation error'},
-        404: {'description': 'Customer not found'}
+        404: {'description': 'Customer or area not found'},
+        409: {'description': 'Customer with this national ID already exists, or the area is being deleted'}
     }
 })
 def update_customer(customer_id):
     """Update an existing customer"""
-    customer = Customer.query.get_or_404(customer_id)
-    
     try:
         data = customer_schema.load(request.json, partial=True)
     except ValidationError as err:
@@ -241,33 +370,31 @@ def update_customer(customer_id):
             'errors': err.messages
         }), 400
     
-    # Verify area exists if being updated
-    if 'area_id' in data:
-        area = Area.query.get(data['area_id'])
-        if not area:
-            return jsonify({
-                'success': False,
-                'message': 'Area not found'
-            }), 404
+    if 'area_id' in data and get_active_deletion(data['area_id']):
+        return jsonify({
+            'success': False,
+            'message': 'Area is being deleted'
+        }), 409
     
-    # Check for national_id conflict
-    if 'national_id' in data and data['national_id'] != customer.national_id:
-        existing = Customer.query.filter_by(national_id=data['national_id']).first()
-        if existing:
-            return jsonify({
-                'success': False,
-                'message': 'Customer with this national ID already exists'
-            }), 409
+    try:
+        customer = execute_returning(
+            update(Customer).where(Customer.id == customer_id).values(**data),
+            customer_rows,
+            (Area, Area.id == Customer.area_id)
+        )
+        db.session.commit()
+    except IntegrityError as e:
+        return integrity_error_response(e, CUSTOMER_CONSTRAINT_MESSAGES)
     
-    for key, value in data.items():
-        setattr(customer, key, value)
+    if customer is None:
+        abort(404)
     
-    db.session.commit()
+    analytics_cache.invalidate('analytics')
     
     return jsonify({
         'success': True,
         'message': 'Customer updated successfully',
-        'data': customer_schema.dump(customer)
+        'data': customer
     }), 200
 
 
@@ -304,6 +431,7 @@ def delete_customer(customer_id):
     
     db.session.delete(customer)
     db.session.commit()
+    analytics_cache.invalidate('analytics')
     
     return jsonify({
         'success': True,
@@ -0,0 +1,83 @@
+from flask import Blueprint, current_app, jsonify
+from flasgger import swag_from
+
+from app.models import db, Area, ReservationSlot, ReservationAttempt
+from app.schemas import area_rows, reservation_slot_rows, reservation_attempt_rows
+from app.services.cache import analytics_cache
+from app.services.status_counts import get_status_summary
+from app.services.table_versions import conditional
+from app.utils.auth import token_required
+
+dashboard_bp = Blueprint('dashboard', __name__, url_prefix='/api/dashboard')
+
+
+@dashboard_bp.route('/bootstrap', methods=['GET'])
+@token_required
+@conditional('areas', 'customers', 'reservation_slots', 'reservation_attempts')
+@analytics_cache.cached('analytics', ttl=5)
+@swag_from({
+    'tags': ['Dashboard'],
+    'security': [{'Bearer': []}],
+    'summary': 'Initial data of the admin UI in one response',
+    'description': 'Areas, unprocessed slots (oldest first, so missed slots show up too), '
+                   'the status summary and the most recent attempts. Items have the same '
+                   'shape as in the corresponding list endpoints.',
+    'responses': {
+        200: {
+            'description': 'Dashboard data',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'success': {'type': 'boolean'},
+                    'data': {
+                        'type': 'object',
+                        'properties': {
+                            'areas': {
+                                'type': 'array',
+                                'items': {'$ref': '#/definitions/Area'}
+                            },
+                            'upcoming_slots': {
+                                'type': 'array',
+                                'items': {'$ref': '#/definitions/ReservationSlot'}
+                            },
+                            'summary': {'type': 'object'},
+                            'recent_attempts': {
+                                'type': 'array',
+                                'items': {'$ref': '#/definitions/ReservationAttempt'}
+                            }
+                        }
+                    }
+                }
+            }
+        }
+    }
+})
+def get_bootstrap():
+    """Get areas, upcoming slots, status summary and recent attempts"""
+    config = current_app.config
+    
+    # All four reads share this request's single connection checkout and
+    # are served by indexes or the incrementally maintained counters
+    areas = db.session.query(*area_rows.columns).order_by(Area.name).all()
+    
+    upcoming_slots = db.session.query(*reservation_slot_rows.columns).join(
+        Area, Area.id == ReservationSlot.area_id
+    ).filter(
+        ReservationSlot.is_processed.is_(False)
+    ).order_by(ReservationSlot.scheduled_datetime).limit(config['DASHBOARD_UPCOMING_SLOTS']).all()
+    
+    recent_attempts = db.session.query(*reservation_attempt_rows.columns).join(
+        ReservationSlot, ReservationSlot.id == ReservationAttempt.reservation_slot_id
+    ).join(
+        Area, Area.id == ReservationSlot.area_id
+    ).order_by(ReservationAttempt.created_at.desc()).limit(config['DASHBOARD_RECENT_ATTEMPTS']).all()
+    
+    return jsonify({
+        'success': True,
+        'data': {
+            'areas': area_rows.dump(areas),
+            'upcoming_slots': reservation_slot_rows.dump(upcoming_slots),
+            'summary': get_status_summary(),
+            'recent_attempts': reservation_attempt_rows.dump(recent_attempts)
+        }
+    }), 200
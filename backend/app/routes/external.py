@@ -1,13 +1,21 @@
 from flask import Blueprint, request, jsonify
 from marshmallow import ValidationError
 from flasgger import swag_from
+from opentelemetry.trace import SpanKind
 from datetime import datetime
 import logging
 
 from app.models import db, Customer, ReservationAttempt
 from app.schemas import ExternalUpdateSchema
+from app.services.cache import analytics_cache
+from app.services.events import slot_event_bus
+from app.services.payloads import store_payload
+from app.utils.metrics import WEBHOOK_UPDATES
+from app.utils.tracing import correlation_context, tracer
 
 logger = logging.getLogger(__name__)
+# One line per status update; rate limited by LOG_RATE_LIMITS
+update_logger = logging.getLogger(f'{__name__}.updates')
 
 external_bp = Blueprint('external', __name__, url_prefix='/api/external')
 update_schema = ExternalUpdateSchema()
@@ -47,6 +55,10 @@ update_schema = ExternalUpdateSchema()
                     'additional_data': {
                         'type': 'object',
                         'description': 'Any additional data from automation'
+                    },
+                    'correlation_id': {
+                        'type': 'string',
+                        'description': 'correlation_id of the reservation request, echoed for tracing'
                     }
                 }
             }
@@ -81,6 +93,7 @@ def update_status():
         data = update_schema.load(request.json)
     except ValidationError as err:
         logger.error(f"Validation error in external update: {err.messages}")
+        WEBHOOK_UPDATES.labels('unknown', 'invalid').inc()
         return jsonify({
             'success': False,
             'errors': err.messages
@@ -91,52 +104,79 @@ def update_status():
     response_code = data['response_code']
     message = data['message']
     additional_data = data.get('additional_data', {})
+    correlation = data.get('correlation_id')
     
-    logger.info(f"Received external update for national_id: {national_id}, status: {status}")
+    update_logger.info(
+        "Received external update for national_id: %s, status: %s", national_id, status,
+        extra={'national_id': national_id, 'status': status}
+    )
     
-    # Find customer by national ID
-    customer = Customer.query.filter_by(national_id=national_id).first()
-    if not customer:
-        logger.error(f"Customer not found with national_id: {national_id}")
+    # Continues the trace of the dispatch whose correlation id UiPath echoes
+    with tracer.start_as_current_span(
+        'external.update',
+        context=correlation_context(correlation),
+        kind=SpanKind.SERVER
+    ) as span:
+        span.set_attributes({'reservation.status': status, 'response_code': response_code})
+        
+        # Find customer by national ID
+        customer = Customer.query.filter_by(national_id=national_id).first()
+        if not customer:
+            logger.error(f"Customer not found with national_id: {national_id}")
+            WEBHOOK_UPDATES.labels(status, 'unknown_customer').inc()
+            return jsonify({
+                'success': False,
+                'message': 'Customer not found'
+            }), 404
+        
+        # Update customer status
+        customer.reservation_status = status
+        span.set_attribute('customer.id', customer.id)
+        
+        # Find the most recent reservation attempt for this customer
+        attempt = ReservationAttempt.query.filter_by(
+            customer_id=customer.id
+        ).order_by(ReservationAttempt.created_at.desc()).first()
+        
+        if attempt:
+            # Update the attempt with response data
+            attempt.response_received_at = datetime.utcnow()
+            attempt.response_status = status
+            attempt.response_code = response_code
+            attempt.response_message = message  # Stored exactly as received
+            span.set_attribute('attempt.id', attempt.id)
+            if attempt.request_sent_at is not None:
+                span.set_attribute(
+                    'reservation.response_delay_seconds',
+                    (attempt.response_received_at - attempt.request_sent_at).total_seconds()
+                )
+            # Status, code, message and time already live in the columns above
+            store_payload(attempt, 'response_payload', {'additional_data': additional_data} if additional_data else None)
+            slot_event_bus.publish(attempt.reservation_slot_id, 'webhook', {
+                'attempt_id': attempt.id,
+                'customer_id': customer.id,
+                'status': status,
+                'response_code': response_code,
+                'response_received_at': attempt.response_received_at.isoformat()
+            })
+        else:
+            logger.warning(f"No reservation attempt found for customer {customer.id}")
+        
+        db.session.commit()
+        analytics_cache.invalidate('analytics')
+        WEBHOOK_UPDATES.labels(status, 'applied' if attempt else 'no_attempt').inc()
+        
+        update_logger.info(
+            "Successfully updated status for customer %s to %s", customer.id, status,
+            extra={'customer_id': customer.id, 'attempt_id': attempt.id if attempt else None, 'status': status}
+        )
+        
         return jsonify({
-            'success': False,
-            'message': 'Customer not found'
-        }), 404
-    
-    # Update customer status
-    customer.reservation_status = status
-    
-    # Find the most recent reservation attempt for this customer
-    attempt = ReservationAttempt.query.filter_by(
-        customer_id=customer.id
-    ).order_by(ReservationAttempt.created_at.desc()).first()
-    
-    if attempt:
-        # Update the attempt with response data
-        attempt.response_received_at = datetime.utcnow()
-        attempt.response_status = status
-        attempt.response_code = response_code
-        attempt.response_message = message  # Stored exactly as received
-        attempt.response_payload = {
-            'status': status,
-            'code': response_code,
-            'message': message,
-            'additional_data': additional_data,
-            'timestamp': datetime.utcnow().isoformat()
-        }
-    else:
-        logger.warning(f"No reservation attempt found for customer {customer.id}")
-    
-    db.session.commit()
-    
-    logger.info(f"Successfully updated status for customer {customer.id} to {status}")
-    
-    return jsonify({
-        'success': True,
-        'message': 'Status updated successfully',
-        'customer_id': customer.id,
-        'updated_status': status
-    }), 200
+            'success': True,
+            'message': 'Status updated successfully',
+            'customer_id': customer.id,
+            'updated_status': status
+        }), 200
 
 
 @external_bp.route('/health', methods=['GET'])
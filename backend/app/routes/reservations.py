@@ -1,20 +1,31 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, current_app, request, jsonify
 from marshmallow import ValidationError
 from flasgger import swag_from
+from sqlalchemy import func, insert
+from sqlalchemy.exc import IntegrityError
 from datetime import datetime
+import json
 
-from app.models import db, ReservationSlot, Area
-from app.schemas import ReservationSlotSchema
+from app.models import db, ReservationSlot, ReservationAttempt, Area
+from app.services.area_deletion import get_active_deletion
+from app.schemas import ReservationSlotSchema, SlotReportSchema, reservation_slot_rows
+from app.services.events import slot_event_bus
+from app.services.partitions import slot_attempts_window
 from app.services.scheduler import reservation_scheduler
-from app.utils.auth import token_required
+from app.services.slot_reports import get_slot_report
+from app.services.sync import changes_response, is_sync_request
+from app.services.table_versions import conditional
+from app.services.writes import FOREIGN_KEY_VIOLATION, execute_returning, integrity_error_response
+from app.utils.auth import generate_stream_token, stream_token_required, token_required, verify_token
 
 reservations_bp = Blueprint('reservations', __name__, url_prefix='/api/reservations')
 reservation_schema = ReservationSlotSchema()
-reservations_schema = ReservationSlotSchema(many=True)
+report_schema = SlotReportSchema()
 
 
 @reservations_bp.route('', methods=['GET'])
 @token_required
+@conditional('reservation_slots', 'areas')
 @swag_from({
     'tags': ['Reservation Slots'],
     'security': [{'Bearer': []}],
@@ -39,11 +50,34 @@ reservations_schema = ReservationSlotSchema(many=True)
             'in': 'query',
             'type': 'boolean',
             'required': False
+        },
+        {
+            'name': 'updated_since',
+            'in': 'query',
+            'type': 'string',
+            'format': 'date-time',
+            'required': False,
+            'description': 'Delta sync: only rows changed since this UTC timestamp, oldest first, '
+                           'plus ids of deleted rows. Pass next_updated_since of the last sync.'
+        },
+        {
+            'name': 'cursor',
+            'in': 'query',
+            'type': 'string',
+            'required': False,
+            'description': 'Delta sync: next_cursor of the previous page'
+        },
+        {
+            'name': 'limit',
+            'in': 'query',
+            'type': 'integer',
+            'required': False,
+            'description': 'Delta sync page size'
         }
     ],
     'responses': {
         200: {
-            'description': 'List of reservation slots',
+            'description': 'List of reservation slots, or one page of changes in delta sync mode',
             'schema': {
                 'type': 'object',
                 'properties': {
@@ -54,30 +88,36 @@ reservations_schema = ReservationSlotSchema(many=True)
                     }
                 }
             }
-        }
+        },
+        400: {'description': 'Invalid updated_since or cursor'},
+        410: {'description': 'updated_since is older than the sync window'}
     }
 })
 def get_reservation_slots():
     """Get all reservation slots with optional filtering"""
-    query = ReservationSlot.query
+    query = db.session.query(*reservation_slot_rows.columns).join(Area, Area.id == ReservationSlot.area_id)
     
     area_id = request.args.get('area_id', type=int)
     if area_id:
-        query = query.filter_by(area_id=area_id)
+        query = query.filter(ReservationSlot.area_id == area_id)
     
     is_processed = request.args.get('is_processed', type=lambda v: v.lower() == 'true')
     if is_processed is not None:
-        query = query.filter_by(is_processed=is_processed)
+        query = query.filter(ReservationSlot.is_processed == is_processed)
+    
+    if is_sync_request():
+        return changes_response(query, ReservationSlot, 'reservation_slots', reservation_slot_rows)
     
     slots = query.order_by(ReservationSlot.scheduled_datetime.desc()).all()
     return jsonify({
         'success': True,
-        'data': reservations_schema.dump(slots)
+        'data': reservation_slot_rows.dump(slots)
     }), 200
 
 
 @reservations_bp.route('/<int:slot_id>', methods=['GET'])
 @token_required
+@conditional('reservation_slots', 'areas')
 @swag_from({
     'tags': ['Reservation Slots'],
     'security': [{'Bearer': []}],
@@ -113,6 +153,185 @@ def get_reservation_slot(slot_id):
     }), 200
 
 
+@reservations_bp.route('/<int:slot_id>/report', methods=['GET'])
+@token_required
+@conditional('slot_reports', 'reservation_slots', 'areas')
+@swag_from({
+    'tags': ['Reservation Slots'],
+    'security': [{'Bearer': []}],
+    'summary': 'Get the completion report of a processed slot',
+    'description': 'Customers targeted, sends, failures, responses by status and code, send window '
+                   'and latency percentiles. Written when the slot finishes and refreshed as '
+                   'webhook responses arrive.',
+    'parameters': [
+        {
+            'name': 'slot_id',
+            'in': 'path',
+            'type': 'integer',
+            'required': True
+        }
+    ],
+    'responses': {
+        200: {
+            'description': 'Slot report',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'success': {'type': 'boolean'},
+                    'data': {'type': 'object'}
+                }
+            }
+        },
+        404: {'description': 'Report not available (slot missing or not processed yet)'}
+    }
+})
+def get_reservation_slot_report(slot_id):
+    """Get the materialized report of a reservation slot"""
+    report = get_slot_report(slot_id)
+    if not report:
+        return jsonify({
+            'success': False,
+            'message': 'Report not available until the slot has been processed'
+        }), 404
+    
+    return jsonify({
+        'success': True,
+        'data': report_schema.dump(report)
+    }), 200
+
+
+def _sse(event_type: str, data) -> str:
+    """Format one Server-Sent Events message"""
+    return f"event: {event_type}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@reservations_bp.route('/<int:slot_id>/events/token', methods=['POST'])
+@token_required
+@swag_from({
+    'tags': ['Reservation Slots'],
+    'security': [{'Bearer': []}],
+    'summary': 'Issue a short-lived token for the event stream of a slot',
+    'description': 'For EventSource clients, which cannot set the Authorization header: the token '
+                   'is accepted only as the `token` query parameter of this slot\'s event stream, '
+                   'and only for EVENT_STREAM_TOKEN_SECONDS. Request a new one before reconnecting.',
+    'parameters': [
+        {
+            'name': 'slot_id',
+            'in': 'path',
+            'type': 'integer',
+            'required': True
+        }
+    ],
+    'responses': {
+        200: {
+            'description': 'Stream token',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'success': {'type': 'boolean'},
+                    'token': {'type': 'string'},
+                    'expires_in': {'type': 'integer'}
+                }
+            }
+        },
+        404: {'description': 'Reservation slot not found'}
+    }
+})
+def create_reservation_slot_events_token(slot_id):
+    """Issue a token that opens the event stream of one slot"""
+    ReservationSlot.query.get_or_404(slot_id)
+    username = verify_token(request.headers['Authorization'].split(' ')[1])['username']
+    
+    return jsonify({
+        'success': True,
+        'token': generate_stream_token(username, slot_id),
+        'expires_in': current_app.config['EVENT_STREAM_TOKEN_SECONDS']
+    }), 200
+
+
+@reservations_bp.route('/<int:slot_id>/events', methods=['GET'])
+@stream_token_required
+@swag_from({
+    'tags': ['Reservation Slots'],
+    'security': [{'Bearer': []}],
+    'summary': 'Stream live progress of a slot (Server-Sent Events)',
+    'description': 'Starts with a `snapshot` event holding the current counts, then pushes '
+                   '`started`, `dispatch`, `completed` and `webhook` events as they are committed. '
+                   'Browsers using EventSource pass a token from POST /api/reservations/{slot_id}/events/token '
+                   'as the `token` query parameter; admin JWTs are only accepted in the Authorization header. '
+                   'The stream ends after EVENT_STREAM_MAX_SECONDS; clients reconnect automatically.',
+    'produces': ['text/event-stream'],
+    'parameters': [
+        {
+            'name': 'slot_id',
+            'in': 'path',
+            'type': 'integer',
+            'required': True
+        },
+        {
+            'name': 'token',
+            'in': 'query',
+            'type': 'string',
+            'required': False,
+            'description': 'Stream token from POST /api/reservations/{slot_id}/events/token, '
+                           'for clients that cannot set the Authorization header'
+        }
+    ],
+    'responses': {
+        200: {'description': 'Event stream'},
+        404: {'description': 'Reservation slot not found'}
+    }
+})
+def stream_reservation_slot_events(slot_id):
+    """Stream dispatch progress and webhook outcomes of a reservation slot"""
+    slot = ReservationSlot.query.get_or_404(slot_id)
+    
+    # Subscribe before reading the snapshot so nothing committed in between
+    # is lost; an event may then also be reflected in the snapshot counts
+    subscription = slot_event_bus.subscribe(
+        slot_id,
+        max_seconds=current_app.config['EVENT_STREAM_MAX_SECONDS'],
+        heartbeat_seconds=current_app.config['EVENT_STREAM_HEARTBEAT_SECONDS']
+    )
+    
+    counts = db.session.query(
+        func.count(ReservationAttempt.id),
+        func.count(ReservationAttempt.response_received_at),
+        func.count(ReservationAttempt.id).filter(ReservationAttempt.response_status == 'SUCCESS'),
+        func.count(ReservationAttempt.id).filter(ReservationAttempt.response_status == 'FAILED')
+    ).join(
+        ReservationSlot, (ReservationSlot.id == ReservationAttempt.reservation_slot_id) & slot_attempts_window()
+    ).filter(ReservationAttempt.reservation_slot_id == slot_id).one()
+    
+    snapshot = {
+        'slot_id': slot.id,
+        'is_processed': slot.is_processed,
+        'scheduled_datetime': slot.scheduled_datetime.isoformat(),
+        'attempts_sent': counts[0],
+        'responses_received': counts[1],
+        'success_count': counts[2],
+        'failed_count': counts[3]
+    }
+    
+    # The stream may stay open for minutes; hand the connection back to the pool
+    db.session.remove()
+    
+    def generate():
+        yield 'retry: 3000\n\n'
+        yield _sse('snapshot', snapshot)
+        for message in subscription:
+            if message is None:
+                yield ': keepalive\n\n'
+            else:
+                yield _sse(message['event'], message['data'])
+    
+    response = Response(generate(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.call_on_close(subscription.close)
+    return response
+
+
 @reservations_bp.route('', methods=['POST'])
 @token_required
 @swag_from({
@@ -151,7 +370,8 @@ def get_reservation_slot(slot_id):
             }
         },
         400: {'description': 'Validation error'},
-        404: {'description': 'Area not found'}
+        404: {'description': 'Area not found'},
+        409: {'description': 'The area is being deleted'}
     }
 })
 def create_reservation_slot():
@@ -164,14 +384,6 @@ def create_reservation_slot():
             'errors': err.messages
         }), 400
     
-    # Verify area exists
-    area = Area.query.get(data['area_id'])
-    if not area:
-        return jsonify({
-            'success': False,
-            'message': 'Area not found'
-        }), 404
-    
     # Validate scheduled datetime is in the future
     if data['scheduled_datetime'] <= datetime.utcnow():
         return jsonify({
@@ -179,20 +391,34 @@ def create_reservation_slot():
             'message': 'Scheduled datetime must be in the future'
         }), 400
     
-    slot = ReservationSlot(**data)
-    db.session.add(slot)
-    db.session.commit()
+    # A slot of an area being deleted would be removed with it
+    if get_active_deletion(data['area_id']):
+        return jsonify({
+            'success': False,
+            'message': 'Area is being deleted'
+        }), 409
+    
+    # A missing area surfaces as a foreign key violation
+    try:
+        slot = execute_returning(
+            insert(ReservationSlot).values(**data),
+            reservation_slot_rows,
+            (Area, Area.id == ReservationSlot.area_id)
+        )
+        db.session.commit()
+    except IntegrityError as e:
+        return integrity_error_response(e, {FOREIGN_KEY_VIOLATION: 'Area not found'})
     
     # Schedule the slot
     reservation_scheduler.schedule_reservation_slot(
-        slot.id,
-        slot.scheduled_datetime
+        slot['id'],
+        data['scheduled_datetime']
     )
     
     return jsonify({
         'success': True,
         'message': 'Reservation slot created and scheduled successfully',
-        'data': reservation_schema.dump(slot)
+        'data': slot
     }), 201
 
 
@@ -238,7 +464,8 @@ def create_reservation_slot():
             }
         },
         400: {'description': 'Validation error or slot already processed'},
-        404: {'description': 'Reservation slot not found'}
+        404: {'description': 'Reservation slot not found'},
+        409: {'description': 'The area is being deleted'}
     }
 })
 def update_reservation_slot(slot_id):
@@ -275,6 +502,12 @@ def update_reservation_slot(slot_id):
             'message': 'Scheduled datetime must be in the future'
         }), 400
     
+    if get_active_deletion(data.get('area_id', slot.area_id)):
+        return jsonify({
+            'success': False,
+            'message': 'Area is being deleted'
+        }), 409
+    
     for key, value in data.items():
         setattr(slot, key, value)
     
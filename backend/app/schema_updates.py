@@ -0,0 +1,525 @@
+"""
+Idempotent schema updates applied after ``db.create_all()``.
+
+``create_all`` only creates missing tables. Anything it cannot express on an
+existing database (new columns, functions, triggers, indexes) is listed here
+and re-applied on every boot, so each statement must be safe to run again.
+Statements go through ``exec_driver_sql``, which applies DB-API parameter
+formatting, so they must not contain a literal percent sign.
+"""
+from flask import current_app
+import logging
+
+from app.models import db, NORMALIZE_ARABIC_FUNCTION
+from app.services.payloads import PAYLOAD_KEY
+
+logger = logging.getLogger(__name__)
+
+
+# Rollup deltas contributed by a set of reservation_attempts rows. ``changes``
+# is built from the trigger's transition tables with a +1/-1 ``sign`` column;
+# each row contributes a send in the minute it was sent and a response in the
+# minute it was answered.
+ATTEMPT_ROLLUP_INSERT = """
+    INSERT INTO attempt_rollups (
+        bucket_start, area_id, reservation_slot_id,
+        attempts_sent, responses_received, success_count, failed_count, compacted
+    )
+    SELECT x.bucket_start, s.area_id, c.reservation_slot_id,
+           SUM(c.sign * x.sent), SUM(c.sign * x.responses),
+           SUM(c.sign * x.success), SUM(c.sign * x.failed), FALSE
+    FROM ({changes}) c
+    CROSS JOIN LATERAL (VALUES
+        (date_trunc('minute', c.request_sent_at), 1, 0, 0, 0),
+        (date_trunc('minute', c.response_received_at), 0, 1,
+         COALESCE((c.response_status = 'SUCCESS')::int, 0),
+         COALESCE((c.response_status = 'FAILED')::int, 0))
+    ) AS x(bucket_start, sent, responses, success, failed)
+    LEFT JOIN reservation_slots s ON s.id = c.reservation_slot_id
+    WHERE x.bucket_start IS NOT NULL
+    GROUP BY x.bucket_start, s.area_id, c.reservation_slot_id
+"""
+
+ATTEMPT_ROLLUP_COLUMNS = ('id', 'reservation_slot_id', 'request_sent_at', 'response_received_at', 'response_status')
+
+ATTEMPT_ROLLUP_CHANGED = """
+    (o.reservation_slot_id, o.request_sent_at, o.response_received_at, o.response_status)
+    IS DISTINCT FROM
+    (n.reservation_slot_id, n.request_sent_at, n.response_received_at, n.response_status)
+"""
+
+
+def _columns(alias):
+    return ', '.join(f'{alias}.{column}' for column in ATTEMPT_ROLLUP_COLUMNS)
+
+
+ATTEMPT_ROLLUP_INSERTED = f"SELECT {_columns('new_rows')}, 1 AS sign FROM new_rows"
+
+ATTEMPT_ROLLUP_DELETED = f"SELECT {_columns('old_rows')}, -1 AS sign FROM old_rows"
+
+ATTEMPT_ROLLUP_UPDATED = f"""
+    SELECT {_columns('n')}, 1 AS sign
+    FROM new_rows n JOIN old_rows o ON o.id = n.id
+    WHERE {ATTEMPT_ROLLUP_CHANGED}
+    UNION ALL
+    SELECT {_columns('o')}, -1 AS sign
+    FROM old_rows o JOIN new_rows n ON n.id = o.id
+    WHERE {ATTEMPT_ROLLUP_CHANGED}
+"""
+
+
+# Tables whose writes bump table_versions (see app/services/table_versions.py)
+VERSIONED_TABLES = ('areas', 'customers', 'reservation_slots', 'reservation_attempts', 'slot_reports')
+
+# Tables served through delta sync: keyset index on (updated_at, id) and
+# tombstones on delete (see app/services/sync.py)
+SYNCED_TABLES = ('customers', 'reservation_slots', 'reservation_attempts')
+
+
+# Creates the monthly reservation_attempts partitions covering
+# [from_month, to_month) plus the DEFAULT partition. Rows that landed in the
+# DEFAULT partition for a month without a partition are moved into the new one.
+ATTEMPT_PARTITIONS_FUNCTION = """
+    CREATE OR REPLACE FUNCTION create_reservation_attempt_partitions(from_month timestamp, to_month timestamp)
+    RETURNS integer AS $$
+    DECLARE
+        bucket timestamp := date_trunc('month', from_month);
+        partition_name text;
+        bounds text;
+        created integer := 0;
+    BEGIN
+        IF to_regclass('reservation_attempts_default') IS NULL THEN
+            CREATE TABLE reservation_attempts_default PARTITION OF reservation_attempts DEFAULT;
+        END IF;
+        
+        WHILE bucket < to_month LOOP
+            partition_name := 'reservation_attempts_p' || to_char(bucket, 'YYYYMM');
+            IF to_regclass(partition_name) IS NULL THEN
+                bounds := ' FOR VALUES FROM (' || quote_literal(bucket::text)
+                    || ') TO (' || quote_literal((bucket + interval '1 month')::text) || ')';
+                
+                IF EXISTS (
+                    SELECT 1 FROM reservation_attempts_default
+                    WHERE created_at >= bucket AND created_at < bucket + interval '1 month'
+                ) THEN
+                    EXECUTE 'CREATE TABLE ' || quote_ident(partition_name)
+                        || ' (LIKE reservation_attempts INCLUDING DEFAULTS)';
+                    EXECUTE 'INSERT INTO ' || quote_ident(partition_name)
+                        || ' SELECT * FROM reservation_attempts_default'
+                        || ' WHERE created_at >= $1 AND created_at < $2'
+                        USING bucket, bucket + interval '1 month';
+                    DELETE FROM reservation_attempts_default
+                    WHERE created_at >= bucket AND created_at < bucket + interval '1 month';
+                    EXECUTE 'ALTER TABLE reservation_attempts ATTACH PARTITION '
+                        || quote_ident(partition_name) || bounds;
+                ELSE
+                    EXECUTE 'CREATE TABLE ' || quote_ident(partition_name)
+                        || ' PARTITION OF reservation_attempts' || bounds;
+                END IF;
+                
+                created := created + 1;
+            END IF;
+            bucket := bucket + interval '1 month';
+        END LOOP;
+        
+        RETURN created;
+    END;
+    $$ LANGUAGE plpgsql
+"""
+
+
+SCHEMA_UPDATES = [
+    (
+        'areas.link column',
+        "ALTER TABLE areas ADD COLUMN IF NOT EXISTS link VARCHAR(500)"
+    ),
+    (
+        'reservation_attempts partition function',
+        ATTEMPT_PARTITIONS_FUNCTION
+    ),
+    (
+        # Runs before the reservation_attempts triggers and indexes below so
+        # that the copy fires no rollup triggers and the indexes are built on
+        # the partitioned table
+        'partition reservation_attempts by month',
+        """
+        DO $$
+        DECLARE
+            first_month timestamp;
+        BEGIN
+            IF (SELECT relkind FROM pg_class WHERE oid = to_regclass('reservation_attempts')) <> 'r' THEN
+                RETURN;
+            END IF;
+            
+            LOCK TABLE reservation_attempts IN ACCESS EXCLUSIVE MODE;
+            UPDATE reservation_attempts
+            SET created_at = COALESCE(request_sent_at, now() AT TIME ZONE 'UTC')
+            WHERE created_at IS NULL;
+            
+            ALTER TABLE reservation_attempts RENAME TO reservation_attempts_unpartitioned;
+            ALTER INDEX reservation_attempts_pkey RENAME TO reservation_attempts_unpartitioned_pkey;
+            ALTER SEQUENCE reservation_attempts_id_seq OWNED BY NONE;
+            
+            CREATE TABLE reservation_attempts (
+                LIKE reservation_attempts_unpartitioned INCLUDING DEFAULTS,
+                PRIMARY KEY (id, created_at),
+                FOREIGN KEY (customer_id) REFERENCES customers (id) ON DELETE CASCADE,
+                FOREIGN KEY (reservation_slot_id) REFERENCES reservation_slots (id) ON DELETE CASCADE
+            ) PARTITION BY RANGE (created_at);
+            
+            SELECT date_trunc('month', MIN(created_at)) INTO first_month
+            FROM reservation_attempts_unpartitioned;
+            PERFORM create_reservation_attempt_partitions(
+                COALESCE(first_month, date_trunc('month', now() AT TIME ZONE 'UTC')),
+                date_trunc('month', now() AT TIME ZONE 'UTC') + interval '2 months'
+            );
+            
+            INSERT INTO reservation_attempts SELECT * FROM reservation_attempts_unpartitioned;
+            DROP TABLE reservation_attempts_unpartitioned;
+            ALTER SEQUENCE reservation_attempts_id_seq OWNED BY reservation_attempts.id;
+        END
+        $$
+        """
+    ),
+    (
+        # Further months are created ahead by the create_attempt_partitions job
+        'reservation_attempts current partitions',
+        """
+        SELECT create_reservation_attempt_partitions(
+            date_trunc('month', now() AT TIME ZONE 'UTC'),
+            date_trunc('month', now() AT TIME ZONE 'UTC') + interval '2 months'
+        )
+        """
+    ),
+    (
+        # One-off rewrite: webhook payloads drop the status, code, message
+        # and timestamp that the response_* columns already hold
+        'reservation_attempts JSONB payloads',
+        """
+        DO $$
+        BEGIN
+            IF (
+                SELECT data_type FROM information_schema.columns
+                WHERE table_name = 'reservation_attempts' AND column_name = 'response_payload'
+            ) <> 'json' THEN
+                RETURN;
+            END IF;
+            
+            ALTER TABLE reservation_attempts
+                ALTER COLUMN request_payload TYPE jsonb USING request_payload::jsonb,
+                ALTER COLUMN response_payload TYPE jsonb USING (
+                    CASE
+                        WHEN response_payload IS NULL OR NOT response_payload::jsonb ? 'additional_data'
+                            THEN response_payload::jsonb
+                        WHEN response_payload::jsonb -> 'additional_data' IN ('{}', 'null') THEN NULL
+                        ELSE jsonb_build_object('additional_data', response_payload::jsonb -> 'additional_data')
+                    END
+                );
+        END
+        $$
+        """
+    ),
+    (
+        'payload_overflow foreign key',
+        """
+        DO $$
+        BEGIN
+            IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'payload_overflow_attempt_fkey') THEN
+                ALTER TABLE payload_overflow
+                ADD CONSTRAINT payload_overflow_attempt_fkey
+                FOREIGN KEY (attempt_id, attempt_created_at)
+                REFERENCES reservation_attempts (id, created_at) ON DELETE CASCADE;
+            END IF;
+        END
+        $$
+        """
+    ),
+    (
+        'area_status_counts trigger function',
+        """
+        CREATE OR REPLACE FUNCTION track_area_status_counts() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                INSERT INTO area_status_counts (area_id, reservation_status, count)
+                SELECT area_id, reservation_status, COUNT(*)
+                FROM new_rows
+                GROUP BY area_id, reservation_status;
+            ELSIF TG_OP = 'DELETE' THEN
+                INSERT INTO area_status_counts (area_id, reservation_status, count)
+                SELECT area_id, reservation_status, -COUNT(*)
+                FROM old_rows
+                GROUP BY area_id, reservation_status;
+            ELSE
+                INSERT INTO area_status_counts (area_id, reservation_status, count)
+                SELECT area_id, reservation_status, SUM(delta)
+                FROM (
+                    SELECT o.area_id, o.reservation_status, -1 AS delta
+                    FROM old_rows o JOIN new_rows n ON n.id = o.id
+                    WHERE (o.area_id, o.reservation_status)
+                          IS DISTINCT FROM (n.area_id, n.reservation_status)
+                    UNION ALL
+                    SELECT n.area_id, n.reservation_status, 1 AS delta
+                    FROM old_rows o JOIN new_rows n ON n.id = o.id
+                    WHERE (o.area_id, o.reservation_status)
+                          IS DISTINCT FROM (n.area_id, n.reservation_status)
+                ) changes
+                GROUP BY area_id, reservation_status
+                HAVING SUM(delta) <> 0;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    ),
+    (
+        'area_status_counts insert trigger',
+        """
+        CREATE OR REPLACE TRIGGER customers_status_counts_insert
+        AFTER INSERT ON customers
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION track_area_status_counts()
+        """
+    ),
+    (
+        'area_status_counts update trigger',
+        """
+        CREATE OR REPLACE TRIGGER customers_status_counts_update
+        AFTER UPDATE ON customers
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION track_area_status_counts()
+        """
+    ),
+    (
+        'area_status_counts delete trigger',
+        """
+        CREATE OR REPLACE TRIGGER customers_status_counts_delete
+        AFTER DELETE ON customers
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION track_area_status_counts()
+        """
+    ),
+    (
+        'attempt_rollups trigger function',
+        f"""
+        CREATE OR REPLACE FUNCTION track_attempt_rollups() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                {ATTEMPT_ROLLUP_INSERT.format(changes=ATTEMPT_ROLLUP_INSERTED)};
+            ELSIF TG_OP = 'DELETE' THEN
+                {ATTEMPT_ROLLUP_INSERT.format(changes=ATTEMPT_ROLLUP_DELETED)};
+            ELSE
+                {ATTEMPT_ROLLUP_INSERT.format(changes=ATTEMPT_ROLLUP_UPDATED)};
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    ),
+    (
+        'attempt_rollups insert trigger',
+        """
+        CREATE OR REPLACE TRIGGER reservation_attempts_rollups_insert
+        AFTER INSERT ON reservation_attempts
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION track_attempt_rollups()
+        """
+    ),
+    (
+        'attempt_rollups update trigger',
+        """
+        CREATE OR REPLACE TRIGGER reservation_attempts_rollups_update
+        AFTER UPDATE ON reservation_attempts
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION track_attempt_rollups()
+        """
+    ),
+    (
+        'attempt_rollups delete trigger',
+        """
+        CREATE OR REPLACE TRIGGER reservation_attempts_rollups_delete
+        AFTER DELETE ON reservation_attempts
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION track_attempt_rollups()
+        """
+    ),
+    (
+        'reservation_attempts slot/response index',
+        """
+        CREATE INDEX IF NOT EXISTS ix_reservation_attempts_slot_response
+        ON reservation_attempts (reservation_slot_id, response_received_at)
+        """
+    ),
+    (
+        'table_versions trigger function',
+        """
+        CREATE OR REPLACE FUNCTION bump_table_version() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO table_versions (table_name, changes) VALUES (TG_TABLE_NAME, 1);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    ),
+    *[
+        (
+            f'table_versions trigger on {table}',
+            f"""
+            CREATE OR REPLACE TRIGGER {table}_table_version
+            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table}
+            FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version()
+            """
+        )
+        for table in VERSIONED_TABLES
+    ],
+    (
+        'deleted_rows trigger function',
+        """
+        CREATE OR REPLACE FUNCTION record_deleted_rows() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO deleted_rows (table_name, row_id, deleted_at)
+            SELECT TG_TABLE_NAME, id, now() AT TIME ZONE 'UTC' FROM old_rows;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    ),
+    *[
+        (
+            f'deleted_rows trigger on {table}',
+            f"""
+            CREATE OR REPLACE TRIGGER {table}_deleted_rows
+            AFTER DELETE ON {table}
+            REFERENCING OLD TABLE AS old_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION record_deleted_rows()
+            """
+        )
+        for table in SYNCED_TABLES
+    ],
+    *[
+        (
+            f'{table} updated_at keyset index',
+            f"CREATE INDEX IF NOT EXISTS ix_{table}_updated_at_id ON {table} (updated_at, id)"
+        )
+        for table in SYNCED_TABLES
+    ],
+    (
+        'reservation_attempts created_at index',
+        "CREATE INDEX IF NOT EXISTS ix_reservation_attempts_created_at ON reservation_attempts (created_at)"
+    ),
+    (
+        'reservation_slots pending index',
+        """
+        CREATE INDEX IF NOT EXISTS ix_reservation_slots_pending
+        ON reservation_slots (scheduled_datetime) WHERE is_processed IS FALSE
+        """
+    ),
+    ('normalize_arabic function', NORMALIZE_ARABIC_FUNCTION),
+    (
+        'customers.name_normalized column',
+        """
+        ALTER TABLE customers ADD COLUMN IF NOT EXISTS name_normalized TEXT
+        GENERATED ALWAYS AS (normalize_arabic(name)) STORED
+        """
+    ),
+    ('pg_trgm extension', "CREATE EXTENSION IF NOT EXISTS pg_trgm"),
+    (
+        'customers name trigram index',
+        "CREATE INDEX IF NOT EXISTS ix_customers_name_trgm ON customers USING gin (name_normalized gin_trgm_ops)"
+    ),
+    (
+        'customers name prefix index',
+        "CREATE INDEX IF NOT EXISTS ix_customers_name_prefix ON customers (name_normalized text_pattern_ops)"
+    ),
+    (
+        'customers national_id trigram index',
+        "CREATE INDEX IF NOT EXISTS ix_customers_national_id_trgm ON customers USING gin (national_id gin_trgm_ops)"
+    ),
+    (
+        'customers national_id prefix index',
+        "CREATE INDEX IF NOT EXISTS ix_customers_national_id_prefix ON customers (national_id text_pattern_ops)"
+    ),
+    (
+        'customers phone trigram index',
+        "CREATE INDEX IF NOT EXISTS ix_customers_phone_trgm ON customers USING gin (phone_number gin_trgm_ops)"
+    ),
+    (
+        'customers phone prefix index',
+        "CREATE INDEX IF NOT EXISTS ix_customers_phone_prefix ON customers (phone_number text_pattern_ops)"
+    ),
+    (
+        'ON DELETE CASCADE foreign keys',
+        """
+        DO $$
+        DECLARE
+            fk record;
+        BEGIN
+            FOR fk IN
+                SELECT c.conname, c.conrelid::regclass::text AS tbl, a.attname AS col,
+                       c.confrelid::regclass::text AS ref
+                FROM pg_constraint c
+                JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = c.conkey[1]
+                WHERE c.contype = 'f'
+                  AND c.confdeltype <> 'c'
+                  AND (c.conrelid::regclass::text, a.attname::text) IN (
+                      ('customers', 'area_id'),
+                      ('reservation_slots', 'area_id'),
+                      ('reservation_attempts', 'customer_id'),
+                      ('reservation_attempts', 'reservation_slot_id')
+                  )
+            LOOP
+                EXECUTE 'ALTER TABLE ' || quote_ident(fk.tbl)
+                    || ' DROP CONSTRAINT ' || quote_ident(fk.conname)
+                    || ', ADD CONSTRAINT ' || quote_ident(fk.conname)
+                    || ' FOREIGN KEY (' || quote_ident(fk.col) || ')'
+                    || ' REFERENCES ' || quote_ident(fk.ref) || ' (id) ON DELETE CASCADE';
+            END LOOP;
+        END
+        $$
+        """
+    ),
+    (
+        'customers area_id index',
+        "CREATE INDEX IF NOT EXISTS ix_customers_area_id ON customers (area_id)"
+    ),
+    (
+        'reservation_slots area_id index',
+        "CREATE INDEX IF NOT EXISTS ix_reservation_slots_area_id ON reservation_slots (area_id)"
+    ),
+    (
+        'reservation_attempts customer_id index',
+        "CREATE INDEX IF NOT EXISTS ix_reservation_attempts_customer_id ON reservation_attempts (customer_id)"
+    ),
+]
+
+
+def payload_index_updates(keys):
+    """
+    GIN indexes on ``response_payload -> 'additional_data' -> <key>`` for the
+    keys listed in PAYLOAD_INDEXED_KEYS, backing the ``payload.<key>``
+    filter of the attempts list (see app/services/payloads.py)
+    """
+    updates = []
+    for key in keys:
+        if not PAYLOAD_KEY.match(key):
+            logger.warning(f"Ignoring invalid PAYLOAD_INDEXED_KEYS entry: {key!r}")
+            continue
+        updates.append((
+            f'response_payload {key} index',
+            f"""
+            CREATE INDEX IF NOT EXISTS ix_reservation_attempts_payload_{key.lower()}
+            ON reservation_attempts USING gin ((response_payload -> 'additional_data' -> '{key}') jsonb_path_ops)
+            """
+        ))
+    return updates
+
+
+def apply_schema_updates():
+    """Apply every schema update in order inside a single transaction"""
+    updates = SCHEMA_UPDATES + payload_index_updates(current_app.config['PAYLOAD_INDEXED_KEYS'])
+
+    with db.engine.begin() as conn:
+        for name, statement in updates:
+            conn.exec_driver_sql(statement)
+            logger.debug(f"Applied schema update: {name}")
+
+    logger.info(f"Applied {len(updates)} schema updates")
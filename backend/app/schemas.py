@@ -1,5 +1,8 @@
 from marshmallow import Schema, fields, validate
 
+from app.models import Area, Customer, ReservationSlot, ReservationAttempt
+from app.utils.serialization import RowSerializer
+
 
 class AreaSchema(Schema):
     """Schema for Area validation and serialization"""
@@ -59,6 +62,25 @@ class ReservationAttemptSchema(Schema):
     updated_at = fields.DateTime(dump_only=True)
 
 
+class SlotReportSchema(Schema):
+    """Schema for SlotReport serialization"""
+    reservation_slot_id = fields.Int(dump_only=True)
+    area_name = fields.Str(dump_only=True, attribute='reservation_slot.area.name')
+    scheduled_datetime = fields.DateTime(dump_only=True, attribute='reservation_slot.scheduled_datetime')
+    customers_targeted = fields.Int(dump_only=True)
+    requests_sent = fields.Int(dump_only=True)
+    send_failures = fields.Int(dump_only=True)
+    first_sent_at = fields.DateTime(dump_only=True)
+    last_sent_at = fields.DateTime(dump_only=True)
+    completed_at = fields.DateTime(dump_only=True)
+    responses_received = fields.Int(dump_only=True)
+    success_count = fields.Int(dump_only=True)
+    failed_count = fields.Int(dump_only=True)
+    response_codes = fields.Dict(dump_only=True)
+    latency = fields.Dict(dump_only=True)
+    refreshed_at = fields.DateTime(dump_only=True)
+
+
 class ExternalUpdateSchema(Schema):
     """Schema for external API update webhook"""
     national_id = fields.Str(required=True)
@@ -66,6 +88,7 @@ class ExternalUpdateSchema(Schema):
     response_code = fields.Int(required=True)
     message = fields.Str(required=True)
     additional_data = fields.Dict(allow_none=True)
+    correlation_id = fields.Str(allow_none=True)
 
 
 class LoginSchema(Schema):
@@ -83,3 +106,61 @@ class AnalyticsFilterSchema(Schema):
     )
     start_date = fields.DateTime(allow_none=True)
     end_date = fields.DateTime(allow_none=True)
+
+
+# Column-level serializers for the hot list routes. Each one produces exactly
+# the dictionaries of the matching schema's dump(many=True) and must be kept
+# in sync with it.
+
+area_rows = RowSerializer(
+    ('id', Area.id),
+    ('name', Area.name),
+    ('description', Area.description),
+    ('link', Area.link),
+    ('is_active', Area.is_active),
+    ('created_at', Area.created_at),
+    ('updated_at', Area.updated_at)
+)
+
+# Requires a join with areas
+customer_rows = RowSerializer(
+    ('id', Customer.id),
+    ('name', Customer.name),
+    ('phone_number', Customer.phone_number),
+    ('national_id', Customer.national_id),
+    ('area_id', Customer.area_id),
+    ('area_name', Area.name),
+    ('reservation_status', Customer.reservation_status),
+    ('created_at', Customer.created_at),
+    ('updated_at', Customer.updated_at)
+)
+
+# Requires a join with areas
+reservation_slot_rows = RowSerializer(
+    ('id', ReservationSlot.id),
+    ('area_id', ReservationSlot.area_id),
+    ('area_name', Area.name),
+    ('scheduled_datetime', ReservationSlot.scheduled_datetime),
+    ('is_processed', ReservationSlot.is_processed),
+    ('created_at', ReservationSlot.created_at),
+    ('updated_at', ReservationSlot.updated_at)
+)
+
+# Requires joins with reservation_slots and areas. Like ReservationAttemptSchema,
+# which finds no customer_name, customer_national_id or scheduled_datetime
+# attribute on the model, it leaves those keys out.
+reservation_attempt_rows = RowSerializer(
+    ('id', ReservationAttempt.id),
+    ('customer_id', ReservationAttempt.customer_id),
+    ('reservation_slot_id', ReservationAttempt.reservation_slot_id),
+    ('area_name', Area.name),
+    ('request_sent_at', ReservationAttempt.request_sent_at),
+    ('request_payload', ReservationAttempt.request_payload),
+    ('response_received_at', ReservationAttempt.response_received_at),
+    ('response_status', ReservationAttempt.response_status),
+    ('response_code', ReservationAttempt.response_code),
+    ('response_message', ReservationAttempt.response_message),
+    ('response_payload', ReservationAttempt.response_payload),
+    ('created_at', ReservationAttempt.created_at),
+    ('updated_at', ReservationAttempt.updated_at)
+)
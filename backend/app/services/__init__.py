@@ -1,5 +1,10 @@
 # Services package initialization
+from app.services.cache import analytics_cache
+from app.services.events import slot_event_bus
+from app.services.replicas import replica_router
 from app.services.scheduler import reservation_scheduler
+from app.services.slow_queries import slow_query_log
 from app.services.uipath_client import UiPathClient
 
-__all__ = ['reservation_scheduler', 'UiPathClient']
+__all__ = ['reservation_scheduler', 'UiPathClient', 'analytics_cache', 'slot_event_bus', 'replica_router',
+           'slow_query_log']
@@ -0,0 +1,183 @@
+from flask import current_app
+from sqlalchemy import or_, text
+from datetime import datetime, timedelta
+import logging
+from typing import List, Optional
+
+from app.models import db, Area, AreaDeletion, ReservationSlot
+from app.services.cache import analytics_cache
+from app.services.status_counts import get_area_status_counts
+
+logger = logging.getLogger(__name__)
+
+# Children are deleted bottom-up so that no statement fans out into
+# per-row ON DELETE CASCADE work on a large child table
+CHUNK_STATEMENTS = (
+    ('deleted_attempts', """
+        DELETE FROM reservation_attempts
+        WHERE id IN (
+            SELECT a.id
+            FROM reservation_attempts a
+            JOIN reservation_slots s ON s.id = a.reservation_slot_id
+            WHERE s.area_id = :area_id
+            LIMIT :chunk_size
+        )
+    """),
+    ('deleted_attempts', """
+        DELETE FROM reservation_attempts
+        WHERE id IN (
+            SELECT a.id
+            FROM reservation_attempts a
+            JOIN customers c ON c.id = a.customer_id
+            WHERE c.area_id = :area_id
+            LIMIT :chunk_size
+        )
+    """),
+    ('deleted_customers', """
+        DELETE FROM customers
+        WHERE id IN (
+            SELECT id FROM customers WHERE area_id = :area_id LIMIT :chunk_size
+        )
+    """),
+    ('deleted_slots', """
+        DELETE FROM reservation_slots
+        WHERE id IN (
+            SELECT id FROM reservation_slots WHERE area_id = :area_id LIMIT :chunk_size
+        )
+    """),
+)
+
+
+def get_active_deletion(area_id: int) -> Optional[AreaDeletion]:
+    """Unfinished background deletion of an area, if any"""
+    return AreaDeletion.query.filter(
+        AreaDeletion.area_id == area_id,
+        AreaDeletion.status.in_(('PENDING', 'RUNNING'))
+    ).first()
+
+
+def should_delete_in_background(area_id: int) -> bool:
+    """Whether the area holds more customers than AREA_DELETE_INLINE_MAX_CUSTOMERS"""
+    counts = get_area_status_counts(area_id).get(area_id)
+    if not counts:
+        return False
+    return sum(counts['counts'].values()) > current_app.config['AREA_DELETE_INLINE_MAX_CUSTOMERS']
+
+
+def pending_slot_ids(area_id: int) -> List[int]:
+    """IDs of the area's unprocessed slots, whose scheduler jobs must be dropped"""
+    return [slot_id for slot_id, in db.session.query(ReservationSlot.id).filter(
+        ReservationSlot.area_id == area_id,
+        ReservationSlot.is_processed.is_(False)
+    )]
+
+
+def delete_area_now(area: Area) -> None:
+    """
+    Delete an area in a single statement; customers, slots and attempts
+    follow through the ON DELETE CASCADE foreign keys
+    """
+    Area.query.filter(Area.id == area.id).delete(synchronize_session=False)
+    db.session.commit()
+    analytics_cache.invalidate('analytics')
+
+
+def start_area_deletion(area: Area) -> AreaDeletion:
+    """
+    Deactivate an area and record a background deletion for it
+    
+    Args:
+        area: Area to delete
+    
+    Returns:
+        The PENDING deletion, to be handed to ``run_area_deletion``
+    """
+    area.is_active = False
+    deletion = AreaDeletion(area_id=area.id, area_name=area.name, status='PENDING')
+    db.session.add(deletion)
+    db.session.commit()
+    analytics_cache.invalidate('analytics')
+    return deletion
+
+
+def _claim(deletion_id: int) -> bool:
+    """
+    Mark a deletion RUNNING unless another worker holds it. A RUNNING
+    deletion whose heartbeat (updated_at) is older than
+    AREA_DELETE_STALE_SECONDS is taken over, which resumes deletions
+    interrupted by a restart.
+    """
+    stale = datetime.utcnow() - timedelta(seconds=current_app.config['AREA_DELETE_STALE_SECONDS'])
+    claimed = AreaDeletion.query.filter(
+        AreaDeletion.id == deletion_id,
+        or_(
+            AreaDeletion.status == 'PENDING',
+            (AreaDeletion.status == 'RUNNING') & (AreaDeletion.updated_at < stale)
+        )
+    ).update({'status': 'RUNNING', 'updated_at': datetime.utcnow()}, synchronize_session=False)
+    db.session.commit()
+    return claimed == 1
+
+
+def run_area_deletion(deletion_id: int) -> None:
+    """
+    Delete an area's rows in chunks of AREA_DELETE_CHUNK_SIZE, committing
+    after every chunk so locks stay short and progress is visible through
+    the deletion's counters
+    
+    Args:
+        deletion_id: ID of the area deletion
+    """
+    if not _claim(deletion_id):
+        db.session.rollback()
+        return
+    
+    deletion = AreaDeletion.query.get(deletion_id)
+    chunk_size = current_app.config['AREA_DELETE_CHUNK_SIZE']
+    params = {'area_id': deletion.area_id, 'chunk_size': chunk_size}
+    
+    try:
+        for counter, statement in CHUNK_STATEMENTS:
+            while True:
+                deleted = db.session.execute(text(statement), params).rowcount
+                if deleted:
+                    setattr(deletion, counter, getattr(deletion, counter) + deleted)
+                deletion.updated_at = datetime.utcnow()
+                db.session.commit()
+                if deleted < chunk_size:
+                    break
+        
+        Area.query.filter(Area.id == deletion.area_id).delete(synchronize_session=False)
+        deletion.status = 'DONE'
+        deletion.finished_at = datetime.utcnow()
+        db.session.commit()
+        logger.info(
+            f"Deleted area {deletion.area_id}: {deletion.deleted_customers} customers, "
+            f"{deletion.deleted_slots} slots, {deletion.deleted_attempts} attempts"
+        )
+    
+    except Exception as e:
+        logger.error(f"Error deleting area {deletion.area_id}: {str(e)}")
+        db.session.rollback()
+        deletion.status = 'FAILED'
+        deletion.error = str(e)
+        deletion.finished_at = datetime.utcnow()
+        db.session.commit()
+    
+    finally:
+        analytics_cache.invalidate('analytics')
+
+
+def resume_area_deletions() -> None:
+    """Run deletions left PENDING, or RUNNING with a stale heartbeat, by a previous process"""
+    stale = datetime.utcnow() - timedelta(seconds=current_app.config['AREA_DELETE_STALE_SECONDS'])
+    deletion_ids = [deletion_id for deletion_id, in db.session.query(AreaDeletion.id).filter(
+        or_(
+            AreaDeletion.status == 'PENDING',
+            (AreaDeletion.status == 'RUNNING') & (AreaDeletion.updated_at < stale)
+        )
+    ).order_by(AreaDeletion.id)]
+    db.session.rollback()
+    
+    for deletion_id in deletion_ids:
+        run_area_deletion(deletion_id)
@@ -0,0 +1,313 @@
+from collections import OrderedDict
+from datetime import datetime
+from functools import wraps
+from flask import Response, request
+import fcntl
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryCacheBackend:
+    """Per-process LRU cache with per-entry expiry"""
+    
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+        self._counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+    
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+    
+    def set(self, key: str, value: bytes, ttl: int):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def get_counter(self, key: str) -> int:
+        return self._counters.get(key, 0)
+    
+    def incr(self, key: str) -> int:
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+    
+    def size(self) -> int:
+        return len(self._entries)
+
+
+class FileSystemCacheBackend:
+    """
+    Cache shared by every worker process on the host through a local directory
+    
+    Entries are written to a temporary file and renamed into place, so readers
+    never observe partial writes. When the directory grows past max_entries
+    the least recently written files are pruned.
+    """
+    
+    def __init__(self, cache_dir: str, max_entries: int):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self._writes = 0
+        os.makedirs(cache_dir, exist_ok=True)
+    
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, hashlib.sha1(key.encode('utf-8')).hexdigest())
+    
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self._path(key), 'rb') as f:
+                expires_at = float(f.readline())
+                if expires_at < time.time():
+                    return None
+                return f.read()
+        except (OSError, ValueError):
+            return None
+    
+    def set(self, key: str, value: bytes, ttl: int):
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(f"{time.time() + ttl}\n".encode('ascii'))
+                f.write(value)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            logger.warning(f"Could not write cache entry: {str(e)}")
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            return
+        
+        self._writes += 1
+        if self._writes % 100 == 0:
+            self._prune()
+    
+    def _prune(self):
+        try:
+            entries = [e for e in os.scandir(self.cache_dir) if e.is_file() and not e.name.startswith('.')]
+            if len(entries) <= self.max_entries:
+                return
+            entries.sort(key=lambda e: e.stat().st_mtime)
+            for entry in entries[:len(entries) - self.max_entries]:
+                os.unlink(entry.path)
+        except OSError as e:
+            logger.warning(f"Could not prune cache directory: {str(e)}")
+    
+    def get_counter(self, key: str) -> int:
+        try:
+            with open(os.path.join(self.cache_dir, f'.counter-{key}'), 'r') as f:
+                return int(f.read() or 0)
+        except (OSError, ValueError):
+            return 0
+    
+    def incr(self, key: str) -> int:
+        path = os.path.join(self.cache_dir, f'.counter-{key}')
+        with open(path, 'a+') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.seek(0)
+            value = int(f.read() or 0) + 1
+            f.seek(0)
+            f.truncate()
+            f.write(str(value))
+            return value
+    
+    def size(self) -> int:
+        try:
+            return sum(1 for e in os.scandir(self.cache_dir) if not e.name.startswith('.'))
+        except OSError:
+            return 0
+
+
+class RedisCacheBackend:
+    """
+    Cache shared across hosts through Redis or any protocol-compatible server
+    (Valkey, KeyDB, Dragonfly). Size is bounded by the server's maxmemory
+    policy, e.g. ``maxmemory-policy allkeys-lru``.
+    """
+    
+    def __init__(self, url: str, prefix: str = 'hedri-sakni:cache:'):
+        import redis
+        
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+    
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(self.prefix + key)
+    
+    def set(self, key: str, value: bytes, ttl: int):
+        self.client.setex(self.prefix + key, ttl, value)
+    
+    def get_counter(self, key: str) -> int:
+        return int(self.client.get(f'{self.prefix}counter:{key}') or 0)
+    
+    def incr(self, key: str) -> int:
+        return self.client.incr(f'{self.prefix}counter:{key}')
+    
+    def size(self) -> int:
+        return sum(1 for _ in self.client.scan_iter(match=f'{self.prefix}*', count=1000))
+
+
+class ResponseCache:
+    """
+    Caches JSON response bodies of read endpoints keyed by normalized query
+    parameters.
+    
+    Keys embed a per-namespace generation number. Write paths call
+    ``invalidate(namespace)`` to bump it, which orphans every cached entry of
+    that namespace at once; the orphans then age out through TTL and eviction.
+    With the memory backend the generation is per process, so other workers
+    may serve an entry until its TTL expires.
+    """
+    
+    def __init__(self, app=None):
+        self.backend = None
+        self.backend_name = None
+        self.default_ttl = 30
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._stats_lock = threading.Lock()
+        
+        if app:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        """Create the configured backend"""
+        self.backend_name = app.config['ANALYTICS_CACHE_BACKEND']
+        self.default_ttl = app.config['ANALYTICS_CACHE_TTL']
+        max_entries = app.config['ANALYTICS_CACHE_MAX_ENTRIES']
+        
+        if self.backend_name == 'memory':
+            self.backend = MemoryCacheBackend(max_entries)
+        elif self.backend_name == 'filesystem':
+            self.backend = FileSystemCacheBackend(app.config['ANALYTICS_CACHE_DIR'], max_entries)
+        elif self.backend_name == 'redis':
+            self.backend = RedisCacheBackend(app.config['ANALYTICS_CACHE_REDIS_URL'])
+        elif self.backend_name == 'none':
+            self.backend = None
+        else:
+            raise ValueError(f"Unknown ANALYTICS_CACHE_BACKEND: {self.backend_name}")
+        
+        logger.info(f"Response cache backend: {self.backend_name}")
+    
+    def invalidate(self, *namespaces: str):
+        """Drop every cached response of the given namespaces"""
+        if not self.backend:
+            return
+        
+        for namespace in namespaces:
+            try:
+                self.backend.incr(f'generation:{namespace}')
+            except Exception as e:
+                logger.error(f"Failed to invalidate cache namespace {namespace}: {str(e)}")
+    
+    def _record(self, namespace: str, outcome: str):
+        with self._stats_lock:
+            stats = self._stats.setdefault(namespace, {'hits': 0, 'misses': 0})
+            stats[outcome] += 1
+    
+    def stats(self) -> Dict:
+        """Hit and miss counters of this worker process per namespace"""
+        namespaces = {}
+        with self._stats_lock:
+            for namespace, stats in self._stats.items():
+                lookups = stats['hits'] + stats['misses']
+                namespaces[namespace] = {
+                    'hits': stats['hits'],
+                    'misses': stats['misses'],
+                    'hit_ratio': round(stats['hits'] / lookups, 4) if lookups else None
+                }
+        
+        try:
+            entries = self.backend.size() if self.backend else 0
+        except Exception:
+            entries = None
+        
+        return {
+            'backend': self.backend_name,
+            'pid': os.getpid(),
+            'entries': entries,
+            'namespaces': namespaces
+        }
+    
+    @staticmethod
+    def normalized_query() -> str:
+        """
+        Canonical form of the request's query string: empty values dropped,
+        keys sorted, whitespace trimmed and ISO dates re-serialized so that
+        equivalent filters share one cache entry
+        """
+        params = []
+        for key in sorted(request.args.keys()):
+            values = sorted(v.strip() for v in request.args.getlist(key) if v.strip())
+            for value in values:
+                if key.endswith('_date'):
+                    try:
+                        value = datetime.fromisoformat(value.replace('Z', '+00:00')).isoformat()
+                    except ValueError:
+                        pass
+                params.append(f'{key}={value}')
+        return '&'.join(params)
+    
+    def cached(self, namespace: str, ttl: Optional[int] = None):
+        """
+        Decorator caching successful (200) JSON responses of a GET route
+        
+        Args:
+            namespace: Invalidation namespace of the route
+            ttl: Lifetime in seconds, defaults to ANALYTICS_CACHE_TTL
+        """
+        def decorator(f):
+            @wraps(f)
+            def decorated(*args, **kwargs):
+                if not self.backend:
+                    return f(*args, **kwargs)
+                
+                try:
+                    generation = self.backend.get_counter(f'generation:{namespace}')
+                    key = f'{namespace}:{generation}:{request.path}?{self.normalized_query()}'
+                    body = self.backend.get(key)
+                except Exception as e:
+                    logger.error(f"Response cache lookup failed: {str(e)}")
+                    return f(*args, **kwargs)
+                
+                if body is not None:
+                    self._record(namespace, 'hits')
+                    response = Response(body, status=200, mimetype='application/json')
+                    response.headers['X-Cache'] = 'HIT'
+                    return response
+                
+                self._record(namespace, 'misses')
+                result = f(*args, **kwargs)
+                
+                response, status = result if isinstance(result, tuple) else (result, 200)
+                if status == 200 and isinstance(response, Response) and response.is_json:
+                    try:
+                        self.backend.set(key, response.get_data(), ttl or self.default_ttl)
+                    except Exception as e:
+                        logger.error(f"Response cache store failed: {str(e)}")
+                    response.headers['X-Cache'] = 'MISS'
+                
+                return result
+            
+            return decorated
+        return decorator
+
+
+# Global cache instance for analytics read endpoints
+analytics_cache = ResponseCache()
@@ -0,0 +1,106 @@
+from sqlalchemy import case, func, literal, or_, select, union
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.models import db, Area, Customer
+from app.schemas import customer_rows
+
+logger = logging.getLogger(__name__)
+
+# pg_trgm works on three-character trigrams; shorter queries only use the
+# prefix indexes
+MIN_TRIGRAM_LENGTH = 3
+
+
+def _escape_like(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def search_customers(
+    q: str,
+    area_id: Optional[int] = None,
+    status: Optional[str] = None,
+    limit: int = 20,
+    offset: int = 0,
+    max_candidates: int = 2000
+) -> Tuple[List[Dict[str, Any]], bool]:
+    """
+    Ranked customer search over name, national ID and phone number
+    
+    The query is normalized with the same ``normalize_arabic`` SQL function
+    that fills ``customers.name_normalized``, so spelling variants of alef,
+    hamza, taa marbuta and diacritics all match. Every condition is backed by
+    a prefix (text_pattern_ops) or trigram (gin_trgm_ops) index.
+    
+    Ranking, highest first: exact national ID or phone, national ID or phone
+    prefix, name prefix, then substring and fuzzy name matches, each refined
+    by pg_trgm word similarity. Candidates are taken per tier, best first, so
+    the cap never drops a higher tier's match in favour of a lower one.
+    
+    Args:
+        q: Search text
+        area_id: Only customers of this area
+        status: Only customers with this reservation status
+        limit: Page size
+        offset: Rows to skip
+        max_candidates: Upper bound on matches taken from each ranking tier,
+            which keeps very broad queries (e.g. a common first name) fast
+    
+    Returns:
+        (results, has_more) where results carry the customer list fields
+        plus ``score``
+    """
+    normalized = func.normalize_arabic(q)
+    pattern = func.normalize_arabic(_escape_like(q))
+    prefix = pattern.concat('%')
+    
+    exact = or_(Customer.national_id == normalized, Customer.phone_number == normalized)
+    national_id_prefix = Customer.national_id.like(prefix)
+    phone_prefix = Customer.phone_number.like(prefix)
+    name_prefix = Customer.name_normalized.like(prefix)
+    similarity = func.word_similarity(normalized, Customer.name_normalized)
+    tiers = [exact, or_(national_id_prefix, phone_prefix), name_prefix]
+    
+    if len(q.strip()) >= MIN_TRIGRAM_LENGTH:
+        contains = literal('%').concat(pattern).concat('%')
+        tiers.append(or_(
+            Customer.name_normalized.like(contains),
+            normalized.op('<%')(Customer.name_normalized),
+            Customer.national_id.like(contains),
+            Customer.phone_number.like(contains)
+        ))
+    
+    tier_queries = []
+    for condition in tiers:
+        tier = select(Customer.id).where(condition)
+        if area_id:
+            tier = tier.where(Customer.area_id == area_id)
+        if status:
+            tier = tier.where(Customer.reservation_status == status)
+        tier = tier.order_by(similarity.desc(), Customer.id).limit(max_candidates).subquery()
+        tier_queries.append(select(tier.c.id))
+    candidates = union(*tier_queries).subquery()
+    
+    score = (
+        case(
+            (exact, 4),
+            (or_(national_id_prefix, phone_prefix), 3),
+            (name_prefix, 2),
+            else_=0
+        ) + similarity
+    ).label('score')
+    
+    rows = db.session.query(*customer_rows.columns, score).join(
+        candidates, candidates.c.id == Customer.id
+    ).join(
+        Area, Area.id == Customer.area_id
+    ).order_by(score.desc(), Customer.id).offset(offset).limit(limit + 1).all()
+    
+    has_more = len(rows) > limit
+    results = []
+    for row in rows[:limit]:
+        result = customer_rows.serialize(row)
+        result['score'] = round(float(row.score), 4)
+        results.append(result)
+    
+    return results, has_more
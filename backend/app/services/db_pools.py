@@ -0,0 +1,248 @@
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import NullPool, QueuePool
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from app.utils.metrics import (
+    DB_POOL_CHECKED_OUT,
+    DB_POOL_CHECKOUT_TIMEOUTS,
+    DB_POOL_CHECKOUT_WAIT,
+    DB_POOL_CONNECTIONS_CLOSED,
+    DB_POOL_CONNECTIONS_OPENED
+)
+
+# SQLALCHEMY_BINDS keys of the engines created next to the web tier's
+# default engine
+SCHEDULER_BIND = 'scheduler'
+LISTENER_BIND = 'listener'
+
+# Upper bounds (seconds) of the checkout wait histogram buckets
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, float('inf'))
+
+
+class PoolMetrics:
+    """Checkout and connection counters of one named pool in this process"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.wait_buckets = [0] * len(WAIT_BUCKETS)
+        self.in_use = 0
+        self.max_in_use = 0
+        self.connects = 0
+        self.disconnects = 0
+    
+    def checked_out(self, wait: float, timed_out: bool = False):
+        with self._lock:
+            self.wait_seconds += wait
+            self.max_wait_seconds = max(self.max_wait_seconds, wait)
+            for index, bound in enumerate(WAIT_BUCKETS):
+                if wait <= bound:
+                    self.wait_buckets[index] += 1
+                    break
+            
+            if timed_out:
+                self.timeouts += 1
+                return
+            
+            self.checkouts += 1
+            self.in_use += 1
+            self.max_in_use = max(self.max_in_use, self.in_use)
+    
+    def returned(self):
+        with self._lock:
+            self.in_use -= 1
+    
+    def incr(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+    
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            attempts = self.checkouts + self.timeouts
+            return {
+                'checkouts': self.checkouts,
+                'checkout_timeouts': self.timeouts,
+                'checked_out': self.in_use,
+                'max_checked_out': self.max_in_use,
+                'checkout_wait_seconds': {
+                    'total': round(self.wait_seconds, 6),
+                    'avg': round(self.wait_seconds / attempts, 6) if attempts else None,
+                    'max': round(self.max_wait_seconds, 6),
+                    'buckets': dict(zip(
+                        ('+Inf' if bound == float('inf') else str(bound) for bound in WAIT_BUCKETS),
+                        self.wait_buckets
+                    ))
+                },
+                'connects': self.connects,
+                'disconnects': self.disconnects
+            }
+
+
+# Kept by name rather than on the pool, so counters survive the pool being
+# recreated by Engine.dispose()
+POOL_METRICS: Dict[str, PoolMetrics] = {}
+_metrics_lock = threading.Lock()
+
+
+def pool_metrics(name: str) -> PoolMetrics:
+    with _metrics_lock:
+        return POOL_METRICS.setdefault(name, PoolMetrics())
+
+
+class _InstrumentedPool:
+    """
+    Records in the pool's PoolMetrics and Prometheus metrics (named by
+    ``pool_logging_name``) how long each checkout waited, either for a free
+    connection or to open one, and every connection opened and closed
+    """
+    
+    capacity: Optional[int] = None
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.name = kwargs.get('logging_name') or 'default'
+        self.metrics = pool_metrics(self.name)
+    
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            wait = time.perf_counter() - started
+            self.metrics.checked_out(wait, timed_out=True)
+            DB_POOL_CHECKOUT_WAIT.labels(self.name).observe(wait)
+            DB_POOL_CHECKOUT_TIMEOUTS.labels(self.name).inc()
+            raise
+        
+        wait = time.perf_counter() - started
+        self.metrics.checked_out(wait)
+        DB_POOL_CHECKOUT_WAIT.labels(self.name).observe(wait)
+        DB_POOL_CHECKED_OUT.labels(self.name).inc()
+        return connection
+    
+    def _do_return_conn(self, record):
+        self.metrics.returned()
+        DB_POOL_CHECKED_OUT.labels(self.name).dec()
+        super()._do_return_conn(record)
+    
+    def _create_connection(self):
+        self.metrics.incr('connects')
+        DB_POOL_CONNECTIONS_OPENED.labels(self.name).inc()
+        return super()._create_connection()
+    
+    def _close_connection(self, connection, *, terminate=False):
+        self.metrics.incr('disconnects')
+        DB_POOL_CONNECTIONS_CLOSED.labels(self.name).inc()
+        super()._close_connection(connection, terminate=terminate)
+
+
+class InstrumentedQueuePool(_InstrumentedPool, QueuePool):
+    """QueuePool with PoolMetrics"""
+    
+    def __init__(self, *args, pool_size: int = 5, max_overflow: int = 10, **kwargs):
+        super().__init__(*args, pool_size=pool_size, max_overflow=max_overflow, **kwargs)
+        self.capacity = pool_size + max_overflow if max_overflow >= 0 else None
+
+
+class InstrumentedNullPool(_InstrumentedPool, NullPool):
+    """NullPool with PoolMetrics; every checkout opens a connection"""
+
+
+def engine_options(config, name: str, pool_size: int, max_overflow: int) -> Dict[str, Any]:
+    """
+    create_engine() options of one pool
+    
+    With DB_PGBOUNCER the app keeps no idle connections: PgBouncer in
+    transaction mode does the pooling, and stacking a second pool on top
+    would only pin server connections. The app is compatible with
+    transaction pooling as it uses transaction-scoped advisory locks and no
+    server-side prepared statements; only LISTEN needs DATABASE_DIRECT_URL.
+    
+    Args:
+        config: Application config
+        name: Pool name in logs and metrics
+        pool_size: Connections kept open
+        max_overflow: Extra connections opened under load
+    """
+    if config['DB_PGBOUNCER']:
+        return {'poolclass': InstrumentedNullPool, 'pool_logging_name': name}
+    
+    return {
+        'poolclass': InstrumentedQueuePool,
+        'pool_logging_name': name,
+        'pool_size': pool_size,
+        'max_overflow': max_overflow,
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': config['DB_POOL_PRE_PING']
+    }
+
+
+def configure_db_pools(app):
+    """
+    Fill in the engine options of the web pool, the replicas and the
+    scheduler pool, and add the LISTEN connection's engine; call before
+    ``db.init_app``. Options set explicitly in SQLALCHEMY_ENGINE_OPTIONS or
+    SQLALCHEMY_BINDS take precedence.
+    """
+    config = app.config
+    
+    config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        **engine_options(config, 'web', config['DB_POOL_SIZE'], config['DB_MAX_OVERFLOW']),
+        **(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    }
+    
+    binds = {}
+    for key, value in (config.get('SQLALCHEMY_BINDS') or {}).items():
+        options = {'url': value} if isinstance(value, str) else value
+        binds[key] = {**engine_options(config, key, config['DB_POOL_SIZE'], config['DB_MAX_OVERFLOW']), **options}
+    
+    binds.setdefault(SCHEDULER_BIND, {
+        'url': config['SQLALCHEMY_DATABASE_URI'],
+        **engine_options(config, SCHEDULER_BIND, config['SCHEDULER_DB_POOL_SIZE'], config['SCHEDULER_DB_MAX_OVERFLOW'])
+    })
+    # Long-lived connections of the slot event listener and flusher, one
+    # each per process, never through PgBouncer
+    binds.setdefault(LISTENER_BIND, {
+        'url': config['DATABASE_DIRECT_URL'] or config['SQLALCHEMY_DATABASE_URI'],
+        'poolclass': InstrumentedNullPool,
+        'pool_logging_name': LISTENER_BIND
+    })
+    config['SQLALCHEMY_BINDS'] = binds
+
+
+def db_pool_stats(engines) -> Dict[str, Any]:
+    """
+    Configuration, occupancy and counters of each engine's pool in this
+    worker process
+    
+    Args:
+        engines: ``db.engines``
+    """
+    pools = {}
+    for key, engine in engines.items():
+        pool = engine.pool
+        metrics = getattr(pool, 'metrics', None)
+        if metrics is None:
+            continue
+        
+        stats = metrics.snapshot()
+        stats['pool_class'] = type(pool).__name__
+        stats['capacity'] = pool.capacity
+        stats['saturation'] = round(stats['checked_out'] / pool.capacity, 4) if pool.capacity else None
+        if isinstance(pool, QueuePool):
+            stats['size'] = pool.size()
+            stats['idle'] = pool.checkedin()
+            stats['overflow'] = max(pool.overflow(), 0)
+        pools[key or 'web'] = stats
+    
+    return {
+        'pid': os.getpid(),
+        'pools': pools
+    }
@@ -0,0 +1,248 @@
+from sqlalchemy import event
+import json
+import logging
+import queue
+import select
+import threading
+import time
+import os
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+from app.models import db
+from app.services.db_pools import LISTENER_BIND
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'slot_events'
+
+# NOTIFY payloads are capped at 8000 bytes; batches are split below that
+MAX_PAYLOAD_BYTES = 7500
+
+
+class SlotEventBus:
+    """
+    Fans out reservation slot progress events to live subscribers.
+    
+    Events are held in the session and only go out if and when the caller's
+    transaction commits. The ``memory`` backend then delivers them within the
+    publishing process, which is enough for a single-process deployment.
+    
+    With the ``postgres`` backend they reach every worker process: each one
+    runs a single LISTEN thread that feeds its local subscriber queues. A
+    NOTIFY takes a database-wide lock while its transaction commits, so
+    events are not notified from the caller's transaction: a flush thread per
+    process sends what was committed every EVENT_BUS_FLUSH_MS as a few
+    batched notifications from its own connection, keeping dispatch and
+    webhook commits from queueing behind each other.
+    """
+    
+    def __init__(self, app=None):
+        self.app = None
+        self.backend = 'memory'
+        self._subscribers: Dict[int, Set[queue.Queue]] = {}
+        self._lock = threading.Lock()
+        self._listener: Optional[threading.Thread] = None
+        self._outbox: List[Dict[str, Any]] = []
+        self._flusher_pid: Optional[int] = None
+        self._flush_seconds = 0.1
+        
+        if app:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        """Select the backend and hook session commit/rollback for local delivery"""
+        self.app = app
+        self.backend = app.config['EVENT_BUS_BACKEND']
+        self._flush_seconds = app.config['EVENT_BUS_FLUSH_MS'] / 1000
+        
+        event.listen(db.session, 'after_commit', self._deliver_pending)
+        event.listen(db.session, 'after_soft_rollback', self._discard_pending)
+    
+    def publish(self, slot_id: int, event_type: str, data: Dict[str, Any]):
+        """
+        Publish an event for a slot as part of the current database transaction
+        
+        Args:
+            slot_id: Reservation slot the event belongs to
+            event_type: Event name sent to SSE clients
+            data: JSON-serializable payload; keep it small (NOTIFY caps at 8000 bytes)
+        """
+        message = {'slot_id': slot_id, 'event': event_type, 'data': data}
+        db.session.info.setdefault('pending_slot_events', []).append(message)
+    
+    def _deliver_pending(self, session):
+        messages = session.info.pop('pending_slot_events', [])
+        if not messages:
+            return
+        
+        if self.backend == 'postgres':
+            if self._flusher_pid != os.getpid():
+                self._start_flusher()
+            with self._lock:
+                self._outbox += messages
+        else:
+            for message in messages:
+                self._dispatch(message)
+    
+    def _discard_pending(self, session, previous_transaction):
+        session.info.pop('pending_slot_events', None)
+    
+    def _dispatch(self, message: Dict[str, Any]):
+        with self._lock:
+            subscribers = list(self._subscribers.get(message['slot_id'], ()))
+        
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(message)
+            except queue.Full:
+                # A stalled client must not hold back everyone else
+                logger.warning(f"Dropping event for slow subscriber of slot {message['slot_id']}")
+    
+    def subscribe(self, slot_id: int, max_seconds: int, heartbeat_seconds: int = 15) -> 'SlotSubscription':
+        """
+        Register a subscriber for a slot; events published from now on are queued for it
+        
+        The caller must ``close()`` the subscription once done.
+        """
+        subscription = SlotSubscription(self, slot_id, max_seconds, heartbeat_seconds)
+        with self._lock:
+            self._subscribers.setdefault(slot_id, set()).add(subscription.queue)
+        
+        if self.backend == 'postgres':
+            self._ensure_listener()
+        
+        return subscription
+    
+    def unsubscribe(self, slot_id: int, subscriber: queue.Queue):
+        with self._lock:
+            slot_subscribers = self._subscribers.get(slot_id)
+            if slot_subscribers:
+                slot_subscribers.discard(subscriber)
+                if not slot_subscribers:
+                    del self._subscribers[slot_id]
+    
+    def _start_flusher(self):
+        # Also restarts the thread in a forked worker process
+        with self._lock:
+            if self._flusher_pid != os.getpid():
+                self._outbox = []
+                threading.Thread(target=self._flush, name='slot-events-flusher', daemon=True).start()
+                self._flusher_pid = os.getpid()
+    
+    def _flush(self):
+        """Send the committed events as batched notifications until the process exits"""
+        connection = None
+        while True:
+            time.sleep(self._flush_seconds)
+            with self._lock:
+                messages, self._outbox = self._outbox, []
+            if not messages:
+                continue
+            
+            try:
+                if connection is None:
+                    with self.app.app_context():
+                        connection = db.engines[LISTENER_BIND].raw_connection()
+                    connection.dbapi_connection.autocommit = True
+                with connection.dbapi_connection.cursor() as cursor:
+                    for payload in _batches(messages):
+                        cursor.execute("SELECT pg_notify(%s, %s)", (CHANNEL, payload))
+            except Exception as e:
+                logger.error(f"Could not notify {len(messages)} slot events: {str(e)}")
+                if connection is not None:
+                    try:
+                        connection.invalidate()
+                    except Exception:
+                        pass
+                    connection = None
+    
+    def _ensure_listener(self):
+        with self._lock:
+            if self._listener and self._listener.is_alive():
+                return
+            self._listener = threading.Thread(target=self._listen, name='slot-events-listener', daemon=True)
+            self._listener.start()
+    
+    def _listen(self):
+        """LISTEN on the events channel and dispatch notifications until the process exits"""
+        while True:
+            connection = None
+            try:
+                with self.app.app_context():
+                    connection = db.engines[LISTENER_BIND].raw_connection()
+                dbapi_connection = connection.dbapi_connection
+                dbapi_connection.autocommit = True
+                with dbapi_connection.cursor() as cursor:
+                    cursor.execute(f"LISTEN {CHANNEL}")
+                logger.info("Listening for slot events")
+                
+                while True:
+                    if select.select([dbapi_connection], [], [], 30) == ([], [], []):
+                        continue
+                    dbapi_connection.poll()
+                    while dbapi_connection.notifies:
+                        notify = dbapi_connection.notifies.pop(0)
+                        try:
+                            for message in json.loads(notify.payload):
+                                self._dispatch(message)
+                        except (ValueError, KeyError, TypeError) as e:
+                            logger.error(f"Invalid slot event payload: {str(e)}")
+            
+            except Exception as e:
+                logger.error(f"Slot event listener failed, reconnecting: {str(e)}")
+                time.sleep(1)
+            finally:
+                if connection is not None:
+                    try:
+                        connection.invalidate()
+                    except Exception:
+                        pass
+
+
+def _batches(messages: List[Dict[str, Any]]) -> Iterator[str]:
+    """JSON arrays of ``messages``, in order, each under MAX_PAYLOAD_BYTES"""
+    batch: List[str] = []
+    size = 2
+    for message in messages:
+        encoded = json.dumps(message, default=str)
+        if batch and size + len(encoded.encode('utf-8')) + 1 > MAX_PAYLOAD_BYTES:
+            yield '[' + ','.join(batch) + ']'
+            batch, size = [], 2
+        batch.append(encoded)
+        size += len(encoded.encode('utf-8')) + 1
+    if batch:
+        yield '[' + ','.join(batch) + ']'
+
+
+class SlotSubscription:
+    """
+    Iterates over the events of one slot. Yields None every
+    ``heartbeat_seconds`` without events so the caller can keep the
+    connection alive, and stops after ``max_seconds``.
+    """
+    
+    def __init__(self, bus: SlotEventBus, slot_id: int, max_seconds: int, heartbeat_seconds: int):
+        self.bus = bus
+        self.slot_id = slot_id
+        self.max_seconds = max_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self.queue: queue.Queue = queue.Queue(maxsize=1000)
+    
+    def __iter__(self) -> Iterator[Optional[Dict]]:
+        deadline = time.monotonic() + self.max_seconds
+        try:
+            while time.monotonic() < deadline:
+                timeout = min(self.heartbeat_seconds, max(deadline - time.monotonic(), 0.1))
+                try:
+                    yield self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    yield None
+        finally:
+            self.close()
+    
+    def close(self):
+        self.bus.unsubscribe(self.slot_id, self.queue)
+
+
+# Global event bus instance
+slot_event_bus = SlotEventBus()
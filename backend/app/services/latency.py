@@ -0,0 +1,180 @@
+from sqlalchemy import func
+from datetime import datetime, timedelta, timezone
+import threading
+import logging
+from typing import Any, Dict, List, Optional, Set
+
+from app.models import db, ReservationAttempt, ReservationSlot, Area
+
+logger = logging.getLogger(__name__)
+
+LATENCY_GROUPS = ('area', 'slot', 'response_code')
+PERCENTILES = (('p50', 0.5), ('p90', 0.9), ('p99', 0.99))
+
+# Millisecond latency expressions; dispatch delay needs reservation_slots joined
+ROUND_TRIP_MS = func.extract(
+    'epoch', ReservationAttempt.response_received_at - ReservationAttempt.request_sent_at
+) * 1000
+DISPATCH_DELAY_MS = func.extract(
+    'epoch', ReservationAttempt.request_sent_at - ReservationSlot.scheduled_datetime
+) * 1000
+
+# Statistics of settled slots never change again, so they are kept in
+# process for the lifetime of the worker
+_settled_cache: Dict[tuple, Any] = {}
+_settled_cache_lock = threading.Lock()
+_SETTLED_CACHE_MAX_ENTRIES = 10000
+
+
+def latency_columns(name: str, expr) -> list:
+    """Count, percentiles and max of a millisecond expression, computed in the database"""
+    columns = [func.count(expr).label(f'{name}_count')]
+    for label, fraction in PERCENTILES:
+        columns.append(func.percentile_cont(fraction).within_group(expr).label(f'{name}_{label}'))
+    columns.append(func.max(expr).label(f'{name}_max'))
+    return columns
+
+
+def latency_stats(row, name: str) -> Dict[str, Any]:
+    """Shape the columns produced by latency_columns into a stats dictionary"""
+    stats = {'count': getattr(row, f'{name}_count')}
+    for label, _ in PERCENTILES:
+        value = getattr(row, f'{name}_{label}')
+        stats[f'{label}_ms'] = round(float(value), 2) if value is not None else None
+    value = getattr(row, f'{name}_max')
+    stats['max_ms'] = round(float(value), 2) if value is not None else None
+    return stats
+
+
+def _settled_slot_ids(settle_minutes: int, area_id: Optional[int] = None, slot_id: Optional[int] = None) -> Set[int]:
+    """Slots that are processed and old enough that no more webhooks are expected"""
+    settled_before = datetime.utcnow() - timedelta(minutes=settle_minutes)
+    query = db.session.query(ReservationSlot.id).filter(
+        ReservationSlot.is_processed.is_(True),
+        ReservationSlot.scheduled_datetime < settled_before
+    )
+    if area_id:
+        query = query.filter(ReservationSlot.area_id == area_id)
+    if slot_id:
+        query = query.filter(ReservationSlot.id == slot_id)
+    return {settled_id for settled_id, in query.all()}
+
+
+def _naive_utc(value: datetime) -> datetime:
+    return value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value
+
+
+def _remember(key: tuple, value: Any):
+    with _settled_cache_lock:
+        if len(_settled_cache) >= _SETTLED_CACHE_MAX_ENTRIES:
+            _settled_cache.pop(next(iter(_settled_cache)))
+        _settled_cache[key] = value
+
+
+def get_latency_stats(
+    group_by: str = 'area',
+    area_id: Optional[int] = None,
+    slot_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    settle_minutes: int = 60
+) -> List[Dict[str, Any]]:
+    """
+    Compute p50/p90/p99/max latencies of reservation attempts
+    
+    ``round_trip`` is request_sent_at -> response_received_at of answered
+    attempts; ``dispatch_delay`` is the slot's scheduled_datetime ->
+    request_sent_at, i.e. how late after T0 each request left.
+    
+    Args:
+        group_by: One of LATENCY_GROUPS
+        area_id: Only include slots of this area
+        slot_id: Only include this reservation slot
+        start: Lower bound on attempt created_at
+        end: Upper bound on attempt created_at
+        settle_minutes: Age after which a processed slot is considered final
+            and its statistics are served from cache
+    
+    Returns:
+        One dictionary per group with ``round_trip`` and ``dispatch_delay`` stats
+    """
+    if group_by == 'area':
+        group_columns = [Area.id.label('area_id'), Area.name.label('area_name')]
+    elif group_by == 'slot':
+        group_columns = [
+            ReservationSlot.id.label('reservation_slot_id'),
+            Area.name.label('area_name'),
+            ReservationSlot.scheduled_datetime.label('scheduled_datetime')
+        ]
+    else:
+        group_columns = [ReservationAttempt.response_code.label('response_code')]
+    
+    query = db.session.query(
+        *group_columns,
+        *latency_columns('round_trip', ROUND_TRIP_MS),
+        *latency_columns('dispatch_delay', DISPATCH_DELAY_MS)
+    ).join(
+        ReservationSlot, ReservationSlot.id == ReservationAttempt.reservation_slot_id
+    ).join(Area, Area.id == ReservationSlot.area_id)
+    
+    if area_id:
+        query = query.filter(Area.id == area_id)
+    if slot_id:
+        query = query.filter(ReservationSlot.id == slot_id)
+    if start:
+        query = query.filter(ReservationAttempt.created_at >= start)
+    if end:
+        query = query.filter(ReservationAttempt.created_at <= end)
+    
+    query_key = (group_by, area_id, slot_id, start, end)
+    
+    if group_by == 'slot':
+        # Percentiles cannot be merged across slots, but each slot row is
+        # final once the slot has settled and can be reused on its own
+        settled = _settled_slot_ids(settle_minutes, area_id, slot_id)
+        
+        cached = {}
+        for settled_id in settled:
+            entry = _settled_cache.get(('slot', settled_id, start, end))
+            if entry is not None:
+                cached[settled_id] = entry
+        
+        if cached:
+            query = query.filter(ReservationSlot.id.notin_(cached.keys()))
+        
+        results = list(cached.values())
+        for row in query.group_by(*group_columns).all():
+            result = {
+                'reservation_slot_id': row.reservation_slot_id,
+                'area_name': row.area_name,
+                'scheduled_datetime': row.scheduled_datetime.isoformat(),
+                'round_trip': latency_stats(row, 'round_trip'),
+                'dispatch_delay': latency_stats(row, 'dispatch_delay')
+            }
+            if row.reservation_slot_id in settled:
+                _remember(('slot', row.reservation_slot_id, start, end), result)
+            results.append(result)
+        
+        return sorted(results, key=lambda result: result['scheduled_datetime'])
+    
+    # Other groupings mix slots; the whole answer is only final when every
+    # attempt it covers belongs to the past
+    settled_before = datetime.utcnow() - timedelta(minutes=settle_minutes)
+    cacheable = (
+        (slot_id and slot_id in _settled_slot_ids(settle_minutes, slot_id=slot_id))
+        or (end and _naive_utc(end) < settled_before)
+    )
+    if cacheable and query_key in _settled_cache:
+        return _settled_cache[query_key]
+    
+    results = []
+    for row in query.group_by(*group_columns).order_by(*group_columns).all():
+        result = {column.key: getattr(row, column.key) for column in group_columns}
+        result['round_trip'] = latency_stats(row, 'round_trip')
+        result['dispatch_delay'] = latency_stats(row, 'dispatch_delay')
+        results.append(result)
+    
+    if cacheable:
+        _remember(query_key, results)
+    
+    return results
@@ -0,0 +1,233 @@
+from flask import current_app
+from sqlalchemy import func, literal, text
+from datetime import date, datetime
+import glob
+import gzip
+import io
+import logging
+import os
+import re
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import orjson
+
+from app.models import db, ReservationAttempt, ReservationSlot, TableVersion
+from app.services.payloads import PAYLOAD_FIELDS, is_overflow_stub, load_overflow
+
+try:
+    import zstandard
+except ImportError:  # optional, gzip is always available
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+PARTITION_NAME = re.compile(r'^reservation_attempts_p(\d{4})(\d{2})$')
+
+ARCHIVE_SUBDIR = 'reservation_attempts'
+
+# Archived rows keep the customer's national ID and the slot's area so they
+# stay searchable after those rows are gone
+ARCHIVE_QUERY = """
+    SELECT a.*, c.national_id AS customer_national_id, s.area_id
+    FROM {partition} a
+    LEFT JOIN customers c ON c.id = a.customer_id
+    LEFT JOIN reservation_slots s ON s.id = a.reservation_slot_id
+    ORDER BY a.id
+"""
+
+
+def slot_attempts_window():
+    """
+    Join condition between a slot and its attempts that lets PostgreSQL skip
+    the partitions older than the slot at run time; attempts are always
+    created after their slot
+    """
+    return ReservationAttempt.created_at >= func.coalesce(ReservationSlot.created_at, literal(datetime.min))
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def create_attempt_partitions() -> int:
+    """
+    Create the monthly partitions from the current month through
+    ATTEMPT_PARTITION_MONTHS_AHEAD months ahead
+    
+    Returns:
+        Number of partitions created
+    """
+    this_month = datetime.utcnow().date().replace(day=1)
+    created = db.session.execute(
+        text("SELECT create_reservation_attempt_partitions(:from_month, :to_month)"),
+        {
+            'from_month': this_month,
+            'to_month': _add_months(this_month, current_app.config['ATTEMPT_PARTITION_MONTHS_AHEAD'] + 1)
+        }
+    ).scalar()
+    db.session.commit()
+    
+    if created:
+        logger.info(f"Created {created} reservation_attempts partitions")
+    return created
+
+
+def list_attempt_partitions() -> List[Tuple[str, date]]:
+    """Monthly partitions attached to reservation_attempts, oldest first"""
+    names = db.session.execute(text("""
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'reservation_attempts'::regclass
+    """)).scalars()
+    
+    partitions = []
+    for name in names:
+        match = PARTITION_NAME.match(name)
+        if match:
+            partitions.append((name, date(int(match.group(1)), int(match.group(2)), 1)))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def _archive_writer(raw):
+    if zstandard is not None:
+        compressor = zstandard.ZstdCompressor(level=current_app.config['ATTEMPT_ARCHIVE_ZSTD_LEVEL'])
+        return compressor.stream_writer(raw, closefd=False)
+    return gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=9)
+
+
+def export_partition(partition: str, month: date) -> Tuple[str, int]:
+    """
+    Write a partition's rows to ``<ATTEMPT_ARCHIVE_DIR>/reservation_attempts/
+    YYYY-MM.ndjson.zst`` (``.ndjson.gz`` without the zstandard package), one
+    JSON object per line
+    
+    The file is written under a temporary name and renamed once complete,
+    so an archive on disk is never partial. Payloads moved to
+    payload_overflow are written out in full.
+    
+    Args:
+        partition: Partition table name, as returned by ``list_attempt_partitions``
+        month: Month the partition covers
+    
+    Returns:
+        (path, rows written)
+    """
+    directory = os.path.join(current_app.config['ATTEMPT_ARCHIVE_DIR'], ARCHIVE_SUBDIR)
+    os.makedirs(directory, exist_ok=True)
+    extension = 'ndjson.zst' if zstandard is not None else 'ndjson.gz'
+    path = os.path.join(directory, f"{month:%Y-%m}.{extension}")
+    partial_path = f"{path}.partial"
+    
+    result = db.session.execute(
+        text(ARCHIVE_QUERY.format(partition=partition)),
+        execution_options={'stream_results': True, 'max_row_buffer': 5000}
+    ).mappings()
+    
+    rows = 0
+    with open(partial_path, 'wb') as raw:
+        with _archive_writer(raw) as writer:
+            for row in result:
+                row = dict(row)
+                for field in PAYLOAD_FIELDS:
+                    if is_overflow_stub(row[field]):
+                        row[field] = load_overflow(row[field]['overflow_id'])
+                writer.write(orjson.dumps(row) + b'\n')
+                rows += 1
+        raw.flush()
+        os.fsync(raw.fileno())
+    
+    os.replace(partial_path, path)
+    return path, rows
+
+
+def archive_attempt_partitions() -> int:
+    """
+    Archive and drop the partitions older than ATTEMPT_RETENTION_MONTHS
+    
+    Each partition is exported while still attached (a read that does not
+    block writers), then detached and dropped. Everything happens in one
+    transaction, so a failure leaves the partitions in place and the next
+    run simply exports them again. Detaching fires no DELETE triggers, so the
+    attempt_rollups counters keep the archived months.
+    
+    Returns:
+        Number of partitions archived
+    """
+    retention_months = current_app.config['ATTEMPT_RETENTION_MONTHS']
+    if retention_months <= 0:
+        return 0
+    
+    cutoff = _add_months(datetime.utcnow().date().replace(day=1), -retention_months)
+    expired = [(name, month) for name, month in list_attempt_partitions() if month < cutoff]
+    if not expired:
+        db.session.commit()
+        return 0
+    
+    for name, month in expired:
+        path, rows = export_partition(name, month)
+        logger.info(f"Archived {rows} reservation attempts of {month:%Y-%m} to {path}")
+    
+    for name, month in expired:
+        # Rows still referencing a partition would block detaching it; old
+        # attempts that landed in the DEFAULT partition keep theirs
+        db.session.execute(
+            text("DELETE FROM payload_overflow WHERE attempt_created_at >= :month AND attempt_created_at < :next_month"),
+            {'month': month, 'next_month': _add_months(month, 1)}
+        )
+        db.session.execute(text(f"ALTER TABLE reservation_attempts DETACH PARTITION {name}"))
+        db.session.execute(text(f"DROP TABLE {name}"))
+    
+    # Detaching bypasses the statement triggers, so bump the version by hand
+    db.session.add(TableVersion(table_name='reservation_attempts', changes=1))
+    db.session.commit()
+    
+    return len(expired)
+
+
+def iter_archived_attempts(
+    archive_dir: str,
+    from_month: Optional[date] = None,
+    to_month: Optional[date] = None,
+    filters: Optional[Dict[str, Any]] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    Read archived reservation attempts without a database
+    
+    The archives are plain NDJSON, so other tools can read them too, e.g.
+    DuckDB's ``read_json_auto('archives/reservation_attempts/*.ndjson.zst')``.
+    
+    Args:
+        archive_dir: ATTEMPT_ARCHIVE_DIR of the deployment
+        from_month: First month to read (inclusive)
+        to_month: Last month to read (inclusive)
+        filters: Field values a row must match exactly, e.g.
+            ``{'customer_national_id': '1234567890'}``
+    
+    Yields:
+        Archived rows, oldest month first
+    """
+    filters = filters or {}
+    paths = sorted(glob.glob(os.path.join(archive_dir, ARCHIVE_SUBDIR, '*.ndjson.*')))
+    
+    for path in paths:
+        if path.endswith('.partial'):
+            continue
+        
+        month = datetime.strptime(os.path.basename(path)[:7], '%Y-%m').date()
+        if (from_month and month < from_month) or (to_month and month > to_month):
+            continue
+        
+        if path.endswith('.zst'):
+            if zstandard is None:
+                raise RuntimeError(f"The zstandard package is required to read {path}")
+            stream = io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(open(path, 'rb')), encoding='utf-8')
+        else:
+            stream = gzip.open(path, 'rt', encoding='utf-8')
+        
+        with stream:
+            for line in stream:
+                row = orjson.loads(line)
+                if all(row.get(field) == value for field, value in filters.items()):
+                    yield row
@@ -0,0 +1,141 @@
+from flask import current_app
+from sqlalchemy import literal, or_
+from sqlalchemy.dialects.postgresql import JSONB
+import logging
+import re
+import zlib
+from typing import Any, Dict, List, Optional
+
+import orjson
+
+from app.models import db, PayloadOverflow, ReservationAttempt
+
+try:
+    import zstandard
+except ImportError:  # optional, zlib is always available
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+PAYLOAD_FIELDS = ('request_payload', 'response_payload')
+
+# Keys allowed in PAYLOAD_INDEXED_KEYS; they end up in index DDL
+PAYLOAD_KEY = re.compile(r'^[A-Za-z0-9_]{1,40}$')
+
+# Query string prefix of the indexed payload key filters, e.g.
+# ?payload.reference=ABC123
+PAYLOAD_FILTER_PREFIX = 'payload.'
+
+
+def _compress(data: bytes) -> tuple:
+    if zstandard is not None:
+        return 'zstd', zstandard.ZstdCompressor(level=10).compress(data)
+    return 'zlib', zlib.compress(data, 9)
+
+
+def _decompress(codec: str, data: bytes) -> bytes:
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError('The zstandard package is required to read this payload')
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+def store_payload(attempt: ReservationAttempt, field: str, payload: Optional[Dict[str, Any]]) -> None:
+    """
+    Set an attempt's payload column, keeping the row narrow
+    
+    Empty payloads are stored as NULL. Payloads whose JSON encoding exceeds
+    PAYLOAD_MAX_BYTES are compressed into ``payload_overflow`` and the
+    column gets a ``{"overflow_id": ..., "size": ...}`` stub; the attempt
+    must already be flushed so its id is known.
+    
+    Args:
+        attempt: Reservation attempt
+        field: ``request_payload`` or ``response_payload``
+        payload: JSON object to store
+    """
+    if not payload:
+        setattr(attempt, field, None)
+        return
+    
+    encoded = orjson.dumps(payload)
+    if len(encoded) <= current_app.config['PAYLOAD_MAX_BYTES']:
+        setattr(attempt, field, payload)
+        return
+    
+    codec, data = _compress(encoded)
+    overflow = PayloadOverflow(
+        attempt_id=attempt.id,
+        attempt_created_at=attempt.created_at,
+        field=field,
+        codec=codec,
+        size=len(encoded),
+        data=data
+    )
+    db.session.add(overflow)
+    db.session.flush()
+    
+    setattr(attempt, field, {'overflow_id': overflow.id, 'size': len(encoded)})
+    logger.info(f"Moved {len(encoded)} byte {field} of attempt {attempt.id} to payload_overflow")
+
+
+def is_overflow_stub(value: Any) -> bool:
+    return isinstance(value, dict) and value.keys() == {'overflow_id', 'size'}
+
+
+def load_overflow(overflow_id: int) -> Optional[Dict[str, Any]]:
+    """Full payload of an overflow stub, or None if it is gone"""
+    overflow = PayloadOverflow.query.get(overflow_id)
+    if not overflow:
+        return None
+    return orjson.loads(_decompress(overflow.codec, overflow.data))
+
+
+def expand_payloads(attempt: Dict[str, Any]) -> Dict[str, Any]:
+    """Replace the overflow stubs of a serialized attempt with the full payloads"""
+    for field in PAYLOAD_FIELDS:
+        if is_overflow_stub(attempt.get(field)):
+            attempt[field] = load_overflow(attempt[field]['overflow_id'])
+    return attempt
+
+
+def payload_filters(args) -> List[Any]:
+    """
+    SQL conditions for the ``payload.<key>=<value>`` query parameters
+    
+    Only keys listed in PAYLOAD_INDEXED_KEYS are accepted, since only those
+    are backed by a GIN index. A value matches both as a string and, when it
+    parses as JSON (e.g. ``42`` or ``true``), as that JSON value.
+    
+    Args:
+        args: Request query arguments
+    
+    Raises:
+        ValueError: On a key that is not indexed
+    """
+    indexed = set(current_app.config['PAYLOAD_INDEXED_KEYS'])
+    conditions = []
+    
+    for name, value in args.items():
+        if not name.startswith(PAYLOAD_FILTER_PREFIX):
+            continue
+        
+        key = name[len(PAYLOAD_FILTER_PREFIX):]
+        if key not in indexed:
+            raise ValueError(f"Payload key {key!r} is not indexed (see PAYLOAD_INDEXED_KEYS)")
+        
+        candidates = [value]
+        try:
+            parsed = orjson.loads(value)
+        except orjson.JSONDecodeError:
+            parsed = value
+        if parsed != value:
+            candidates.append(parsed)
+        
+        # Spelled exactly like the index expression, see payload_index_updates
+        expression = ReservationAttempt.response_payload.op('->', return_type=JSONB)('additional_data') \
+            .op('->', return_type=JSONB)(key)
+        conditions.append(or_(*(expression.contains(literal(candidate, JSONB)) for candidate in candidates)))
+    
+    return conditions
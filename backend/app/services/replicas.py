@@ -0,0 +1,170 @@
+from flask import request
+import hashlib
+import logging
+import random
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from app.models import db
+from app.services.cache import MemoryCacheBackend, analytics_cache
+
+logger = logging.getLogger(__name__)
+
+# SQLALCHEMY_BINDS keys of the replica engines
+REPLICA_BIND_PREFIX = 'replica_'
+
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# How long the WAL position of a client's last write is remembered
+WRITE_MARKER_TTL = 300
+
+# Replay position and age of the last replayed transaction. A URL pointing
+# at a primary reports its current position and no lag.
+REPLICA_STATUS_QUERY = """
+    SELECT
+        CASE WHEN pg_is_in_recovery() THEN pg_last_wal_replay_lsn() ELSE pg_current_wal_lsn() END::text,
+        CASE WHEN pg_is_in_recovery() THEN EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) ELSE 0 END
+"""
+
+
+def _parse_lsn(lsn: str) -> int:
+    high, low = lsn.split('/')
+    return (int(high, 16) << 32) + int(low, 16)
+
+
+class ReplicaRouter:
+    """
+    Sends the database reads of GET requests to read replicas.
+    
+    Every REPLICA_CHECK_SECONDS each worker compares the replicas' replay
+    position with the primary's WAL position. A replica is eligible when it
+    has replayed everything, or when its last replayed transaction is at
+    most REPLICA_MAX_LAG_SECONDS old; unreachable replicas are skipped until
+    the next check. Without an eligible replica the request reads from the
+    primary.
+    
+    After a successful write request the primary's WAL position is stored
+    for the client (keyed by its bearer token), and that client's reads stay
+    on the primary until a replica has replayed past it. Positions live in
+    the analytics cache backend, so with the filesystem and redis backends
+    they reach every worker. Responses cached by analytics_cache may be
+    built from replica data up to REPLICA_MAX_LAG_SECONDS old.
+    """
+    
+    def __init__(self, app=None):
+        self.replicas: List[str] = []
+        self.max_lag = 0.0
+        self.check_interval = 0.0
+        self._status: Dict[str, Tuple[int, float]] = {}
+        self._checked_at = float('-inf')
+        self._check_lock = threading.Lock()
+        self._local_markers = MemoryCacheBackend(10000)
+        
+        if app:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        """Register the request hooks when replicas are configured"""
+        binds = app.config.get('SQLALCHEMY_BINDS') or {}
+        self.replicas = sorted(key for key in binds if key.startswith(REPLICA_BIND_PREFIX))
+        # Delta sync re-reads the last SYNC_OVERLAP_SECONDS, so a replica
+        # lagging more could make clients skip rows for good
+        self.max_lag = min(app.config['REPLICA_MAX_LAG_SECONDS'], app.config['SYNC_OVERLAP_SECONDS'])
+        self.check_interval = app.config['REPLICA_CHECK_SECONDS']
+        
+        if not self.replicas:
+            return
+        
+        app.before_request(self._route_request)
+        app.after_request(self._remember_write)
+        logger.info(f"Read replicas: {', '.join(self.replicas)} (max lag {self.max_lag}s)")
+    
+    def _check(self):
+        with db.engine.connect() as connection:
+            primary_lsn = _parse_lsn(connection.exec_driver_sql("SELECT pg_current_wal_lsn()::text").scalar())
+        
+        status = {}
+        for key in self.replicas:
+            try:
+                with db.engines[key].connect() as connection:
+                    lsn, lag = connection.exec_driver_sql(REPLICA_STATUS_QUERY).one()
+            except Exception as e:
+                logger.warning(f"Read replica {key} unavailable: {str(e)}")
+                continue
+            
+            lsn = _parse_lsn(lsn)
+            if lsn >= primary_lsn:
+                lag = 0.0
+            status[key] = (lsn, float(lag) if lag is not None else float('inf'))
+        
+        self._status = status
+    
+    def replica_status(self) -> Dict[str, Tuple[int, float]]:
+        """
+        Replay position and lag in seconds of each reachable replica, as of
+        the last check. One request per REPLICA_CHECK_SECONDS runs the check;
+        concurrent ones use the previous result.
+        """
+        if time.monotonic() - self._checked_at >= self.check_interval and self._check_lock.acquire(blocking=False):
+            try:
+                self._check()
+            except Exception as e:
+                logger.error(f"Could not check read replicas: {str(e)}")
+                self._status = {}
+            finally:
+                self._checked_at = time.monotonic()
+                self._check_lock.release()
+        
+        return self._status
+    
+    def _markers(self):
+        return analytics_cache.backend or self._local_markers
+    
+    @staticmethod
+    def _client() -> Optional[str]:
+        authorization = request.headers.get('Authorization')
+        if not authorization:
+            return None
+        return 'replica-write:' + hashlib.sha1(authorization.encode('utf-8')).hexdigest()
+    
+    def _route_request(self):
+        if request.method not in READ_METHODS:
+            return
+        
+        written = 0
+        client = self._client()
+        if client:
+            try:
+                marker = self._markers().get(client)
+            except Exception as e:
+                logger.error(f"Could not read write position: {str(e)}")
+                return
+            written = int(marker) if marker else 0
+        
+        eligible = [
+            key for key, (lsn, lag) in self.replica_status().items()
+            if lsn >= written and lag <= self.max_lag
+        ]
+        if eligible:
+            db.session.info['replica'] = random.choice(eligible)
+    
+    def _remember_write(self, response):
+        if request.method in READ_METHODS or response.status_code >= 400:
+            return response
+        
+        client = self._client()
+        if not client:
+            return response
+        
+        try:
+            with db.engine.connect() as connection:
+                lsn = connection.exec_driver_sql("SELECT pg_current_wal_lsn()::text").scalar()
+            self._markers().set(client, str(_parse_lsn(lsn)).encode(), WRITE_MARKER_TTL)
+        except Exception as e:
+            logger.error(f"Could not record write position: {str(e)}")
+        
+        return response
+
+
+replica_router = ReplicaRouter()
@@ -0,0 +1,174 @@
+from sqlalchemy import func, text
+from datetime import datetime
+import logging
+from typing import Any, Dict, List, Optional
+
+from app.models import db, AttemptRollup, ReservationAttempt
+
+logger = logging.getLogger(__name__)
+
+GRANULARITIES = ('minute', 'hour', 'day')
+GROUP_BY_OPTIONS = ('total', 'area', 'slot')
+
+
+def get_attempt_timeseries(
+    granularity: str = 'hour',
+    group_by: str = 'area',
+    area_id: Optional[int] = None,
+    slot_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+) -> List[Dict[str, Any]]:
+    """
+    Aggregate the per-minute attempt rollups into time buckets
+    
+    Args:
+        granularity: Bucket size, one of GRANULARITIES
+        group_by: Series split, one of GROUP_BY_OPTIONS
+        area_id: Only include this area
+        slot_id: Only include this reservation slot
+        start: Inclusive lower bound on bucket start (UTC)
+        end: Inclusive upper bound on bucket start (UTC)
+    
+    Returns:
+        One dictionary per (bucket, series) ordered by bucket
+    """
+    bucket = func.date_trunc(granularity, AttemptRollup.bucket_start).label('bucket')
+    group_columns = [bucket]
+    if group_by in ('area', 'slot'):
+        group_columns.append(AttemptRollup.area_id)
+    if group_by == 'slot':
+        group_columns.append(AttemptRollup.reservation_slot_id)
+    
+    query = db.session.query(
+        *group_columns,
+        func.sum(AttemptRollup.attempts_sent),
+        func.sum(AttemptRollup.responses_received),
+        func.sum(AttemptRollup.success_count),
+        func.sum(AttemptRollup.failed_count)
+    )
+    
+    if area_id:
+        query = query.filter(AttemptRollup.area_id == area_id)
+    if slot_id:
+        query = query.filter(AttemptRollup.reservation_slot_id == slot_id)
+    if start:
+        query = query.filter(AttemptRollup.bucket_start >= start)
+    if end:
+        query = query.filter(AttemptRollup.bucket_start <= end)
+    
+    rows = query.group_by(*group_columns).order_by(*group_columns).all()
+    
+    series = []
+    for row in rows:
+        sent, responses, success, failed = (int(value or 0) for value in row[-4:])
+        if not (sent or responses):
+            continue
+        
+        point = {'bucket': row[0].isoformat()}
+        if group_by in ('area', 'slot'):
+            point['area_id'] = row[1]
+        if group_by == 'slot':
+            point['reservation_slot_id'] = row[2]
+        point.update({
+            'attempts_sent': sent,
+            'responses_received': responses,
+            'success_count': success,
+            'failed_count': failed
+        })
+        series.append(point)
+    
+    return series
+
+
+def compact_attempt_rollups() -> int:
+    """
+    Fold the delta rows of every bucket touched since the previous run into a
+    single compacted row per (bucket, area, slot). Buckets of deleted slots
+    are dropped.
+    
+    Returns:
+        Number of compacted rows written
+    """
+    result = db.session.execute(text("""
+        WITH touched AS (
+            SELECT DISTINCT bucket_start, reservation_slot_id
+            FROM attempt_rollups
+            WHERE NOT compacted
+        ),
+        folded AS (
+            DELETE FROM attempt_rollups r
+            USING touched t
+            WHERE r.bucket_start = t.bucket_start
+              AND r.reservation_slot_id IS NOT DISTINCT FROM t.reservation_slot_id
+            RETURNING r.*
+        )
+        INSERT INTO attempt_rollups (
+            bucket_start, area_id, reservation_slot_id,
+            attempts_sent, responses_received, success_count, failed_count, compacted
+        )
+        SELECT bucket_start, area_id, reservation_slot_id,
+               SUM(attempts_sent), SUM(responses_received),
+               SUM(success_count), SUM(failed_count), TRUE
+        FROM folded f
+        WHERE EXISTS (SELECT 1 FROM reservation_slots s WHERE s.id = f.reservation_slot_id)
+        GROUP BY bucket_start, area_id, reservation_slot_id
+        HAVING SUM(attempts_sent) <> 0 OR SUM(responses_received) <> 0
+            OR SUM(success_count) <> 0 OR SUM(failed_count) <> 0
+    """))
+    db.session.commit()
+    return result.rowcount
+
+
+def rebuild_attempt_rollups() -> int:
+    """
+    Recompute every rollup from ``reservation_attempts``
+    
+    Clearing and re-inserting happen in one statement, i.e. from one snapshot:
+    deltas of writes committed after it survive the DELETE and are not
+    counted by the INSERT, so concurrent traffic is neither lost nor doubled.
+    
+    Returns:
+        Number of compacted rows written
+    """
+    result = db.session.execute(text("""
+        WITH cleared AS (
+            DELETE FROM attempt_rollups
+        ),
+        contributions AS (
+            SELECT x.bucket_start, s.area_id, a.reservation_slot_id,
+                   x.sent, x.responses, x.success, x.failed
+            FROM reservation_attempts a
+            JOIN reservation_slots s ON s.id = a.reservation_slot_id
+            CROSS JOIN LATERAL (VALUES
+                (date_trunc('minute', a.request_sent_at), 1, 0, 0, 0),
+                (date_trunc('minute', a.response_received_at), 0, 1,
+                 COALESCE((a.response_status = 'SUCCESS')::int, 0),
+                 COALESCE((a.response_status = 'FAILED')::int, 0))
+            ) AS x(bucket_start, sent, responses, success, failed)
+            WHERE x.bucket_start IS NOT NULL
+        )
+        INSERT INTO attempt_rollups (
+            bucket_start, area_id, reservation_slot_id,
+            attempts_sent, responses_received, success_count, failed_count, compacted
+        )
+        SELECT bucket_start, area_id, reservation_slot_id,
+               SUM(sent), SUM(responses), SUM(success), SUM(failed), TRUE
+        FROM contributions
+        GROUP BY bucket_start, area_id, reservation_slot_id
+    """))
+    db.session.commit()
+    
+    logger.info(f"Rebuilt attempt rollups: {result.rowcount} buckets")
+    return result.rowcount
+
+
+def backfill_attempt_rollups() -> int:
+    """Rebuild the rollups once when attempts exist but no rollup has been recorded yet"""
+    has_rollups = db.session.query(AttemptRollup.id).limit(1).first() is not None
+    has_attempts = db.session.query(ReservationAttempt.id).limit(1).first() is not None
+    
+    if has_rollups or not has_attempts:
+        return 0
+    
+    return rebuild_attempt_rollups()
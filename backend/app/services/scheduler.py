@@ -1,13 +1,48 @@
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.date import DateTrigger
+from apscheduler.triggers.interval import IntervalTrigger
+from flask import g
+from opentelemetry import trace
+from sqlalchemy import text
+from contextlib import contextmanager
 from datetime import datetime
 import logging
-from typing import Optional
+import time
+from typing import Callable, List, Optional
 
 from app.models import db, ReservationSlot, Customer, ReservationAttempt
+from app.services.area_deletion import get_active_deletion, resume_area_deletions, run_area_deletion
+from app.services.cache import analytics_cache
+from app.services.db_pools import SCHEDULER_BIND
+from app.services.events import slot_event_bus
+from app.services.partitions import archive_attempt_partitions, create_attempt_partitions
+from app.services.payloads import store_payload
+from app.services.rollups import backfill_attempt_rollups, compact_attempt_rollups
+from app.services.slot_reports import refresh_slot_reports, write_slot_report
+from app.services.slow_queries import prune_slow_queries
+from app.services.status_counts import compact_status_counts, reconcile_status_counts
+from app.services.sync import prune_tombstones
+from app.services.table_versions import compact_table_versions
 from app.services.uipath_client import UiPathClient
+from app.utils.metrics import (
+    DISPATCH_REQUESTS,
+    SCHEDULER_JOB_DURATION,
+    SCHEDULER_JOBS,
+    SLOT_DISPATCH_DURATION,
+    SLOT_DISPATCH_LAG,
+    SLOT_DISPATCHES_IN_PROGRESS
+)
+from app.utils.profiling import profiled
+from app.utils.tracing import correlation_id, record_error, tracer
 
 logger = logging.getLogger(__name__)
+# One line per customer sent; rate limited by LOG_RATE_LIMITS
+dispatch_logger = logging.getLogger(f'{__name__}.dispatch')
+
+
+def _record_job(job_name: str, started: float, outcome: str):
+    SCHEDULER_JOBS.labels(job_name, outcome).inc()
+    SCHEDULER_JOB_DURATION.labels(job_name).observe(time.perf_counter() - started)
 
 
 class ReservationScheduler:
@@ -36,10 +71,231 @@ class ReservationScheduler:
         # Configure scheduler
         self.scheduler.configure(timezone=app.config['SCHEDULER_TIMEZONE'])
         
+        if not app.config['SCHEDULER_ENABLED']:
+            logger.info("Reservation scheduler disabled")
+            return
+        
         # Start scheduler
         if not self.scheduler.running:
             self.scheduler.start()
             logger.info("Reservation scheduler started")
+        
+        self.schedule_maintenance_jobs()
+    
+    def schedule_maintenance_jobs(self):
+        """Schedule the periodic jobs that keep derived tables in sync"""
+        config = self.app.config
+        
+        self.scheduler.add_job(
+            func=self._run_exclusive,
+            trigger=IntervalTrigger(seconds=config['STATUS_COUNTS_COMPACT_SECONDS']),
+            args=['compact_status_counts', compact_status_counts],
+            id='compact_status_counts',
+            name='Compact area status counts',
+            coalesce=True,
+            max_instances=1,
+            replace_existing=True
+        )
+        
+        # Also runs once at startup to backfill an empty counts table
+        self.scheduler.add_job(
+            func=self._run_exclusive,
+            trigger=IntervalTrigger(minutes=config['STATUS_COUNTS_RECONCILE_MINUTES']),
+            args=['reconcile_status_counts', reconcile_status_counts],
+            id='reconcile_status_counts',
+            name='Reconcile area status counts',
+            next_run_time=datetime.now(self.scheduler.timezone),
+            coalesce=True,
+            max_instances=1,
+            replace_existing=True
+        )
+        
+        self.scheduler.add_job(
+            func=self._run_exclusive,
+            trigger=IntervalTrigger(seconds=config['ATTEMPT_ROLLUPS_COMPACT_SECONDS']),
+            args=['compact_attempt_rollups', compact_attempt_rollups],
+            id='compact_attempt_rollups',
+            name='Compact attempt rollups',
+            coalesce=True,
+            max_instances=1,
+            replace_existing=True
+        )
+        
+        self.scheduler.add_job(
+            func=self._run_exclusive,
+            trigger=DateTrigger(run_date=datetime.now(self.scheduler.timezone)),
+            args=['backfill_attempt_rollups', backfill_attempt_rollups],
+            id='backfill_attempt_rollups',
+            name='Backfill attempt rollups',
+            replace_existing=True
+        )
+        
+        self.scheduler.add_job(
+            func=self._run_exclusive,
+            trigger=IntervalTrigger(seconds=config['SLOT_REPORT_REFRESH_SECONDS']),
+            args=['refresh_slot_reports', refresh_slot_reports],
+            id='refresh_slot_reports',
+            name='Refresh slot reports',
+            coalesce=True,
+            max_instances=1,
+            replace_existing=True
+        )
+        
+        self.scheduler.add_job(
+            func=self._run_exclusive,
+            trigger=IntervalTrigger(seconds=config['TABLE_VERSIONS_COMPACT_SECONDS']),
+            args=['compact_table_versions', compact_table_versions],
+            id='compact_table_versions',
+            name='Compact table versions',
+            coalesce=True,
+            max_instances=1,
+            replace_existing=True
+        )
+        
+        self.scheduler.add_job(
+            func=self._run_exclusive,
+            trigger=IntervalTrigger(hours=1),
+            args=['prune_tombstones', prune_tombstones],
+            id='prune_tombstones',
+            name='Prune delta sync tombstones',
+            coalesce=True,
+            max_instances=1,
+            replace_existing=True
+        )
+        
+        self.scheduler.add_job(
+            func=self._run_exclusive,
+            trigger=IntervalTrigger(hours=1),
+            args=['prune_slow_queries', prune_slow_queries],
+            id='prune_slow_queries',
+            name='Prune slow query log',
+            coalesce=True,
+            max_instances=1,
+            replace_existing=True
+        )
+        
+        # Also runs once at startup so the coming months always have a partition
+        self.scheduler.add_job(
+            func=self._run_exclusive,
+            trigger=IntervalTrigger(days=1),
+            args=['create_attempt_partitions', create_attempt_partitions],
+            id='create_attempt_partitions',
+            name='Create reservation attempt partitions',
+            next_run_time=datetime.now(self.scheduler.timezone),
+            coalesce=True,
+            max_instances=1,
+            replace_existing=True
+        )
+        
+        self.scheduler.add_job(
+            func=self._run_exclusive,
+            trigger=IntervalTrigger(days=1),
+            args=['archive_attempt_partitions', archive_attempt_partitions],
+            id='archive_attempt_partitions',
+            name='Archive expired reservation attempt partitions',
+            coalesce=True,
+            max_instances=1,
+            replace_existing=True
+        )
+        
+        # Picks up area deletions interrupted by a restart
+        self.scheduler.add_job(
+            func=self._run_in_app_context,
+            trigger=DateTrigger(run_date=datetime.now(self.scheduler.timezone)),
+            args=['resume_area_deletions', resume_area_deletions],
+            id='resume_area_deletions',
+            name='Resume area deletions',
+            replace_existing=True
+        )
+    
+    @contextmanager
+    def _job_context(self, job_name: str):
+        """
+        App context whose session draws from the scheduler's connection pool
+        
+        Args:
+            job_name: Reported as the source of slow queries
+        """
+        with self.app.app_context():
+            db.session.info['pool'] = SCHEDULER_BIND
+            g.job = job_name
+            yield
+    
+    def _run_exclusive(self, job_name: str, func: Callable):
+        """
+        Run a maintenance job unless another worker process is already running it
+        
+        Args:
+            job_name: Name used to derive the advisory lock key
+            func: Job body, expected to commit its own transaction
+        """
+        started = time.perf_counter()
+        with self._job_context(job_name):
+            try:
+                acquired = db.session.execute(
+                    text("SELECT pg_try_advisory_xact_lock(hashtext(:name))"),
+                    {'name': job_name}
+                ).scalar()
+                if not acquired:
+                    db.session.rollback()
+                    _record_job(job_name, started, 'skipped')
+                    return
+                
+                func()
+                _record_job(job_name, started, 'success')
+            
+            except Exception as e:
+                logger.error(f"Error running maintenance job {job_name}: {str(e)}")
+                db.session.rollback()
+                _record_job(job_name, started, 'error')
+    
+    def _run_in_app_context(self, job_name: str, func: Callable, *args):
+        """
+        Run a job that coordinates with other worker processes on its own
+        (e.g. by claiming rows), so it must not hold a transaction-scoped lock
+        
+        Args:
+            job_name: Name used in log messages
+            func: Job body, expected to commit its own transactions
+            args: Positional arguments for ``func``
+        """
+        started = time.perf_counter()
+        with self._job_context(job_name):
+            try:
+                func(*args)
+                _record_job(job_name, started, 'success')
+            except Exception as e:
+                logger.error(f"Error running job {job_name}: {str(e)}")
+                db.session.rollback()
+                _record_job(job_name, started, 'error')
+    
+    def schedule_area_deletion(self, deletion_id: int):
+        """
+        Run a background area deletion as soon as possible
+        
+        Args:
+            deletion_id: ID of the area deletion
+        """
+        self.scheduler.add_job(
+            func=self._run_in_app_context,
+            trigger=DateTrigger(run_date=datetime.now(self.scheduler.timezone)),
+            args=['run_area_deletion', run_area_deletion, deletion_id],
+            id=f"area_deletion_{deletion_id}",
+            name=f"Delete area (deletion {deletion_id})",
+            replace_existing=True
+        )
+    
+    def unschedule_reservation_slots(self, slot_ids: List[int]):
+        """
+        Drop the pending jobs of reservation slots that are about to be deleted
+        
+        Args:
+            slot_ids: IDs of the reservation slots
+        """
+        for slot_id in slot_ids:
+            job_id = f"reservation_slot_{slot_id}"
+            if self.scheduler.get_job(job_id):
+                self.scheduler.remove_job(job_id)
     
     def schedule_reservation_slot(self, slot_id: int, scheduled_datetime: datetime):
         """
@@ -68,6 +324,8 @@ class ReservationScheduler:
         
         logger.info(f"Scheduled reservation slot {slot_id} for {scheduled_datetime}")
     
+    @tracer.start_as_current_span('reservation_slot.process')
+    @profiled('slot', lambda self, slot_id: f"slot_{slot_id}")
     def _process_reservation_slot(self, slot_id: int):
         """
         Process a reservation slot by sending requests for all customers in that area
@@ -75,7 +333,12 @@ class ReservationScheduler:
         Args:
             slot_id: ID of the reservation slot to process
         """
-        with self.app.app_context():
+        started = time.perf_counter()
+        dispatching = False
+        outcome = 'skipped'
+        span = trace.get_current_span()
+        span.set_attribute('slot.id', slot_id)
+        with self._job_context('process_reservation_slot'):
             try:
                 # Get the reservation slot
                 slot = ReservationSlot.query.get(slot_id)
@@ -87,6 +350,21 @@ class ReservationScheduler:
                     logger.warning(f"Reservation slot {slot_id} already processed")
                     return
                 
+                # Other worker processes may still hold a job for this slot
+                if get_active_deletion(slot.area_id):
+                    logger.warning(f"Area of reservation slot {slot_id} is being deleted, skipping")
+                    return
+                
+                lag = max((datetime.utcnow() - slot.scheduled_datetime).total_seconds(), 0)
+                SLOT_DISPATCH_LAG.observe(lag)
+                span.set_attributes({
+                    'area.id': slot.area_id,
+                    'slot.scheduled_datetime': slot.scheduled_datetime.isoformat(),
+                    'slot.dispatch_lag_seconds': lag
+                })
+                SLOT_DISPATCHES_IN_PROGRESS.inc()
+                dispatching = True
+                
                 # Get all customers with OPEN status for this area
                 customers = Customer.query.filter_by(
                     area_id=slot.area_id,
@@ -94,66 +372,122 @@ class ReservationScheduler:
                 ).all()
                 
                 logger.info(f"Processing {len(customers)} customers for slot {slot_id}, area: {slot.area.name}")
+                span.set_attribute('slot.customers_targeted', len(customers))
+                
+                slot_event_bus.publish(slot_id, 'started', {'customers_targeted': len(customers)})
+                db.session.commit()
                 
                 # Process each customer
+                requests_sent = 0
                 for customer in customers:
-                    self._send_reservation_request(customer, slot)
+                    if self._send_reservation_request(customer, slot):
+                        requests_sent += 1
                 
                 # Mark slot as processed
                 slot.is_processed = True
+                span.set_attribute('slot.requests_sent', requests_sent)
+                slot_event_bus.publish(slot_id, 'completed', {
+                    'customers_targeted': len(customers),
+                    'requests_sent': requests_sent,
+                    'send_failures': len(customers) - requests_sent
+                })
                 db.session.commit()
+                analytics_cache.invalidate('analytics')
                 
-                logger.info(f"Completed processing reservation slot {slot_id}")
+                write_slot_report(
+                    slot_id,
+                    customers_targeted=len(customers),
+                    requests_sent=requests_sent,
+                    send_failures=len(customers) - requests_sent
+                )
                 
+                logger.info(f"Completed processing reservation slot {slot_id}")
+                outcome = 'success'
+            
             except Exception as e:
                 logger.error(f"Error processing reservation slot {slot_id}: {str(e)}")
+                record_error(e)
                 db.session.rollback()
+                outcome = 'error'
+            
+            finally:
+                if dispatching:
+                    SLOT_DISPATCHES_IN_PROGRESS.dec()
+                    SLOT_DISPATCH_DURATION.observe(time.perf_counter() - started)
+                _record_job('process_reservation_slot', started, outcome)
     
-    def _send_reservation_request(self, customer: Customer, slot: ReservationSlot):
+    @tracer.start_as_current_span('reservation.send')
+    def _send_reservation_request(self, customer: Customer, slot: ReservationSlot) -> bool:
         """
         Send reservation request for a single customer
         
         Args:
             customer: Customer to process
             slot: Reservation slot
+        
+        Returns:
+            True if UiPath accepted the request
         """
+        span = trace.get_current_span()
+        span.set_attribute('customer.id', customer.id)
+        # Sent to UiPath and echoed by its callback, linking both to this span
+        correlation = correlation_id()
         try:
             # Create reservation attempt record
             attempt = ReservationAttempt(
                 customer_id=customer.id,
                 reservation_slot_id=slot.id,
-                request_sent_at=datetime.utcnow(),
-                request_payload={
-                    'national_id': customer.national_id,
-                    'phone_number': customer.phone_number,
-                    'area': slot.area.name
-                }
+                request_sent_at=datetime.utcnow()
             )
             db.session.add(attempt)
             db.session.flush()  # Get the attempt ID
+            span.set_attribute('attempt.id', attempt.id)
+            additional_data = {'correlation_id': correlation} if correlation else None
+            store_payload(attempt, 'request_payload', {
+                'national_id': customer.national_id,
+                'phone_number': customer.phone_number,
+                'area': slot.area.name,
+                **(additional_data or {})
+            })
             
             # Send request to UiPath
             response = self.uipath_client.send_reservation_request(
                 national_id=customer.national_id,
                 phone_number=customer.phone_number,
-                area=slot.area.name
+                area=slot.area.name,
+                additional_data=additional_data
             )
+            span.set_attribute('reservation.accepted', response.get('success', False))
             
             # Update attempt with response (if immediate response)
             # Note: The actual status update will come via webhook
-            attempt.response_payload = response.get('data', {})
+            store_payload(attempt, 'response_payload', response.get('data'))
             
+            slot_event_bus.publish(slot.id, 'dispatch', {
+                'attempt_id': attempt.id,
+                'customer_id': customer.id,
+                'accepted': response.get('success', False),
+                'request_sent_at': attempt.request_sent_at.isoformat()
+            })
             db.session.commit()
             
-            logger.info(f"Sent reservation request for customer {customer.id} (national_id: {customer.national_id})")
-            
+            DISPATCH_REQUESTS.labels('accepted' if response.get('success') else 'rejected').inc()
+            dispatch_logger.info(
+                "Sent reservation request for customer %s (national_id: %s)", customer.id, customer.national_id,
+                extra={'customer_id': customer.id, 'slot_id': slot.id, 'attempt_id': attempt.id}
+            )
+            return response.get('success', False)
+        
         except Exception as e:
+            DISPATCH_REQUESTS.labels('error').inc()
             logger.error(f"Error sending reservation request for customer {customer.id}: {str(e)}")
+            record_error(e)
             db.session.rollback()
+            return False
     
     def reschedule_all_pending_slots(self):
         """Reschedule all pending (non-processed) reservation slots on app startup"""
-        with self.app.app_context():
+        with self._job_context('reschedule_all_pending_slots'):
             try:
                 pending_slots = ReservationSlot.query.filter_by(is_processed=False).all()
                 
@@ -165,7 +499,7 @@ class ReservationScheduler:
                         logger.warning(f"Slot {slot.id} scheduled time has passed, skipping")
                 
                 logger.info(f"Rescheduled {len(pending_slots)} pending reservation slots")
-                
+            
             except Exception as e:
                 logger.error(f"Error rescheduling pending slots: {str(e)}")
     
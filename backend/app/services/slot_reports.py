@@ -0,0 +1,112 @@
+from sqlalchemy import func
+from datetime import datetime, timedelta
+import logging
+from typing import Optional
+
+from app.models import db, ReservationAttempt, ReservationSlot, SlotReport
+from app.services.latency import DISPATCH_DELAY_MS, ROUND_TRIP_MS, latency_columns, latency_stats
+from app.services.partitions import slot_attempts_window
+
+logger = logging.getLogger(__name__)
+
+# response_received_at is stamped before the webhook transaction commits, so
+# a response may become visible with a timestamp slightly older than the last
+# refresh; re-checking this window keeps such late commits from being missed
+REFRESH_OVERLAP = timedelta(minutes=1)
+
+
+def _refresh_response_stats(report: SlotReport):
+    """Recompute the webhook-driven fields of a report from its slot's attempts"""
+    slot_id = report.reservation_slot_id
+    
+    row = db.session.query(
+        func.count(ReservationAttempt.response_received_at).label('responses'),
+        func.count(ReservationAttempt.id).filter(ReservationAttempt.response_status == 'SUCCESS').label('success'),
+        func.count(ReservationAttempt.id).filter(ReservationAttempt.response_status == 'FAILED').label('failed'),
+        func.min(ReservationAttempt.request_sent_at).label('first_sent_at'),
+        func.max(ReservationAttempt.request_sent_at).label('last_sent_at'),
+        *latency_columns('round_trip', ROUND_TRIP_MS),
+        *latency_columns('dispatch_delay', DISPATCH_DELAY_MS)
+    ).join(
+        ReservationSlot, (ReservationSlot.id == ReservationAttempt.reservation_slot_id) & slot_attempts_window()
+    ).filter(ReservationAttempt.reservation_slot_id == slot_id).one()
+    
+    codes = db.session.query(
+        ReservationAttempt.response_code,
+        func.count(ReservationAttempt.id)
+    ).join(
+        ReservationSlot, (ReservationSlot.id == ReservationAttempt.reservation_slot_id) & slot_attempts_window()
+    ).filter(
+        ReservationAttempt.reservation_slot_id == slot_id,
+        ReservationAttempt.response_code.isnot(None)
+    ).group_by(ReservationAttempt.response_code).all()
+    
+    report.responses_received = row.responses
+    report.success_count = row.success
+    report.failed_count = row.failed
+    report.first_sent_at = row.first_sent_at
+    report.last_sent_at = row.last_sent_at
+    report.response_codes = {str(code): count for code, count in codes}
+    report.latency = {
+        'round_trip': latency_stats(row, 'round_trip'),
+        'dispatch_delay': latency_stats(row, 'dispatch_delay')
+    }
+    report.refreshed_at = datetime.utcnow()
+
+
+def write_slot_report(slot_id: int, customers_targeted: int, requests_sent: int, send_failures: int) -> SlotReport:
+    """
+    Materialize the report of a slot whose dispatch just finished
+    
+    Args:
+        slot_id: Processed reservation slot
+        customers_targeted: Customers selected for the slot
+        requests_sent: Requests accepted by UiPath
+        send_failures: Requests that errored or were rejected by UiPath
+    
+    Returns:
+        The committed report
+    """
+    report = db.session.get(SlotReport, slot_id) or SlotReport(reservation_slot_id=slot_id)
+    report.customers_targeted = customers_targeted
+    report.requests_sent = requests_sent
+    report.send_failures = send_failures
+    report.completed_at = datetime.utcnow()
+    _refresh_response_stats(report)
+    
+    db.session.add(report)
+    db.session.commit()
+    return report
+
+
+def get_slot_report(slot_id: int) -> Optional[SlotReport]:
+    """Primary-key lookup of a slot report"""
+    return db.session.get(SlotReport, slot_id)
+
+
+def refresh_slot_reports(max_age_days: int = 7) -> int:
+    """
+    Refresh reports of recently completed slots that received webhook
+    responses since their last refresh
+    
+    Args:
+        max_age_days: Only consider reports completed within this many days
+    
+    Returns:
+        Number of refreshed reports
+    """
+    newer_response = db.session.query(ReservationAttempt.id).filter(
+        ReservationAttempt.reservation_slot_id == SlotReport.reservation_slot_id,
+        ReservationAttempt.response_received_at > SlotReport.refreshed_at - REFRESH_OVERLAP
+    ).exists()
+    
+    reports = SlotReport.query.filter(
+        SlotReport.completed_at >= datetime.utcnow() - timedelta(days=max_age_days),
+        newer_response
+    ).all()
+    
+    for report in reports:
+        _refresh_response_stats(report)
+    
+    db.session.commit()
+    return len(reports)
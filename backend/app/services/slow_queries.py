@@ -0,0 +1,242 @@
+from flask import current_app, g, has_app_context, has_request_context, request
+from sqlalchemy import desc, event, func
+from sqlalchemy.engine import Engine
+from datetime import datetime, timedelta
+import hashlib
+import logging
+import queue
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from app.models import db, SlowQuery
+from app.services.db_pools import SCHEDULER_BIND
+
+logger = logging.getLogger(__name__)
+
+# Expanded IN lists render one placeholder per value (%(id_1_1)s, %(id_1_2)s,
+# ...); folded so every list length shares a fingerprint
+EXPANDED_PARAMETERS = re.compile(r'%\((\w+?)_\d+\)s(?:\s*,\s*%\(\1_\d+\)s)*')
+WHITESPACE = re.compile(r'\s+')
+
+ORDERS = ('total', 'max', 'count')
+
+
+def fingerprint(statement: str) -> str:
+    """Identity of a statement across parameter values and IN list lengths"""
+    normalized = EXPANDED_PARAMETERS.sub(r'%(\1_N)s', WHITESPACE.sub(' ', statement).strip())
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:16]
+
+
+def _shape(value: Any) -> str:
+    if value is None:
+        return 'null'
+    if isinstance(value, (list, tuple)):
+        return f"{type(value).__name__}[{len(value)}]"
+    return type(value).__name__
+
+
+def parameter_shapes(parameters: Any, executemany: bool = False) -> Any:
+    """Types (and sequence lengths) of bound parameters, never their values"""
+    if executemany:
+        return {
+            'rows': len(parameters),
+            'row': parameter_shapes(parameters[0]) if parameters else None
+        }
+    if isinstance(parameters, dict):
+        return {name: _shape(value) for name, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [_shape(value) for value in parameters]
+    return None
+
+
+def _source() -> Optional[str]:
+    if has_request_context():
+        return f"{request.method} {request.url_rule.rule if request.url_rule else request.path}"
+    if has_app_context() and g.get('job'):
+        return f"job:{g.job}"
+    return None
+
+
+class SlowQueryLog:
+    """
+    Records statements running longer than SLOW_QUERY_MS.
+    
+    Each one is logged with its SQL, parameter shapes and the route or
+    scheduler job that ran it, and handed to a background thread that stores
+    it in ``slow_queries``. With SLOW_QUERY_EXPLAIN the thread first captures
+    the plan, at most once per statement fingerprint and worker every
+    SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS: EXPLAIN (ANALYZE, BUFFERS) inside a
+    read-only transaction that is rolled back, so only statements without
+    side effects get re-run, and a plain EXPLAIN for the others. The request
+    or job that ran the statement only pays for a queue put.
+    """
+    
+    def __init__(self, app=None):
+        self.app = None
+        self.threshold = 0.0
+        self._queue: queue.Queue = queue.Queue(maxsize=1000)
+        self._thread: Optional[threading.Thread] = None
+        self._thread_lock = threading.Lock()
+        self._explained: Dict[str, float] = {}
+        self._local = threading.local()
+        
+        if app:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        """Listen to every engine's statements when SLOW_QUERY_MS is set"""
+        self.app = app
+        self.threshold = app.config['SLOW_QUERY_MS'] / 1000
+        if not self.threshold or event.contains(Engine, 'after_cursor_execute', self._after_cursor_execute):
+            return
+        
+        event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+    
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        context._slow_query_started = time.perf_counter()
+    
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, '_slow_query_started', None)
+        if started is None:
+            return
+        
+        elapsed = time.perf_counter() - started
+        if elapsed < self.threshold or getattr(self._local, 'recording', False):
+            return
+        
+        source = _source()
+        logger.warning(f"Slow query ({elapsed * 1000:.0f} ms, {source or 'unknown source'}): {statement[:1000]}")
+        
+        record = {
+            'fingerprint': fingerprint(statement),
+            'statement': statement,
+            'parameters': parameter_shapes(parameters, executemany),
+            'source': source[:200] if source else None,
+            'pool': getattr(conn.engine.pool, 'name', None),
+            'duration_ms': elapsed * 1000,
+            'created_at': datetime.utcnow()
+        }
+        explain = None
+        if self.app.config['SLOW_QUERY_EXPLAIN'] and self._claim_explain(record['fingerprint']):
+            # Values are kept in memory for EXPLAIN only, never stored
+            explain = (conn.engine, parameters[0] if executemany and parameters else parameters)
+        
+        try:
+            self._queue.put_nowait((record, explain))
+        except queue.Full:
+            return
+        self._ensure_thread()
+    
+    def _claim_explain(self, key: str) -> bool:
+        now = time.monotonic()
+        last = self._explained.get(key)
+        if last is not None and now - last < self.app.config['SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS']:
+            return False
+        self._explained[key] = now
+        return True
+    
+    def _ensure_thread(self):
+        # Also restarts the thread in a forked worker process
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='slow-query-log', daemon=True)
+                self._thread.start()
+    
+    def _run(self):
+        self._local.recording = True
+        while True:
+            record, explain = self._queue.get()
+            try:
+                if explain:
+                    record['plan'] = self._explain(record['statement'], *explain)
+                with self.app.app_context():
+                    with db.engines[SCHEDULER_BIND].begin() as connection:
+                        connection.execute(SlowQuery.__table__.insert(), record)
+            except Exception as e:
+                logger.error(f"Could not record slow query {record['fingerprint']}: {str(e)}")
+    
+    def _explain(self, statement: str, engine, parameters) -> Optional[Any]:
+        timeout = int(self.app.config['SLOW_QUERY_EXPLAIN_TIMEOUT_MS'])
+        for options in ('ANALYZE, BUFFERS, FORMAT JSON', 'FORMAT JSON'):
+            try:
+                with engine.connect() as connection:
+                    connection.exec_driver_sql("SET TRANSACTION READ ONLY")
+                    connection.exec_driver_sql(f"SET LOCAL statement_timeout = {timeout}")
+                    plan = connection.exec_driver_sql(f"EXPLAIN ({options}) {statement}", parameters).scalar()
+                    connection.rollback()
+                return plan
+            except Exception as e:
+                logger.info(f"EXPLAIN ({options}) failed for slow query: {str(e).splitlines()[0]}")
+        return None
+
+
+slow_query_log = SlowQueryLog()
+
+
+def worst_slow_queries(hours: float, order: str = 'total', limit: int = 20) -> List[Dict[str, Any]]:
+    """
+    Slow statements of the last ``hours``, grouped by fingerprint, with the
+    SQL, parameter shapes and plan of their latest occurrence
+    
+    Args:
+        hours: Window length
+        order: ``total`` (time summed over occurrences), ``max`` or ``count``
+        limit: Number of statements
+    """
+    since = datetime.utcnow() - timedelta(hours=hours)
+    total = func.sum(SlowQuery.duration_ms)
+    longest = func.max(SlowQuery.duration_ms)
+    count = func.count(SlowQuery.id)
+    rows = db.session.query(
+        SlowQuery.fingerprint,
+        count,
+        total,
+        func.avg(SlowQuery.duration_ms),
+        longest,
+        func.max(SlowQuery.created_at),
+        func.array_agg(func.distinct(SlowQuery.source))
+    ).filter(
+        SlowQuery.created_at >= since
+    ).group_by(SlowQuery.fingerprint).order_by(
+        desc({'total': total, 'max': longest, 'count': count}[order])
+    ).limit(limit).all()
+    
+    # Latest occurrence per fingerprint, preferring one with a plan
+    latest = {
+        query.fingerprint: query
+        for query in SlowQuery.query.filter(
+            SlowQuery.fingerprint.in_([row[0] for row in rows]),
+            SlowQuery.created_at >= since
+        ).order_by(
+            SlowQuery.fingerprint,
+            SlowQuery.plan.is_(None),
+            SlowQuery.created_at.desc()
+        ).distinct(SlowQuery.fingerprint)
+    }
+    
+    return [
+        {
+            'fingerprint': key,
+            'count': occurrences,
+            'total_ms': round(total_ms, 1),
+            'avg_ms': round(avg_ms, 1),
+            'max_ms': round(max_ms, 1),
+            'last_seen': last_seen.isoformat(),
+            'sources': sorted(source for source in sources if source),
+            'latest': latest[key].to_dict()
+        }
+        for key, occurrences, total_ms, avg_ms, max_ms, last_seen, sources in rows
+    ]
+
+
+def prune_slow_queries() -> int:
+    """Drop slow queries older than SLOW_QUERY_RETENTION_DAYS"""
+    cutoff = datetime.utcnow() - timedelta(days=current_app.config['SLOW_QUERY_RETENTION_DAYS'])
+    deleted = SlowQuery.query.filter(SlowQuery.created_at < cutoff).delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
@@ -0,0 +1,142 @@
+from sqlalchemy import func, text
+import logging
+from typing import Any, Dict, Optional
+
+from app.models import db, Area, AreaStatusCount
+
+logger = logging.getLogger(__name__)
+
+STATUSES = ('OPEN', 'SUCCESS', 'FAILED')
+
+
+def get_area_status_counts(area_id: Optional[int] = None) -> Dict[int, Dict[str, Any]]:
+    """
+    Read per-area customer counts from ``area_status_counts``
+    
+    Args:
+        area_id: Restrict the result to a single area
+    
+    Returns:
+        Mapping of area_id -> {'area_name': str, 'counts': {status: count}},
+        one entry per existing area ordered by area id
+    """
+    query = db.session.query(
+        Area.id,
+        Area.name,
+        AreaStatusCount.reservation_status,
+        func.sum(AreaStatusCount.count)
+    ).outerjoin(AreaStatusCount, AreaStatusCount.area_id == Area.id)
+    
+    if area_id:
+        query = query.filter(Area.id == area_id)
+    
+    rows = query.group_by(Area.id, Area.name, AreaStatusCount.reservation_status).order_by(Area.id)
+    
+    areas: Dict[int, Dict[str, Any]] = {}
+    for row_area_id, area_name, status, count in rows:
+        area = areas.setdefault(row_area_id, {
+            'area_name': area_name,
+            'counts': {s: 0 for s in STATUSES}
+        })
+        if status:
+            area['counts'][status] = int(count or 0)
+    
+    return areas
+
+
+def get_status_summary(area_id: Optional[int] = None) -> Dict[str, Any]:
+    """Build the analytics summary payload from area_status_counts in O(number of areas)"""
+    by_area = []
+    for row_area_id, area in get_area_status_counts(area_id).items():
+        counts = area['counts']
+        total = sum(counts.values())
+        by_area.append({
+            'area_id': row_area_id,
+            'area_name': area['area_name'],
+            'total': total,
+            'success': counts['SUCCESS'],
+            'failed': counts['FAILED'],
+            'open': counts['OPEN'],
+            'success_rate': (counts['SUCCESS'] / total * 100) if total > 0 else 0
+        })
+    
+    total_attempts = sum(area['total'] for area in by_area)
+    success_count = sum(area['success'] for area in by_area)
+    success_rate = (success_count / total_attempts * 100) if total_attempts > 0 else 0
+    
+    return {
+        'total_attempts': total_attempts,
+        'success_count': success_count,
+        'failed_count': sum(area['failed'] for area in by_area),
+        'open_count': sum(area['open'] for area in by_area),
+        'success_rate': round(success_rate, 2),
+        'by_area': by_area
+    }
+
+
+def compact_status_counts() -> int:
+    """
+    Fold the delta rows appended by the customers triggers into one row per
+    (area_id, reservation_status), dropping rows of areas that no longer exist.
+    
+    Returns:
+        Number of rows left after compaction
+    """
+    result = db.session.execute(text("""
+        WITH folded AS (
+            DELETE FROM area_status_counts
+            RETURNING area_id, reservation_status, count
+        )
+        INSERT INTO area_status_counts (area_id, reservation_status, count)
+        SELECT f.area_id, f.reservation_status, SUM(f.count)
+        FROM folded f
+        WHERE EXISTS (SELECT 1 FROM areas a WHERE a.id = f.area_id)
+        GROUP BY f.area_id, f.reservation_status
+        HAVING SUM(f.count) <> 0
+    """))
+    db.session.commit()
+    return result.rowcount
+
+
+def reconcile_status_counts() -> int:
+    """
+    Compare tracked counts against a full GROUP BY over ``customers`` and append
+    correction deltas for any drift.
+    
+    Both sides are read by a single statement and therefore from the same
+    snapshot; writes committed afterwards carry their own deltas, so the
+    corrections never double count.
+    
+    Returns:
+        Number of (area, status) pairs that had drifted
+    """
+    result = db.session.execute(text("""
+        INSERT INTO area_status_counts (area_id, reservation_status, count)
+        SELECT area_id, reservation_status, actual - tracked
+        FROM (
+            SELECT
+                COALESCE(a.area_id, t.area_id) AS area_id,
+                COALESCE(a.reservation_status, t.reservation_status) AS reservation_status,
+                COALESCE(a.n, 0) AS actual,
+                COALESCE(t.n, 0) AS tracked
+            FROM (
+                SELECT area_id, reservation_status, COUNT(*) AS n
+                FROM customers
+                GROUP BY area_id, reservation_status
+            ) a
+            FULL OUTER JOIN (
+                SELECT area_id, reservation_status, SUM(count) AS n
+                FROM area_status_counts
+                GROUP BY area_id, reservation_status
+            ) t ON t.area_id = a.area_id AND t.reservation_status = a.reservation_status
+        ) drift
+        WHERE actual <> tracked
+        RETURNING area_id, reservation_status, count
+    """))
+    corrections = result.fetchall()
+    db.session.commit()
+    
+    for area_id, status, delta in corrections:
+        logger.warning(f"Repaired status count drift for area {area_id}, status {status}: {delta:+d}")
+    
+    return len(corrections)
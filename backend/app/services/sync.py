@@ -0,0 +1,181 @@
+from flask import current_app, jsonify, request
+from sqlalchemy import tuple_
+from datetime import datetime, timedelta
+import base64
+import json
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+from app.models import db, DeletedRow
+from app.utils.serialization import RowSerializer
+from app.utils.timestamps import parse_utc_timestamp
+
+logger = logging.getLogger(__name__)
+
+
+class SyncWindowExpired(Exception):
+    """The requested updated_since predates the tombstone retention window"""
+
+
+def is_sync_request() -> bool:
+    """Whether the request asks for changes rather than the full list"""
+    return 'updated_since' in request.args or 'cursor' in request.args
+
+
+def encode_cursor(updated_at: datetime, row_id: int, updated_since: datetime, started: datetime) -> str:
+    payload = json.dumps([updated_at.isoformat(), row_id, updated_since.isoformat(), started.isoformat()])
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int, datetime, datetime]:
+    updated_at, row_id, updated_since, started = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    return (
+        datetime.fromisoformat(updated_at), int(row_id),
+        datetime.fromisoformat(updated_since), datetime.fromisoformat(started)
+    )
+
+
+def parse_sync_args() -> Dict[str, Any]:
+    """
+    Read ``updated_since``, ``cursor`` and ``limit`` from the query string
+    
+    Raises:
+        ValueError: On malformed values
+    """
+    config = current_app.config
+    limit = request.args.get('limit', config['SYNC_PAGE_SIZE'], type=int)
+    limit = max(1, min(limit, config['SYNC_MAX_PAGE_SIZE']))
+    
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            after_updated_at, after_id, updated_since, started = decode_cursor(cursor)
+        except (ValueError, TypeError):
+            raise ValueError('Invalid cursor')
+        return {
+            'updated_since': updated_since,
+            'after': (after_updated_at, after_id),
+            'started': started,
+            'limit': limit
+        }
+    
+    try:
+        updated_since = parse_utc_timestamp(request.args['updated_since'])
+    except (KeyError, ValueError):
+        raise ValueError('updated_since must be an ISO 8601 timestamp')
+    
+    return {'updated_since': updated_since, 'after': None, 'started': None, 'limit': limit}
+
+
+def get_changes(
+    query,
+    model,
+    table_name: str,
+    serializer: RowSerializer,
+    updated_since: datetime,
+    after: Optional[Tuple[datetime, int]],
+    limit: int,
+    started: Optional[datetime] = None
+) -> Dict[str, Any]:
+    """
+    One page of rows changed since ``updated_since``, oldest first
+    
+    ``updated_at`` is stamped when a row is flushed, which can precede its
+    commit. ``next_updated_since`` therefore trails the server clock by
+    SYNC_OVERLAP_SECONDS so the next sync re-reads that window; clients
+    upsert by id, which makes the overlap harmless.
+    
+    Tombstones come with the first page only, so every page of a sync
+    returns the same ``next_updated_since``, taken from the time of the
+    first page: rows deleted while the client was paging are then reported
+    by the next sync.
+    
+    Args:
+        query: Column query built from ``serializer.columns`` with filters applied
+        model: Model whose ``updated_at`` and ``id`` drive the keyset
+        table_name: Table whose tombstones are returned
+        serializer: Row serializer of the query
+        updated_since: Lower bound (inclusive) on updated_at
+        after: Keyset position of the previous page, if any
+        limit: Page size
+        started: Time of the first page of this sync (from the cursor);
+            defaults to now
+    
+    Returns:
+        Dictionary with ``data``, ``deleted`` (ids, first page only),
+        ``has_more``, ``next_cursor`` and ``next_updated_since``
+    
+    Raises:
+        SyncWindowExpired: updated_since is older than the tombstone retention
+    """
+    config = current_app.config
+    retention = timedelta(days=config['SYNC_TOMBSTONE_RETENTION_DAYS'])
+    now = datetime.utcnow()
+    started = started or now
+    if updated_since < now - retention:
+        raise SyncWindowExpired()
+    
+    query = query.filter(model.updated_at >= updated_since)
+    if after:
+        query = query.filter(tuple_(model.updated_at, model.id) > tuple_(*after))
+    
+    # Fetch one extra row to know whether another page follows
+    rows = query.order_by(model.updated_at, model.id).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    
+    deleted = []
+    if after is None:
+        deleted = [row_id for row_id, in db.session.query(DeletedRow.row_id).filter(
+            DeletedRow.table_name == table_name,
+            DeletedRow.deleted_at >= updated_since
+        ).order_by(DeletedRow.id)]
+    
+    next_cursor = None
+    if has_more:
+        last = rows[-1]
+        next_cursor = encode_cursor(last.updated_at, last.id, updated_since, started)
+    
+    return {
+        'data': serializer.dump(rows),
+        'deleted': deleted,
+        'has_more': has_more,
+        'next_cursor': next_cursor,
+        'next_updated_since': (started - timedelta(seconds=config['SYNC_OVERLAP_SECONDS'])).isoformat()
+    }
+
+
+def changes_response(query, model, table_name: str, serializer: RowSerializer):
+    """
+    Answer a list route in delta sync mode
+    
+    Returns:
+        A (response, status) tuple: 200 with one page of changes, 400 on
+        malformed parameters, 410 when the client must reload the full list
+    """
+    try:
+        args = parse_sync_args()
+        changes = get_changes(query, model, table_name, serializer, **args)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
+    except SyncWindowExpired:
+        return jsonify({
+            'success': False,
+            'message': 'updated_since is older than the sync window, reload the full list'
+        }), 410
+    
+    return jsonify({
+        'success': True,
+        **changes
+    }), 200
+
+
+def prune_tombstones() -> int:
+    """Drop tombstones older than SYNC_TOMBSTONE_RETENTION_DAYS"""
+    cutoff = datetime.utcnow() - timedelta(days=current_app.config['SYNC_TOMBSTONE_RETENTION_DAYS'])
+    deleted = DeletedRow.query.filter(DeletedRow.deleted_at < cutoff).delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
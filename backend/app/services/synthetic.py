@@ -0,0 +1,430 @@
+from sqlalchemy import text
+from datetime import datetime, timedelta
+import bisect
+import io
+import itertools
+import logging
+import math
+import queue
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import orjson
+
+from app.models import db
+from app.services.rollups import rebuild_attempt_rollups
+from app.services.slot_reports import write_slot_report
+
+logger = logging.getLogger(__name__)
+
+# Emptied by ``truncate``; everything the generator writes or derives
+SEEDED_TABLES = (
+    'areas', 'customers', 'reservation_slots', 'reservation_attempts', 'payload_overflow',
+    'area_status_counts', 'attempt_rollups', 'slot_reports', 'deleted_rows', 'area_deletions'
+)
+
+MALE_NAMES = (
+    'محمد', 'أحمد', 'عبد الله', 'خالد', 'عمر', 'يوسف', 'إبراهيم', 'علي', 'حسن', 'حسين',
+    'محمود', 'مصطفى', 'سامي', 'فيصل', 'طارق', 'ماجد', 'زياد', 'باسل', 'رامي', 'وليد',
+    'عبد الرحمن', 'سليمان', 'نبيل', 'هاني', 'عماد', 'جمال', 'مراد', 'أنس', 'معاذ', 'بلال'
+)
+FEMALE_NAMES = (
+    'فاطمة', 'مريم', 'نور', 'سارة', 'ليلى', 'هدى', 'رنا', 'دينا', 'سلمى', 'آمنة',
+    'خديجة', 'زينب', 'رغد', 'لينا', 'هبة', 'منى', 'سمر', 'ريم', 'أسماء', 'عائشة'
+)
+FAMILY_NAMES = (
+    'الخطيب', 'العلي', 'الحسن', 'النمر', 'الزعبي', 'العمري', 'الرفاعي', 'الشريف', 'المصري', 'الحوراني',
+    'الطراونة', 'المجالي', 'العبادي', 'البطاينة', 'الخوالدة', 'القضاة', 'الشمايلة', 'الحياري', 'السعدي', 'الكردي',
+    'الجعفري', 'الدباس', 'النابلسي', 'التميمي', 'الحمدان', 'الفايز', 'العدوان', 'الرواشدة', 'البدور', 'الزيود'
+)
+AREA_KINDS = ('ضاحية', 'مخطط', 'حي', 'مشروع إسكان')
+AREA_NAMES = (
+    'الياسمين', 'الرابية', 'الصويفية', 'الجبيهة', 'شفا بدران', 'أبو نصير', 'طبربور', 'ماركا', 'الهاشمي', 'المقابلين',
+    'البنيات', 'اليادودة', 'ناعور', 'مرج الحمام', 'سحاب', 'الجيزة', 'الموقر', 'الزرقاء الجديدة', 'الرصيفة', 'الهاشمية'
+)
+
+# Webhook outcomes: (status, response_code, message, weight)
+OUTCOMES = (
+    ('SUCCESS', 200, 'تم الحجز بنجاح', 15),
+    ('FAILED', 409, 'لا توجد قطع متاحة في هذه المنطقة', 50),
+    ('FAILED', 422, 'بيانات المتقدم غير مطابقة للسجل المدني', 20),
+    ('FAILED', 409, 'تم حجز قطعة سابقا لهذا الرقم الوطني', 8),
+    ('FAILED', 500, 'تعذر إكمال الحجز، يرجى المحاولة لاحقا', 7)
+)
+
+MASK_64 = (1 << 64) - 1
+
+COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+
+def _mix(value: int) -> int:
+    """splitmix64: a well spread 64-bit hash of ``value``"""
+    value = (value + 0x9E3779B97F4A7C15) & MASK_64
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & MASK_64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & MASK_64
+    return value ^ (value >> 31)
+
+
+def _escape(value: str) -> str:
+    if '\\' in value or '\t' in value or '\n' in value or '\r' in value:
+        return value.translate(COPY_ESCAPES)
+    return value
+
+
+# Value formatting in COPY text format, by type
+COPY_FORMATS: Dict[type, Callable[[Any], str]] = {
+    type(None): lambda value: '\\N',
+    bool: str,
+    int: str,
+    float: repr,
+    datetime: str,
+    str: _escape,
+    dict: lambda value: _escape(orjson.dumps(value).decode())
+}
+
+
+def _can_skip_triggers() -> bool:
+    """Whether this role may load rows without firing triggers (superusers only)"""
+    connection = db.engine.raw_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL session_replication_role = replica")
+        return True
+    except db.engine.dialect.dbapi.Error:
+        return False
+    finally:
+        connection.rollback()
+        connection.close()
+
+
+class _CopyWriter:
+    """
+    Buffers rows and COPYs them into a table every ``chunk_rows`` rows, one
+    transaction per chunk. The COPY runs on a thread of its own, so the next
+    chunk is generated while PostgreSQL loads the previous one. With
+    ``skip_triggers`` neither foreign keys are checked nor the counter,
+    rollup and version triggers fired; the caller rebuilds what they maintain.
+    """
+    
+    def __init__(self, table: str, columns: List[str], chunk_rows: int, skip_triggers: bool = False):
+        self.statement = f"COPY {table} ({', '.join(columns)}) FROM STDIN"
+        self.chunk_rows = chunk_rows
+        self.skip_triggers = skip_triggers
+        self.engine = db.engine
+        self.rows: List[str] = []
+        self.written = 0
+        self._chunks: queue.Queue = queue.Queue(maxsize=2)
+        self._error: Optional[Exception] = None
+        self._thread = threading.Thread(target=self._run, name=f"copy-{table}", daemon=True)
+        self._thread.start()
+    
+    def add(self, *values):
+        self.rows.append('\t'.join([COPY_FORMATS[type(value)](value) for value in values]))
+        if len(self.rows) >= self.chunk_rows:
+            self._send()
+    
+    def _send(self):
+        if self._error is not None:
+            raise self._error
+        self._chunks.put(self.rows)
+        self.written += len(self.rows)
+        self.rows = []
+    
+    def _run(self):
+        while True:
+            rows = self._chunks.get()
+            if rows is None:
+                return
+            if self._error is not None:
+                continue
+            connection = self.engine.raw_connection()
+            try:
+                with connection.cursor() as cursor:
+                    if self.skip_triggers:
+                        cursor.execute("SET LOCAL session_replication_role = replica")
+                    cursor.copy_expert(self.statement, io.StringIO('\n'.join(rows) + '\n'))
+                connection.commit()
+            except Exception as e:
+                self._error = e
+            finally:
+                connection.close()
+    
+    def close(self):
+        """Load the remaining rows and wait for every COPY to finish"""
+        if self.rows:
+            self._send()
+        self._chunks.put(None)
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+
+class SyntheticCustomers:
+    """
+    Customer columns as pure functions of the seed and the customer id, so
+    attempts can carry a customer's national ID and phone number without
+    the customers being kept in memory
+    """
+    
+    def __init__(self, seed: int):
+        self.key = _mix(seed)
+        # Affine map onto 9 digits: distinct national IDs for distinct ids
+        self.multiplier = (self.key % 10 ** 9) | 1
+        if self.multiplier % 5 == 0:
+            self.multiplier += 2
+        self.offset = (self.key >> 32) % 10 ** 9
+    
+    def national_id(self, customer_id: int) -> str:
+        return f"2{(self.multiplier * customer_id + self.offset) % 10 ** 9:09d}"
+    
+    def phone_number(self, customer_id: int) -> str:
+        h = _mix(self.key ^ customer_id)
+        return f"07{'789'[h % 3]}{(h >> 8) % 10 ** 7:07d}"
+    
+    def name(self, customer_id: int) -> str:
+        h = _mix(self.key ^ customer_id)
+        first_names = FEMALE_NAMES if (h >> 40) % 5 < 2 else MALE_NAMES
+        return ' '.join((
+            first_names[(h >> 16) % len(first_names)],
+            MALE_NAMES[(h >> 24) % len(MALE_NAMES)],
+            MALE_NAMES[(h >> 32) % len(MALE_NAMES)],
+            FAMILY_NAMES[(h >> 44) % len(FAMILY_NAMES)]
+        ))
+
+
+def truncate():
+    """Empty every table the generator fills and restart their ids at 1"""
+    db.session.execute(text(f"TRUNCATE {', '.join(SEEDED_TABLES)} RESTART IDENTITY CASCADE"))
+    db.session.commit()
+
+
+def _rebuild_derived_tables():
+    """What the skipped triggers would have written for the loaded rows"""
+    db.session.execute(text("""
+        INSERT INTO area_status_counts (area_id, reservation_status, count)
+        SELECT area_id, reservation_status, COUNT(*) FROM customers GROUP BY area_id, reservation_status
+    """))
+    db.session.execute(
+        text("INSERT INTO table_versions (table_name, changes) VALUES (:table, 1)"),
+        [{'table': table} for table in ('areas', 'customers', 'reservation_slots', 'reservation_attempts')]
+    )
+    db.session.commit()
+    rebuild_attempt_rollups()
+
+
+def _area_sizes(rng: random.Random, areas: int, customers: int) -> List[int]:
+    # A few popular areas and a long tail, none empty
+    weights = [1 / (rank + 1) ** 0.7 for rank in range(areas)]
+    rng.shuffle(weights)
+    total = sum(weights)
+    sizes = [1 + int((customers - areas) * weight / total) for weight in weights]
+    for index in range(customers - sum(sizes)):
+        sizes[index % areas] += 1
+    return sizes
+
+
+def generate(
+    areas: int,
+    customers: int,
+    attempts: int,
+    days: int = 180,
+    slots_per_day: int = 4,
+    seed: int = 1,
+    chunk_rows: int = 100_000,
+    progress: Optional[Callable[[str], None]] = None
+) -> Dict[str, int]:
+    """
+    Bulk-load a realistic dataset with COPY; the tables must be empty
+    
+    Customers get Arabic names, Jordanian mobile numbers and unique national
+    IDs, spread unevenly over the areas. Slots run ``slots_per_day`` times a
+    day over the last ``days`` days, each in a random area (weighted by its
+    customers) and all processed. Attempts are split over the slots in
+    proportion to their area's customers and go out one after the other from
+    the slot's start; most get a webhook response after a log-normal delay
+    (median 40 s), some were rejected by UiPath or never answered. The same
+    arguments always produce the same rows, dated relative to the current day.
+    
+    As a superuser the rows are loaded without firing triggers, and the
+    status counters, rollups and table versions are rebuilt once at the end.
+    
+    Args:
+        areas: Number of areas
+        customers: Number of customers
+        attempts: Number of reservation attempts
+        days: Days of slot history, ending now
+        slots_per_day: Slots per day, across all areas
+        seed: Random seed
+        chunk_rows: Rows per COPY (and transaction)
+        progress: Called with a line of progress per table
+    
+    Returns:
+        Rows written per table
+    
+    Raises:
+        ValueError: On sizes that cannot be laid out
+    """
+    if areas < 1 or customers < areas:
+        raise ValueError('Need at least one area and one customer per area')
+    if attempts and days * slots_per_day < 1:
+        raise ValueError('Attempts need at least one slot')
+    
+    report = progress or (lambda line: None)
+    rng = random.Random(seed)
+    people = SyntheticCustomers(seed)
+    now = datetime.utcnow().replace(microsecond=0)
+    first_day = datetime(now.year, now.month, now.day) - timedelta(days=days)
+    counts = {}
+    skip = _can_skip_triggers()
+    
+    # Areas
+    started = time.perf_counter()
+    area_names = []
+    writer = _CopyWriter(
+        'areas', ['id', 'name', 'description', 'link', 'is_active', 'created_at', 'updated_at'], chunk_rows, skip
+    )
+    for area_id in range(1, areas + 1):
+        name = f"{rng.choice(AREA_KINDS)} {rng.choice(AREA_NAMES)} {area_id}"
+        area_names.append(name)
+        created_at = first_day - timedelta(days=rng.randint(30, 365))
+        writer.add(
+            area_id, name, f"أراضي سكنية مخدومة، {rng.randint(50, 900)} قطعة",
+            f"https://maps.example.com/areas/{area_id}", rng.random() < 0.9, created_at, created_at
+        )
+    writer.close()
+    counts['areas'] = writer.written
+    
+    # Customers, ids contiguous per area
+    sizes = _area_sizes(rng, areas, customers)
+    area_first_customer = []
+    writer = _CopyWriter(
+        'customers',
+        ['id', 'name', 'phone_number', 'national_id', 'area_id', 'reservation_status', 'created_at', 'updated_at'],
+        chunk_rows, skip
+    )
+    first_customer = 1
+    for area_id, size in enumerate(sizes, start=1):
+        area_first_customer.append(first_customer)
+        for customer_id in range(first_customer, first_customer + size):
+            draw = rng.random()
+            status = 'OPEN' if draw < 0.7 else 'FAILED' if draw < 0.9 else 'SUCCESS'
+            created_at = first_day - timedelta(seconds=rng.randint(0, 30 * 86400))
+            writer.add(
+                customer_id, people.name(customer_id), people.phone_number(customer_id),
+                people.national_id(customer_id), area_id, status, created_at, created_at
+            )
+        first_customer += size
+    writer.close()
+    counts['customers'] = writer.written
+    report(f"areas: {areas}, customers: {writer.written} ({time.perf_counter() - started:.1f}s)")
+    
+    # Slots, from 09:00 Riyadh time (06:00 UTC) every 12 / slots_per_day hours
+    started = time.perf_counter()
+    cumulative = list(itertools.accumulate(sizes))
+    total = cumulative[-1]
+    slots = []
+    writer = _CopyWriter(
+        'reservation_slots',
+        ['id', 'area_id', 'scheduled_datetime', 'is_processed', 'created_at', 'updated_at'],
+        chunk_rows, skip
+    )
+    for day in range(days):
+        for index in range(slots_per_day):
+            area_id = bisect.bisect_right(cumulative, rng.randrange(total)) + 1
+            scheduled = first_day + timedelta(days=day, hours=6 + index * 12 / slots_per_day)
+            created_at = scheduled - timedelta(days=rng.randint(1, 14))
+            slots.append((len(slots) + 1, area_id, scheduled))
+            writer.add(len(slots), area_id, scheduled, True, created_at, scheduled)
+    writer.close()
+    counts['reservation_slots'] = writer.written
+    
+    # Attempts per slot, in proportion to the slot's area size
+    weights = [sizes[area_id - 1] * (0.5 + rng.random()) for _, area_id, _ in slots]
+    weight_total = sum(weights) or 1
+    per_slot = [int(attempts * weight / weight_total) for weight in weights]
+    for index in range(attempts - sum(per_slot)):
+        per_slot[index % len(per_slot)] += 1
+    
+    db.session.execute(
+        text("SELECT create_reservation_attempt_partitions(:first, :last)"),
+        {'first': first_day, 'last': now + timedelta(days=62)}
+    )
+    db.session.commit()
+    
+    outcome_weights = list(itertools.accumulate(weight for *_, weight in OUTCOMES))
+    writer = _CopyWriter(
+        'reservation_attempts',
+        ['id', 'customer_id', 'reservation_slot_id', 'request_sent_at', 'request_payload', 'response_received_at',
+         'response_status', 'response_code', 'response_message', 'response_payload', 'created_at', 'updated_at'],
+        chunk_rows, skip
+    )
+    slot_counts = {}
+    reported = 0
+    attempt_id = 0
+    queue_item = 100000
+    for (slot_id, area_id, scheduled), count in zip(slots, per_slot):
+        if not count:
+            continue
+        first_customer = area_first_customer[area_id - 1]
+        size = sizes[area_id - 1]
+        offset = rng.randrange(size)
+        sent_at = scheduled + timedelta(seconds=rng.uniform(0.5, 5))
+        failures = 0
+        
+        for position in range(count):
+            attempt_id += 1
+            customer_id = first_customer + (offset + position) % size
+            # Sequential dispatch: ~25 ms per customer, with a slow tail
+            sent_at += timedelta(seconds=rng.lognormvariate(math.log(0.025), 0.5))
+            request_payload = {
+                'national_id': people.national_id(customer_id),
+                'phone_number': people.phone_number(customer_id),
+                'area': area_names[area_id - 1]
+            }
+            
+            draw = rng.random()
+            received_at = status = code = message = None
+            if draw < 0.02:
+                failures += 1
+                response_payload = {'message': 'Robot unavailable'}
+            elif draw < 0.10:
+                queue_item += 1
+                response_payload = {'message': 'Queued', 'queue_item_id': queue_item}
+            else:
+                queue_item += 1
+                received_at = sent_at + timedelta(seconds=min(rng.lognormvariate(math.log(40), 1.0), 3600))
+                status, code, message, _ = OUTCOMES[bisect.bisect(outcome_weights, rng.random() * outcome_weights[-1])]
+                response_payload = {'additional_data': {'queue_item_id': queue_item}} if rng.random() < 0.1 else None
+            
+            writer.add(
+                attempt_id, customer_id, slot_id, sent_at, request_payload, received_at,
+                status, code, message, response_payload, sent_at, received_at or sent_at
+            )
+        slot_counts[slot_id] = (count, failures)
+        if writer.written - reported >= chunk_rows * 10:
+            reported = writer.written
+            report(f"reservation_attempts: {writer.written} ({time.perf_counter() - started:.1f}s)")
+    writer.close()
+    counts['reservation_attempts'] = writer.written
+    report(f"slots: {len(slots)}, attempts: {writer.written} ({time.perf_counter() - started:.1f}s)")
+    
+    # COPY with explicit ids leaves the sequences behind
+    for table in ('areas', 'customers', 'reservation_slots', 'reservation_attempts'):
+        db.session.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), GREATEST((SELECT MAX(id) FROM {table}), 1))"
+        ))
+    if skip:
+        _rebuild_derived_tables()
+    db.session.commit()
+    
+    started = time.perf_counter()
+    for slot_id, (count, failures) in slot_counts.items():
+        write_slot_report(slot_id, customers_targeted=count, requests_sent=count - failures, send_failures=failures)
+    counts['slot_reports'] = len(slot_counts)
+    report(f"slot reports: {len(slot_counts)} ({time.perf_counter() - started:.1f}s)")
+    
+    db.session.execute(text('ANALYZE'))
+    db.session.commit()
+    return counts
@@ -0,0 +1,97 @@
+from flask import Response, request
+from functools import wraps
+from sqlalchemy import func, text
+import hashlib
+import logging
+from typing import Dict
+
+from app.models import db, TableVersion
+from app.services.cache import ResponseCache
+
+logger = logging.getLogger(__name__)
+
+
+def get_table_versions(*tables: str) -> Dict[str, int]:
+    """
+    Current version of each table, i.e. the number of write statements
+    committed against it so far (0 for a table never written)
+    """
+    rows = db.session.query(
+        TableVersion.table_name,
+        func.sum(TableVersion.changes)
+    ).filter(TableVersion.table_name.in_(tables)).group_by(TableVersion.table_name).all()
+    
+    versions = {table: 0 for table in tables}
+    versions.update({table: int(version) for table, version in rows})
+    return versions
+
+
+def compact_table_versions() -> int:
+    """
+    Fold the rows appended by the table_versions triggers into one per table.
+    Versions are sums, so folding leaves them unchanged.
+    
+    Returns:
+        Number of rows left after compaction
+    """
+    result = db.session.execute(text("""
+        WITH folded AS (
+            DELETE FROM table_versions
+            RETURNING table_name, changes
+        )
+        INSERT INTO table_versions (table_name, changes)
+        SELECT table_name, SUM(changes)
+        FROM folded
+        GROUP BY table_name
+    """))
+    db.session.commit()
+    return result.rowcount
+
+
+def conditional(*tables: str):
+    """
+    Decorator adding an ETag to successful GET responses and answering 304
+    when the client's ``If-None-Match`` still matches, without running the
+    route.
+    
+    The ETag is derived from the path, the normalized query string and the
+    versions of ``tables``, which must cover every table the response reads.
+    Versions are read before the route runs, so a write committing in
+    between can only make the ETag older than the body, never newer; the
+    next request then picks up the change.
+    
+    Args:
+        tables: Tables the response is built from
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            try:
+                versions = get_table_versions(*tables)
+            except Exception as e:
+                logger.error(f"Could not read table versions: {str(e)}")
+                db.session.rollback()
+                return f(*args, **kwargs)
+            
+            fingerprint = f"{request.path}?{ResponseCache.normalized_query()}|" + ','.join(
+                f'{table}:{versions[table]}' for table in tables
+            )
+            etag = hashlib.sha1(fingerprint.encode('utf-8')).hexdigest()[:32]
+            
+            if request.if_none_match.contains_weak(etag):
+                response = Response(status=304)
+                response.set_etag(etag, weak=True)
+                response.headers['Cache-Control'] = 'private, no-cache'
+                return response
+            
+            result = f(*args, **kwargs)
+            
+            response, status = result if isinstance(result, tuple) else (result, 200)
+            if status == 200 and isinstance(response, Response):
+                response.set_etag(etag, weak=True)
+                response.headers['Cache-Control'] = 'private, no-cache'
+            
+            return result
+        
+        return decorated
+    return decorator
@@ -1,9 +1,15 @@
+from opentelemetry.trace import SpanKind
 import requests
 import logging
 from datetime import datetime
 from typing import Dict, Any, Optional
 
+from app.utils.metrics import UIPATH_REQUEST_DURATION, UIPATH_REQUESTS, http_outcome
+from app.utils.tracing import tracer
+
 logger = logging.getLogger(__name__)
+# One line per reservation request; rate limited by LOG_RATE_LIMITS
+request_logger = logging.getLogger(f'{__name__}.requests')
 
 
 class UiPathClient:
@@ -28,7 +34,12 @@ class UiPathClient:
                 'client_secret': self.client_secret
             }
             
-            response = requests.post(auth_url, json=payload, timeout=30)
+            with UIPATH_REQUEST_DURATION.labels('authenticate').time(), \
+                    tracer.start_as_current_span('uipath.authenticate', kind=SpanKind.CLIENT) as span:
+                span.set_attributes({'http.method': 'POST', 'http.url': auth_url})
+                response = requests.post(auth_url, json=payload, timeout=30)
+                span.set_attribute('http.status_code', response.status_code)
+            UIPATH_REQUESTS.labels('authenticate', http_outcome(response.status_code)).inc()
             response.raise_for_status()
             
             data = response.json()
@@ -37,8 +48,14 @@ class UiPathClient:
             
             logger.info("Successfully authenticated with UiPath API")
             return True
-            
+        
+        except requests.exceptions.Timeout:
+            UIPATH_REQUESTS.labels('authenticate', 'timeout').inc()
+            logger.error("UiPath authentication timed out")
+            return False
         except Exception as e:
+            if not isinstance(e, requests.exceptions.HTTPError):
+                UIPATH_REQUESTS.labels('authenticate', 'error').inc()
             logger.error(f"Failed to authenticate with UiPath API: {str(e)}")
             return False
     
@@ -63,7 +80,7 @@ class UiPathClient:
             phone_number: Customer's phone number
             area: Selected area name
             additional_data: Any additional data to include
-            
+        
         Returns:
             Dictionary with response data including success status and message
         """
@@ -91,15 +108,23 @@ class UiPathClient:
             if additional_data:
                 payload.update(additional_data)
             
-            logger.info(f"Sending reservation request for national_id: {national_id}, area: {area}")
+            request_logger.info(
+                "Sending reservation request for national_id: %s, area: %s", national_id, area,
+                extra={'national_id': national_id, 'area': area}
+            )
             
             # Send request to UiPath
-            response = requests.post(
-                f"{self.api_url}/reservations",
-                json=payload,
-                headers=headers,
-                timeout=60
-            )
+            with UIPATH_REQUEST_DURATION.labels('reservation').time(), \
+                    tracer.start_as_current_span('uipath.reservation', kind=SpanKind.CLIENT) as span:
+                span.set_attributes({'http.method': 'POST', 'http.url': f"{self.api_url}/reservations"})
+                response = requests.post(
+                    f"{self.api_url}/reservations",
+                    json=payload,
+                    headers=headers,
+                    timeout=60
+                )
+                span.set_attribute('http.status_code', response.status_code)
+            UIPATH_REQUESTS.labels('reservation', http_outcome(response.status_code)).inc()
             
             response_data = response.json() if response.content else {}
             
@@ -110,10 +135,15 @@ class UiPathClient:
                 'data': response_data
             }
             
-            logger.info(f"UiPath API response: {result}")
+            request_logger.info(
+                "UiPath API response %s for national_id: %s", response.status_code, national_id,
+                extra={'national_id': national_id, 'status_code': response.status_code}
+            )
+            request_logger.debug("UiPath API response body: %s", response_data)
             return result
-            
+        
         except requests.exceptions.Timeout:
+            UIPATH_REQUESTS.labels('reservation', 'timeout').inc()
             logger.error("UiPath API request timed out")
             return {
                 'success': False,
@@ -121,6 +151,7 @@ class UiPathClient:
                 'message': 'Request timed out'
             }
         except requests.exceptions.RequestException as e:
+            UIPATH_REQUESTS.labels('reservation', 'error').inc()
             logger.error(f"UiPath API request failed: {str(e)}")
             return {
                 'success': False,
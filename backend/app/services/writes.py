@@ -0,0 +1,84 @@
+from flask import jsonify
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.sql.util import ClauseAdapter
+import logging
+from typing import Any, Dict, Optional
+
+from app.models import db
+from app.utils.serialization import RowSerializer
+
+logger = logging.getLogger(__name__)
+
+# PostgreSQL SQLSTATE codes
+FOREIGN_KEY_VIOLATION = '23503'
+UNIQUE_VIOLATION = '23505'
+
+STATUS_BY_SQLSTATE = {
+    FOREIGN_KEY_VIOLATION: 404,
+    UNIQUE_VIOLATION: 409,
+}
+
+
+def execute_returning(statement, serializer: RowSerializer, *joins) -> Optional[Dict[str, Any]]:
+    """
+    Run an INSERT or UPDATE and build its response from RETURNING in the
+    same round trip
+    
+    The statement becomes a CTE and the serializer's columns, which refer to
+    the statement's table, are rewritten to read from it. Related columns
+    such as ``area_name`` come from ``joins``.
+    
+    Args:
+        statement: ``insert(...)`` or ``update(...)`` of a model table
+        serializer: Row serializer describing the response fields
+        joins: (target, onclause) pairs joined to the written row
+    
+    Returns:
+        The serialized row, or None when no row was written (e.g. an UPDATE
+        matching nothing)
+    
+    Raises:
+        IntegrityError: On a constraint violation, see ``integrity_error_response``
+    
+    Example:
+        data = execute_returning(
+            insert(Customer).values(**data), customer_rows,
+            (Area, Area.id == Customer.area_id)
+        )
+    """
+    written = statement.returning(*statement.table.columns).cte('written')
+    adapter = ClauseAdapter(written)
+    
+    query = select(*(adapter.traverse(column) for column in serializer.columns)).select_from(written)
+    for target, onclause in joins:
+        query = query.join(target, adapter.traverse(onclause))
+    
+    row = db.session.execute(query).first()
+    return serializer.serialize(row) if row else None
+
+
+def integrity_error_response(error: IntegrityError, messages: Dict[str, str]):
+    """
+    Roll back and answer a constraint violation the way the former
+    pre-check SELECTs did: 404 for a missing referenced row, 409 for a
+    duplicate
+    
+    Args:
+        error: Error raised by the write
+        messages: Response message per SQLSTATE (FOREIGN_KEY_VIOLATION,
+            UNIQUE_VIOLATION)
+    
+    Raises:
+        IntegrityError: Re-raised for violations without a message
+    """
+    db.session.rollback()
+    
+    sqlstate = getattr(error.orig, 'pgcode', None)
+    if sqlstate not in messages:
+        raise error
+    
+    return jsonify({
+        'success': False,
+        'message': messages[sqlstate]
+    }), STATUS_BY_SQLSTATE[sqlstate]
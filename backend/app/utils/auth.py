@@ -21,19 +21,57 @@ def generate_token(username):
     return token
 
 
-def verify_token(token):
-    """Verify JWT token and return payload"""
+# Scope claim of the short-lived tokens that open one slot's event stream
+EVENT_STREAM_SCOPE = 'slot-events'
+
+
+def generate_stream_token(username, slot_id):
+    """
+    Generate a short-lived token that only opens the event stream of one
+    slot; it travels in the URL, where access and proxy logs record it
+    
+    Args:
+        username: Admin the token is issued to
+        slot_id: ID of the reservation slot
+    """
+    payload = {
+        'username': username,
+        'scope': EVENT_STREAM_SCOPE,
+        'slot_id': slot_id,
+        'exp': datetime.utcnow() + timedelta(seconds=current_app.config['EVENT_STREAM_TOKEN_SECONDS']),
+        'iat': datetime.utcnow()
+    }
+    
+    return jwt.encode(
+        payload,
+        current_app.config['JWT_SECRET_KEY'],
+        algorithm='HS256'
+    )
+
+
+def verify_token(token, scope=None):
+    """
+    Verify JWT token and return payload
+    
+    Args:
+        token: Encoded JWT
+        scope: Scope the token must have; admin tokens have none, so scoped
+            tokens are refused where an admin token is expected
+    """
     try:
         payload = jwt.decode(
             token,
             current_app.config['JWT_SECRET_KEY'],
             algorithms=['HS256']
         )
-        return payload
     except jwt.ExpiredSignatureError:
         return None
     except jwt.InvalidTokenError:
         return None
+    
+    if payload.get('scope') != scope:
+        return None
+    return payload
 
 
 def token_required(f):
@@ -71,3 +109,45 @@ def token_required(f):
         return f(*args, **kwargs)
     
     return decorated
+
+
+def stream_token_required(f):
+    """
+    Like token_required, but browser EventSource connections, which cannot
+    set headers, may instead pass a token from generate_stream_token as the
+    ``token`` query parameter; admin tokens are refused there
+    """
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        token = None
+        
+        if 'Authorization' in request.headers:
+            try:
+                token = request.headers['Authorization'].split(' ')[1]  # Bearer <token>
+            except IndexError:
+                return jsonify({
+                    'success': False,
+                    'message': 'Invalid authorization header format'
+                }), 401
+            payload = verify_token(token)
+        else:
+            token = request.args.get('token')
+            payload = verify_token(token, scope=EVENT_STREAM_SCOPE) if token else None
+            if payload and payload.get('slot_id') != kwargs.get('slot_id'):
+                payload = None
+        
+        if not token:
+            return jsonify({
+                'success': False,
+                'message': 'Authentication token is missing'
+            }), 401
+        
+        if not payload:
+            return jsonify({
+                'success': False,
+                'message': 'Invalid or expired token'
+            }), 401
+        
+        return f(*args, **kwargs)
+    
+    return decorated
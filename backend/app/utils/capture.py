@@ -0,0 +1,163 @@
+from flask import g, request
+from datetime import datetime
+import gzip
+import logging
+import os
+import queue
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import orjson
+
+logger = logging.getLogger(__name__)
+
+# Headers never written to the capture; their names are kept so a replay
+# knows to supply its own credentials
+SECRET_HEADERS = re.compile(r'authorization|cookie|api[-_]?key|token|secret|password|signature', re.IGNORECASE)
+
+# Records collected before being compressed and appended to the file
+BATCH_RECORDS = 500
+BATCH_SECONDS = 1.0
+
+
+class CaptureWriter:
+    """
+    Appends captured requests to ``<dir>/<start>-<pid>.ndjson.gz``, one file
+    per worker process, starting a new one past ``max_bytes``. Each batch is
+    written as a complete gzip member, so a file stays readable if the
+    process dies. Requests only pay for a queue put; when the queue is full
+    records are dropped and counted.
+    """
+    
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.dropped = 0
+        self._pid = None
+        self._queue: queue.Queue = queue.Queue(maxsize=10000)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+    
+    def put(self, record: Dict[str, Any]):
+        if self._pid != os.getpid():
+            self._start()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+    
+    def _start(self):
+        # Also restarts the thread in a forked worker process
+        with self._lock:
+            if self._pid != os.getpid():
+                self._queue = queue.Queue(maxsize=10000)
+                self._thread = threading.Thread(target=self._run, name='traffic-capture', daemon=True)
+                self._thread.start()
+                self._pid = os.getpid()
+    
+    def _new_path(self) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        return os.path.join(self.directory, f"{datetime.utcnow():%Y%m%dT%H%M%S}-{os.getpid()}.ndjson.gz")
+    
+    def _run(self):
+        path = None
+        while True:
+            batch: List[bytes] = [orjson.dumps(self._queue.get())]
+            deadline = time.monotonic() + BATCH_SECONDS
+            while len(batch) < BATCH_RECORDS:
+                try:
+                    batch.append(orjson.dumps(self._queue.get(timeout=max(deadline - time.monotonic(), 0))))
+                except queue.Empty:
+                    break
+            
+            if self.dropped:
+                logger.warning(f"Traffic capture queue full, dropped {self.dropped} requests")
+                self.dropped = 0
+            try:
+                if path is None or os.path.getsize(path) >= self.max_bytes:
+                    path = self._new_path()
+                with open(path, 'ab') as f:
+                    f.write(gzip.compress(b'\n'.join(batch) + b'\n', compresslevel=6))
+            except OSError as e:
+                logger.error(f"Could not write traffic capture to {path}: {str(e)}")
+                path = None
+
+
+_writer: Optional[CaptureWriter] = None
+
+
+def _captured(path: str, prefixes: tuple) -> bool:
+    return any(path == prefix or path.startswith(prefix.rstrip('/') + '/') for prefix in prefixes)
+
+
+def _body(max_bytes: int) -> Dict[str, Any]:
+    data = request.get_data(cache=True)
+    if not data:
+        return {}
+    fields = {}
+    if len(data) > max_bytes:
+        data = data[:max_bytes]
+        fields['body_truncated'] = True
+    try:
+        fields['body'] = data.decode('utf-8')
+    except UnicodeDecodeError:
+        fields['body'] = data.hex()
+        fields['body_encoding'] = 'hex'
+    return fields
+
+
+def register_capture(app):
+    """
+    With TRAFFIC_CAPTURE on, record the requests to TRAFFIC_CAPTURE_PATHS
+    (the UiPath webhook and the admin API by default) for replay with
+    benchmarks/replay.py: arrival time, method, path, query, headers without
+    credentials, body (up to TRAFFIC_CAPTURE_MAX_BODY_BYTES), response status
+    and size, and the time taken. Streamed responses are left out. Captures
+    hold customer data: keep TRAFFIC_CAPTURE_DIR as private as the database.
+    """
+    global _writer
+    
+    if not app.config['TRAFFIC_CAPTURE']:
+        return
+    
+    prefixes = tuple(path.strip() for path in app.config['TRAFFIC_CAPTURE_PATHS'].split(',') if path.strip())
+    max_body = app.config['TRAFFIC_CAPTURE_MAX_BODY_BYTES']
+    _writer = CaptureWriter(app.config['TRAFFIC_CAPTURE_DIR'], app.config['TRAFFIC_CAPTURE_MAX_FILE_MB'] * 1024 * 1024)
+    logger.info(f"Capturing requests to {', '.join(prefixes)} in {app.config['TRAFFIC_CAPTURE_DIR']}")
+    
+    @app.before_request
+    def start_capture():
+        if _captured(request.path, prefixes):
+            g.capture_started = (time.time(), time.perf_counter())
+    
+    @app.after_request
+    def capture_request(response):
+        started = g.pop('capture_started', None)
+        if started is None or response.is_streamed:
+            return response
+        
+        headers = {}
+        redacted = []
+        for name, value in request.headers.items():
+            if SECRET_HEADERS.search(name):
+                redacted.append(name)
+            elif name not in ('Host', 'Content-Length'):
+                headers[name] = value
+        
+        record = {
+            'time': round(started[0], 4),
+            'method': request.method,
+            'path': request.path,
+            'query': request.query_string.decode('latin-1'),
+            'headers': headers,
+            'redacted_headers': redacted,
+            **_body(max_body),
+            'status': response.status_code,
+            'response_bytes': response.content_length,
+            'duration_ms': round((time.perf_counter() - started[1]) * 1000, 3),
+            'pid': os.getpid()
+        }
+        _writer.put(record)
+        return response
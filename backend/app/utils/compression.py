@@ -0,0 +1,73 @@
+from flask import request
+import gzip
+import logging
+
+try:
+    import brotli
+except ImportError:  # optional, gzip is always available
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json',
+    'application/javascript',
+    'text/html',
+    'text/css',
+    'text/plain',
+}
+
+
+def _choose_encoding():
+    """Best encoding accepted by the client, preferring brotli"""
+    accepted = request.accept_encodings
+    if brotli is not None and accepted.quality('br') > 0:
+        return 'br'
+    if accepted.quality('gzip') > 0:
+        return 'gzip'
+    return None
+
+
+def register_compression(app):
+    """
+    Compress response bodies of at least COMPRESSION_MIN_SIZE bytes with
+    brotli or gzip, as negotiated through Accept-Encoding. Streamed
+    responses (e.g. Server-Sent Events) are left untouched.
+    """
+    if not app.config['COMPRESSION_ENABLED']:
+        return
+    
+    min_size = app.config['COMPRESSION_MIN_SIZE']
+    gzip_level = app.config['COMPRESSION_GZIP_LEVEL']
+    brotli_quality = app.config['COMPRESSION_BROTLI_QUALITY']
+    
+    @app.after_request
+    def compress_response(response):
+        if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+            return response
+        
+        response.vary.add('Accept-Encoding')
+        
+        if (
+            response.status_code != 200
+            or response.direct_passthrough
+            or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or response.content_length is None
+            or response.content_length < min_size
+        ):
+            return response
+        
+        encoding = _choose_encoding()
+        if not encoding:
+            return response
+        
+        body = response.get_data()
+        if encoding == 'br':
+            compressed = brotli.compress(body, quality=brotli_quality)
+        else:
+            compressed = gzip.compress(body, compresslevel=gzip_level)
+        
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,25 @@
+from flask_sqlalchemy.session import Session
+
+
+class RoutingSession(Session):
+    """
+    ``db.session`` class choosing the engine, and so the connection pool,
+    per session
+    
+    ``info['pool']`` is the bind key of the primary engine to use instead of
+    the default one; the scheduler sets it for its jobs.
+    ``app.services.replicas`` sets ``info['replica']`` to the bind key of a
+    replica engine for read-only requests; flushes still go to the primary.
+    """
+    
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            replica = self.info.get('replica')
+            if replica and not self._flushing:
+                return self._db.engines[replica]
+            
+            pool = self.info.get('pool')
+            if pool:
+                return self._db.engines[pool]
+        
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
@@ -0,0 +1,99 @@
+from opentelemetry import trace
+from datetime import datetime, timezone
+import logging
+import logging.handlers
+import threading
+import time
+from typing import Dict
+
+import orjson
+
+# Attributes every LogRecord has; anything else was passed through ``extra``
+RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with ``extra`` fields and the trace ids"""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'pid': record.process,
+            'thread': record.threadName
+        }
+        entry.update((key, value) for key, value in vars(record).items() if key not in RECORD_ATTRIBUTES)
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return orjson.dumps(entry, default=str).decode()
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Lets at most ``limits[logger]`` records per second through for each
+    listed logger (and its children). Warnings and errors always pass; the
+    next record let through carries the number dropped in ``suppressed``.
+    """
+    
+    def __init__(self, limits: Dict[str, float]):
+        super().__init__()
+        self.limits = limits
+        self._buckets: Dict[str, list] = {}
+        self._lock = threading.Lock()
+    
+    def _limit_of(self, name: str):
+        while name:
+            if name in self.limits:
+                return name
+            name = name.rpartition('.')[0]
+        return None
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        key = self._limit_of(record.name)
+        if key is None:
+            return True
+        
+        rate = self.limits[key]
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.setdefault(key, [rate, now, 0])  # tokens, updated, dropped
+            bucket[0] = min(rate, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+            if bucket[0] < 1:
+                bucket[2] += 1
+                return False
+            bucket[0] -= 1
+            if bucket[2]:
+                record.suppressed = bucket[2]
+                bucket[2] = 0
+        return True
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler leaving message formatting to the listener thread. The stock
+    one formats in the logging thread so records can be pickled, which an
+    in-process queue does not need. Trace ids are captured here, as the
+    current span is only known to the logging thread.
+    """
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        context = trace.get_current_span().get_span_context()
+        if context.is_valid:
+            record.trace_id = format(context.trace_id, '032x')
+            record.span_id = format(context.span_id, '016x')
+        return record
+
+
+def parse_rate_limits(value: str) -> Dict[str, float]:
+    """``logger=per_second,...`` as a dict"""
+    limits = {}
+    for item in value.split(','):
+        name, _, rate = item.partition('=')
+        if name.strip() and rate.strip():
+            limits[name.strip()] = float(rate)
+    return limits
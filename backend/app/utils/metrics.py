@@ -0,0 +1,201 @@
+from flask import Response, g, has_request_context, jsonify, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+import hmac
+import os
+import time
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess
+)
+
+# With PROMETHEUS_MULTIPROC_DIR set (see gunicorn.conf.py) each worker
+# process writes its samples to files in that directory and /metrics
+# aggregates all of them, so whichever worker answers a scrape reports the
+# whole server. The variable must be set before this module is imported.
+MULTIPROCESS = bool(os.getenv('PROMETHEUS_MULTIPROC_DIR'))
+
+# HTTP
+HTTP_REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds',
+    'Time to produce a response, streamed bodies excluded',
+    ['method', 'blueprint', 'route', 'status'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+HTTP_REQUEST_DB_QUERIES = Histogram(
+    'http_request_db_queries',
+    'SQL statements executed per request',
+    ['blueprint', 'route'],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+)
+HTTP_REQUEST_DB_SECONDS = Histogram(
+    'http_request_db_seconds',
+    'Time spent executing SQL statements per request',
+    ['blueprint', 'route'],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+)
+
+# Database, per pool (web, scheduler, listener, replica_N)
+DB_QUERY_DURATION = Histogram(
+    'db_query_duration_seconds',
+    'SQL statement execution time',
+    ['pool'],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5)
+)
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    'db_pool_checkout_wait_seconds',
+    'Time to obtain a connection from the pool, including opening one',
+    ['pool'],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5)
+)
+DB_POOL_CHECKOUT_TIMEOUTS = Counter(
+    'db_pool_checkout_timeouts_total',
+    'Checkouts that gave up after DB_POOL_TIMEOUT',
+    ['pool']
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    'db_pool_checked_out_connections',
+    'Connections currently checked out',
+    ['pool'],
+    multiprocess_mode='livesum'
+)
+DB_POOL_CONNECTIONS_OPENED = Counter('db_pool_connections_opened_total', 'Connections opened', ['pool'])
+DB_POOL_CONNECTIONS_CLOSED = Counter('db_pool_connections_closed_total', 'Connections closed', ['pool'])
+
+# Slot dispatch. Lag and duration are observed once per slot; slot IDs are
+# not labels, as they would grow without bound.
+DISPATCH_REQUESTS = Counter(
+    'dispatch_requests_total',
+    'Reservation requests sent at slot time, by UiPath verdict (accepted, rejected, error)',
+    ['outcome']
+)
+SLOT_DISPATCH_LAG = Histogram(
+    'slot_dispatch_lag_seconds',
+    'Delay between the scheduled time of a slot and the start of its dispatch',
+    buckets=(0.1, 0.5, 1, 2, 5, 10, 30, 60, 300, 900, 3600)
+)
+SLOT_DISPATCH_DURATION = Histogram(
+    'slot_dispatch_duration_seconds',
+    'Time to send the requests of a whole slot',
+    buckets=(1, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+)
+SLOT_DISPATCHES_IN_PROGRESS = Gauge(
+    'slot_dispatches_in_progress',
+    'Slots currently being dispatched',
+    multiprocess_mode='livesum'
+)
+
+# UiPath
+UIPATH_REQUEST_DURATION = Histogram(
+    'uipath_request_duration_seconds',
+    'UiPath API call latency',
+    ['operation'],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+)
+UIPATH_REQUESTS = Counter(
+    'uipath_requests_total',
+    'UiPath API calls by outcome (success, http_4xx, http_5xx, timeout, error)',
+    ['operation', 'outcome']
+)
+
+# Webhook
+WEBHOOK_UPDATES = Counter(
+    'webhook_updates_total',
+    'Status updates received from UiPath, by outcome (applied, no_attempt, unknown_customer, invalid)',
+    ['status', 'outcome']
+)
+
+# Scheduler
+SCHEDULER_JOBS = Counter(
+    'scheduler_jobs_total',
+    'Scheduler job runs by outcome (success, error, skipped)',
+    ['job', 'outcome']
+)
+SCHEDULER_JOB_DURATION = Histogram(
+    'scheduler_job_duration_seconds',
+    'Scheduler job run time',
+    ['job'],
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900)
+)
+
+
+def http_outcome(status_code: int) -> str:
+    """``success``, ``http_4xx`` or ``http_5xx``"""
+    if status_code < 400:
+        return 'success'
+    return f'http_{status_code // 100}xx'
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, '_metrics_started', None)
+    if started is None:
+        return
+    
+    elapsed = time.perf_counter() - started
+    DB_QUERY_DURATION.labels(getattr(conn.engine.pool, 'name', 'default')).observe(elapsed)
+    
+    if has_request_context() and 'db_queries' in g:
+        g.db_queries += 1
+        g.db_seconds += elapsed
+
+
+def _route_labels():
+    return request.blueprint or '', request.url_rule.rule if request.url_rule else 'unmatched'
+
+
+def register_metrics(app):
+    """
+    Time requests and SQL statements, and serve every metric at
+    ``/metrics`` in the Prometheus text format. With METRICS_TOKEN set,
+    scrapes must send it as a bearer token.
+    """
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    
+    @app.before_request
+    def start_request_metrics():
+        g.request_started = time.perf_counter()
+        g.db_queries = 0
+        g.db_seconds = 0.0
+    
+    @app.after_request
+    def record_request_metrics(response):
+        started = g.pop('request_started', None)
+        if started is None:
+            return response
+        
+        blueprint, route = _route_labels()
+        HTTP_REQUEST_DURATION.labels(request.method, blueprint, route, str(response.status_code)).observe(
+            time.perf_counter() - started
+        )
+        HTTP_REQUEST_DB_QUERIES.labels(blueprint, route).observe(g.db_queries)
+        HTTP_REQUEST_DB_SECONDS.labels(blueprint, route).observe(g.db_seconds)
+        return response
+    
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        token = app.config['METRICS_TOKEN']
+        if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            return jsonify({
+                'success': False,
+                'message': 'Invalid metrics token'
+            }), 401
+        
+        registry = REGISTRY
+        if MULTIPROCESS:
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+        
+        return Response(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,317 @@
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from collections import Counter
+from datetime import datetime
+import functools
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+from app.utils.auth import verify_token
+
+logger = logging.getLogger(__name__)
+
+# Request header asking to profile a single request; honoured only with a
+# valid admin token
+PROFILE_HEADER = 'X-Profile'
+
+# Distinct SQL statements and memory lines kept per profile
+MAX_STATEMENTS = 200
+TOP_MEMORY_LINES = 25
+
+_settings: Dict[str, Any] = {}
+_frame_labels: Dict[Any, str] = {}
+_local = threading.local()
+_sql_lock = threading.Lock()
+_sql_listening = False
+_tracemalloc_lock = threading.Lock()
+_tracemalloc_users = 0
+_tracemalloc_started = False
+
+
+def _frame_label(code) -> str:
+    label = _frame_labels.get(code)
+    if label is None:
+        path = code.co_filename
+        for marker in ('site-packages/', 'backend/'):
+            if marker in path:
+                path = path.rsplit(marker, 1)[1]
+                break
+        label = _frame_labels[code] = f"{code.co_name} ({path})"
+    return label
+
+
+def _fold(frame) -> str:
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    return ';'.join(reversed(labels))
+
+
+class _StackSampler(threading.Thread):
+    """Counts the stacks of one thread every ``interval`` seconds"""
+    
+    def __init__(self, thread_id: int, interval: float):
+        super().__init__(name='profile-sampler', daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stopped = threading.Event()
+    
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[_fold(frame)] += 1
+    
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if getattr(_local, 'profile', None) is not None:
+        context._profile_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = getattr(_local, 'profile', None)
+    started = getattr(context, '_profile_started', None)
+    if profile is not None and started is not None:
+        profile.record_statement(statement, time.perf_counter() - started)
+
+
+def _listen_sql():
+    # Installed on first use, so without profiling no statement pays for it
+    global _sql_listening
+    with _sql_lock:
+        if not _sql_listening:
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+            _sql_listening = True
+
+
+def _start_tracemalloc():
+    # Shared by concurrent profiles; left alone if started elsewhere
+    global _tracemalloc_users, _tracemalloc_started
+    with _tracemalloc_lock:
+        if _tracemalloc_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracemalloc_started = True
+        _tracemalloc_users += 1
+
+
+def _stop_tracemalloc():
+    global _tracemalloc_users, _tracemalloc_started
+    with _tracemalloc_lock:
+        _tracemalloc_users -= 1
+        if _tracemalloc_users == 0 and _tracemalloc_started:
+            tracemalloc.stop()
+            _tracemalloc_started = False
+
+
+class Profile:
+    """
+    Profile of one request or job run, written to PROFILING_DIR when it ends:
+    
+    - ``<id>.folded``: sampled stacks of the profiled thread in the collapsed
+      format of flamegraph.pl, speedscope and similar tools
+    - ``<id>.json``: wall and CPU time, the SQL statements run by the thread
+      with their count and timing, and the peak and top lines of memory
+      traced during the run (tracemalloc sees every thread, so concurrent
+      work shows up too)
+    """
+    
+    def __init__(self, kind: str, name: str):
+        self.kind = kind
+        self.name = name
+        self.started_at = datetime.utcnow()
+        stamp = self.started_at.strftime('%Y%m%dT%H%M%S%f')
+        self.id = f"{stamp}-{kind}-{re.sub(r'[^A-Za-z0-9_.-]+', '_', name).strip('_')[:80]}-{os.getpid()}"
+        self.statements: Dict[str, List[float]] = {}
+        self._sampler: Optional[_StackSampler] = None
+    
+    def record_statement(self, statement: str, elapsed: float):
+        stats = self.statements.get(statement)
+        if stats is None:
+            if len(self.statements) >= MAX_STATEMENTS:
+                return
+            stats = self.statements[statement] = [0, 0.0, 0.0]
+        stats[0] += 1
+        stats[1] += elapsed
+        stats[2] = max(stats[2], elapsed)
+    
+    def start(self):
+        _listen_sql()
+        if _settings['memory']:
+            _start_tracemalloc()
+        self._started = time.perf_counter()
+        self._cpu_started = time.thread_time()
+        self._sampler = _StackSampler(threading.get_ident(), _settings['interval'])
+        self._sampler.start()
+        _local.profile = self
+    
+    def stop(self) -> str:
+        """End the profile and write its files; returns the profile id"""
+        _local.profile = None
+        self._sampler.stop()
+        wall = time.perf_counter() - self._started
+        cpu = time.thread_time() - self._cpu_started
+        
+        memory = None
+        if _settings['memory']:
+            # Leave out the profiler's own allocations
+            snapshot = tracemalloc.take_snapshot().filter_traces([
+                tracemalloc.Filter(False, __file__),
+                tracemalloc.Filter(False, tracemalloc.__file__)
+            ])
+            current, peak = tracemalloc.get_traced_memory()
+            _stop_tracemalloc()
+            memory = {
+                'traced_bytes': current,
+                'peak_bytes': peak,
+                'top_lines': [
+                    {'line': str(stat.traceback[0]), 'size_bytes': stat.size, 'blocks': stat.count}
+                    for stat in snapshot.statistics('lineno')[:TOP_MEMORY_LINES]
+                ]
+            }
+        
+        statements = sorted(self.statements.items(), key=lambda item: item[1][1], reverse=True)
+        summary = {
+            'id': self.id,
+            'kind': self.kind,
+            'name': self.name,
+            'pid': os.getpid(),
+            'started_at': self.started_at.isoformat(),
+            'wall_seconds': round(wall, 6),
+            'cpu_seconds': round(cpu, 6),
+            'sample_interval_seconds': _settings['interval'],
+            'samples': sum(self._sampler.stacks.values()),
+            'sql': {
+                'statements': sum(stats[0] for _, stats in statements),
+                'seconds': round(sum(stats[1] for _, stats in statements), 6),
+                'top': [
+                    {'statement': statement, 'count': count, 'total_seconds': round(total, 6), 'max_seconds': round(longest, 6)}
+                    for statement, (count, total, longest) in statements
+                ]
+            },
+            'memory': memory
+        }
+        
+        directory = _settings['dir']
+        try:
+            os.makedirs(directory, exist_ok=True)
+            with open(os.path.join(directory, f"{self.id}.folded"), 'w', encoding='utf-8') as f:
+                f.writelines(f"{stack} {count}\n" for stack, count in self._sampler.stacks.most_common())
+            with open(os.path.join(directory, f"{self.id}.json"), 'w', encoding='utf-8') as f:
+                json.dump(summary, f, indent=2)
+        except OSError as e:
+            logger.error(f"Could not write profile {self.id}: {str(e)}")
+        
+        logger.info(f"Profile {self.id}: {wall:.3f}s wall, {cpu:.3f}s CPU, {summary['sql']['statements']} SQL statements")
+        return self.id
+
+
+def profiled(kind: str, name: Callable[..., str]):
+    """
+    Profile every call of the decorated job when PROFILING_JOBS is on
+    
+    Args:
+        kind: Profile kind, e.g. ``slot``
+        name: Called with the job's arguments to name the profile
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _settings.get('jobs'):
+                return func(*args, **kwargs)
+            
+            profile = Profile(kind, name(*args, **kwargs))
+            profile.start()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profile.stop()
+        return wrapper
+    return decorator
+
+
+def _wants_profile() -> bool:
+    if _settings['requests']:
+        return True
+    if not request.headers.get(PROFILE_HEADER):
+        return False
+    
+    authorization = request.headers.get('Authorization', '')
+    return authorization.startswith('Bearer ') and verify_token(authorization[len('Bearer '):]) is not None
+
+
+def register_profiling(app):
+    """
+    Profile requests and scheduler jobs into PROFILING_DIR: every request
+    with PROFILING_REQUESTS, every slot dispatch with PROFILING_JOBS, and a
+    single request when an admin sends ``X-Profile: 1``. The response then
+    carries the profile id in ``X-Profile-Id``. Nothing is sampled or timed
+    unless a profile is running.
+    """
+    _settings.update({
+        'dir': app.config['PROFILING_DIR'],
+        'requests': app.config['PROFILING_REQUESTS'],
+        'jobs': app.config['PROFILING_JOBS'],
+        'interval': app.config['PROFILING_INTERVAL_MS'] / 1000,
+        'memory': app.config['PROFILING_MEMORY']
+    })
+    
+    @app.before_request
+    def start_profile():
+        if _wants_profile():
+            g.profile = Profile('request', f"{request.method} {request.path}")
+            g.profile.start()
+    
+    @app.after_request
+    def stop_profile(response):
+        profile = g.pop('profile', None)
+        if profile is not None:
+            response.headers['X-Profile-Id'] = profile.stop()
+        return response
+    
+    @app.teardown_request
+    def abandon_profile(error=None):
+        # after_request is skipped when a view raises
+        profile = g.pop('profile', None)
+        if profile is not None:
+            profile.stop()
+
+
+def list_profiles(limit: int = 50) -> List[Dict[str, Any]]:
+    """Summaries of the most recent profiles in PROFILING_DIR, newest first"""
+    directory = _settings['dir']
+    try:
+        names = [name for name in os.listdir(directory) if name.endswith('.json')]
+    except FileNotFoundError:
+        return []
+    
+    profiles = []
+    for name in sorted(names, reverse=True)[:limit]:
+        try:
+            with open(os.path.join(directory, name), encoding='utf-8') as f:
+                summary = json.load(f)
+        except (OSError, ValueError):
+            continue
+        profiles.append({
+            key: summary.get(key)
+            for key in ('id', 'kind', 'name', 'pid', 'started_at', 'wall_seconds', 'cpu_seconds', 'samples')
+        })
+    return profiles
+
+
+def profile_directory() -> str:
+    return os.path.abspath(_settings['dir'])
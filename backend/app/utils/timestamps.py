@@ -0,0 +1,19 @@
+from datetime import datetime
+
+
+def parse_utc_timestamp(value: str) -> datetime:
+    """
+    Parse an ISO 8601 timestamp into a naive UTC datetime, the form the
+    DateTime columns are stored in
+    
+    Offsets (including a trailing ``Z``) are converted to UTC. Comparing a
+    column with a naive value keeps the comparison on the bare column, which
+    partition pruning and index scans on ``created_at`` depend on.
+    
+    Raises:
+        ValueError: On a malformed timestamp
+    """
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo:
+        parsed = (parsed - parsed.utcoffset()).replace(tzinfo=None)
+    return parsed
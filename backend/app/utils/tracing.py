@@ -0,0 +1,172 @@
+from opentelemetry import trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import (
+    BatchSpanProcessor,
+    ConsoleSpanExporter,
+    SpanExporter,
+    SpanExportResult
+)
+from opentelemetry.sdk.trace.sampling import (
+    Decision,
+    ParentBased,
+    Sampler,
+    SamplingResult,
+    TraceIdRatioBased
+)
+from opentelemetry.trace import Status, StatusCode
+from opentelemetry.trace.propagation.tracecontext import TraceContextTextMapPropagator
+import importlib
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Without register_tracing configuring an exporter this is the API's no-op
+# tracer, and spans cost next to nothing
+tracer = trace.get_tracer('hedri_sakni')
+
+_propagator = TraceContextTextMapPropagator()
+_provider: Optional[TracerProvider] = None
+
+
+class FileSpanExporter(SpanExporter):
+    """Appends finished spans to a file, one OpenTelemetry JSON object per line"""
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+    
+    def export(self, spans) -> SpanExportResult:
+        lines = ''.join(span.to_json(indent=None) + '\n' for span in spans)
+        try:
+            # One append per batch keeps the lines of concurrent worker processes whole
+            with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+                f.write(lines)
+        except OSError as e:
+            logger.error(f"Could not write spans to {self.path}: {str(e)}")
+            return SpanExportResult.FAILURE
+        return SpanExportResult.SUCCESS
+    
+    def shutdown(self):
+        pass
+
+
+def _otlp_exporter(config) -> SpanExporter:
+    try:
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+    except ImportError:
+        raise RuntimeError('The otlp exporter requires the opentelemetry-exporter-otlp-proto-http package')
+    # Endpoint and headers come from the standard OTEL_EXPORTER_OTLP_* variables
+    return OTLPSpanExporter()
+
+
+# TRACING_EXPORTERS names; anything else is read as a ``module:factory``
+# path, the factory being called with the app config
+EXPORTERS: Dict[str, Callable] = {
+    'file': lambda config: FileSpanExporter(config['TRACING_FILE']),
+    'console': lambda config: ConsoleSpanExporter(),
+    'otlp': _otlp_exporter
+}
+
+
+def _load_exporter(name: str, config) -> SpanExporter:
+    factory = EXPORTERS.get(name)
+    if factory is None:
+        module, _, attribute = name.partition(':')
+        factory = getattr(importlib.import_module(module), attribute)
+    return factory(config)
+
+
+class RateLimitedSampler(Sampler):
+    """
+    Samples a TRACING_SAMPLE_RATIO share of new traces, and at most
+    ``per_second`` of them per second and process, so a burst of slot
+    dispatches or webhooks does not turn into a burst of exports
+    """
+    
+    def __init__(self, ratio: float, per_second: float):
+        self._ratio = TraceIdRatioBased(ratio)
+        self._per_second = per_second
+        self._tokens = per_second
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def should_sample(self, parent_context, trace_id, name, kind=None, attributes=None, links=None, trace_state=None):
+        result = self._ratio.should_sample(parent_context, trace_id, name, kind, attributes, links, trace_state)
+        if result.decision is not Decision.RECORD_AND_SAMPLE or not self._per_second:
+            return result
+        
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self._per_second, self._tokens + (now - self._updated) * self._per_second)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return result
+        
+        return SamplingResult(Decision.DROP)
+    
+    def get_description(self) -> str:
+        return f"RateLimitedSampler{{{self._ratio.get_description()}, {self._per_second}/s}}"
+
+
+def register_tracing(app):
+    """
+    Export spans to the TRACING_EXPORTERS (comma separated); without any,
+    tracing stays off. The sampling decision is taken once per trace, at its
+    root, and followed by every span of the trace, including webhook
+    callbacks carrying its correlation id.
+    """
+    global _provider
+    
+    names = [name.strip() for name in app.config['TRACING_EXPORTERS'].split(',') if name.strip()]
+    if not names or _provider is not None:
+        return
+    
+    provider = TracerProvider(
+        resource=Resource.create({'service.name': app.config['TRACING_SERVICE_NAME']}),
+        sampler=ParentBased(RateLimitedSampler(
+            app.config['TRACING_SAMPLE_RATIO'],
+            app.config['TRACING_MAX_TRACES_PER_SECOND']
+        ))
+    )
+    for name in names:
+        try:
+            provider.add_span_processor(BatchSpanProcessor(_load_exporter(name, app.config)))
+        except Exception as e:
+            logger.error(f"Could not set up trace exporter {name}: {str(e)}")
+    
+    trace.set_tracer_provider(provider)
+    _provider = provider
+    logger.info(f"Tracing to {', '.join(names)} (sample ratio {app.config['TRACING_SAMPLE_RATIO']})")
+
+
+def correlation_id() -> Optional[str]:
+    """
+    W3C ``traceparent`` of the current span, sent to UiPath so its callback
+    can be attached to the same trace; None while tracing is off
+    """
+    carrier = {}
+    _propagator.inject(carrier)
+    return carrier.get('traceparent')
+
+
+def correlation_context(value: Optional[str]):
+    """Trace context of a correlation id, or None to start a new trace"""
+    if not value:
+        return None
+    return _propagator.extract({'traceparent': value})
+
+
+def record_error(error: Exception):
+    """Mark the current span as failed with ``error``"""
+    span = trace.get_current_span()
+    span.record_exception(error)
+    span.set_status(Status(StatusCode.ERROR, str(error)))
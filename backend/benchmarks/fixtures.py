@@ -0,0 +1,147 @@
+"""
+Synthetic data for the benchmark suite, generated inside Postgres
+
+Rows are derived from their position and the seed only (``hashtext``), so a
+given size and seed always gives the same data. Every reset truncates the
+app's tables: point the suite at a database of its own.
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+CHUNK_ROWS = 1_000_000
+
+TABLES = (
+    'areas', 'customers', 'reservation_slots', 'reservation_attempts', 'payload_overflow',
+    'area_status_counts', 'attempt_rollups', 'slot_reports', 'deleted_rows', 'area_deletions'
+)
+
+INSERT_AREAS = text("""
+    INSERT INTO areas (name, description, link, is_active, created_at, updated_at)
+    SELECT 'منطقة ' || a, 'أراضي سكنية - مخطط ' || a, 'https://maps.example.com/areas/' || a, true, :now, :now
+    FROM generate_series(1, :areas) a
+""")
+
+INSERT_CUSTOMERS = text("""
+    INSERT INTO customers (name, phone_number, national_id, area_id, reservation_status, created_at, updated_at)
+    SELECT
+        'محمد عبد الله ' || c,
+        '079' || lpad(c::text, 7, '0'),
+        (9000000000 + c)::text,
+        (c - 1) % :areas + 1,
+        CASE WHEN :all_open THEN 'OPEN'
+             ELSE (ARRAY['OPEN', 'OPEN', 'SUCCESS', 'FAILED'])[1 + (hashtext(c || ':' || :seed) & 3)] END,
+        :now, :now
+    FROM generate_series(:first, :last) c
+""")
+
+# Slot s belongs to area (s - 1) % areas + 1, on day (s - 1) / areas; it is
+# created the day before, ahead of its attempts as slot_attempts_window()
+# expects
+INSERT_SLOTS = text("""
+    INSERT INTO reservation_slots (area_id, scheduled_datetime, is_processed, created_at, updated_at)
+    SELECT area_id, scheduled, true, scheduled - interval '1 day', scheduled
+    FROM (
+        SELECT (s - 1) % :areas + 1 AS area_id,
+               :start + ((s - 1) / :areas) * interval '1 day' + interval '9 hours' AS scheduled
+        FROM generate_series(1, :slots) s
+    ) slots
+""")
+
+# Attempt i goes to slot (i - 1) % slots + 1 and to a customer of that slot's
+# area; ``responded`` and ``succeeded`` are thresholds out of 128
+INSERT_ATTEMPTS = text("""
+    INSERT INTO reservation_attempts (
+        customer_id, reservation_slot_id, request_sent_at, request_payload,
+        response_received_at, response_status, response_code, response_message, created_at, updated_at
+    )
+    SELECT
+        customer_id, slot_id, sent_at,
+        jsonb_build_object(
+            'national_id', (9000000000 + customer_id)::text,
+            'phone_number', '079' || lpad(customer_id::text, 7, '0'),
+            'area', 'منطقة ' || area_id
+        ),
+        CASE WHEN responded THEN sent_at + (1 + (h & 1023) / 10.0) * interval '1 second' END,
+        CASE WHEN responded THEN CASE WHEN succeeded THEN 'SUCCESS' ELSE 'FAILED' END END,
+        CASE WHEN responded THEN CASE WHEN succeeded THEN 200 ELSE 409 END END,
+        CASE WHEN responded THEN CASE WHEN succeeded THEN 'تم الحجز بنجاح' ELSE 'لا توجد قطع متاحة' END END,
+        sent_at, sent_at
+    FROM (
+        SELECT
+            slot_id, area_id, h,
+            area_id + :areas * (((i - 1) / :slots) % :customers_per_area) AS customer_id,
+            :start + ((slot_id - 1) / :areas) * interval '1 day' + interval '9 hours'
+                + (i % 3600) * interval '1 second' AS sent_at,
+            ((h >> 12) & 127) < :responded AS responded,
+            ((h >> 20) & 127) < :succeeded AS succeeded
+        FROM (
+            SELECT i, (i - 1) % :slots + 1 AS slot_id, (i - 1) % :slots % :areas + 1 AS area_id,
+                   hashtext(i || ':' || :seed) AS h
+            FROM generate_series(:first, :last) i
+        ) drawn
+    ) attempts
+""")
+
+
+def reset(engine):
+    """Empty the app's tables and restart their ids at 1"""
+    with engine.begin() as connection:
+        connection.exec_driver_sql(f"TRUNCATE {', '.join(TABLES)} RESTART IDENTITY CASCADE")
+
+
+def _chunks(total: int):
+    for first in range(1, total + 1, CHUNK_ROWS):
+        yield first, min(first + CHUNK_ROWS - 1, total)
+
+
+def seed(engine, areas: int, customers: int, attempts: int = 0, days: int = 90,
+         all_open: bool = False, responded: float = 0.85, succeeded: float = 0.8, seed: int = 1):
+    """
+    Reset the tables and load areas, customers, one processed slot per area
+    and day over the last ``days`` days, and attempts spread over those slots
+    
+    Args:
+        engine: Engine of the benchmark database
+        areas: Number of areas
+        customers: Number of customers, spread evenly over the areas
+        attempts: Number of reservation attempts
+        days: Days of history
+        all_open: Give every customer the OPEN status (dispatch targets)
+        responded: Share of attempts with a webhook response
+        succeeded: Share of responses reporting SUCCESS
+        seed: Seed of every drawn value
+    """
+    if attempts and customers < areas:
+        raise ValueError('Attempts need at least one customer per area')
+    
+    now = datetime.utcnow()
+    start = datetime(now.year, now.month, now.day) - timedelta(days=days)
+    reset(engine)
+    
+    with engine.begin() as connection:
+        connection.execute(INSERT_AREAS, {'areas': areas, 'now': now})
+        connection.execute(
+            text("SELECT create_reservation_attempt_partitions(:start, :end)"),
+            {'start': start, 'end': now + timedelta(days=62)}
+        )
+    for first, last in _chunks(customers):
+        with engine.begin() as connection:
+            connection.execute(INSERT_CUSTOMERS, {
+                'areas': areas, 'all_open': all_open, 'seed': seed, 'now': now, 'first': first, 'last': last
+            })
+    
+    if attempts:
+        slots = areas * days
+        with engine.begin() as connection:
+            connection.execute(INSERT_SLOTS, {'areas': areas, 'slots': slots, 'start': start})
+        for first, last in _chunks(attempts):
+            with engine.begin() as connection:
+                connection.execute(INSERT_ATTEMPTS, {
+                    'areas': areas, 'slots': slots, 'customers_per_area': customers // areas,
+                    'start': start, 'seed': seed, 'first': first, 'last': last,
+                    'responded': int(responded * 128), 'succeeded': int(succeeded * 128)
+                })
+    
+    with engine.connect() as connection:
+        connection.execution_options(isolation_level='AUTOCOMMIT').exec_driver_sql('ANALYZE')
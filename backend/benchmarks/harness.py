@@ -0,0 +1,188 @@
+"""
+Shared plumbing of the benchmark suite: the app served in-process, SQL and
+memory accounting, latency statistics and the results file
+"""
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from werkzeug.serving import make_server
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+RESULTS_VERSION = 1
+
+
+class SqlCounter:
+    """Counts the statements run by every engine of the process"""
+    
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+        event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+    
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        with self._lock:
+            self.count += 1
+
+
+class AppServer:
+    """The Flask app on a free local port, served by threads of this process"""
+    
+    def __init__(self, app):
+        self.server = make_server('127.0.0.1', 0, app, threaded=True)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        self._thread = threading.Thread(target=self.server.serve_forever, name='benchmark-app', daemon=True)
+    
+    def start(self) -> 'AppServer':
+        self._thread.start()
+        return self
+    
+    def stop(self):
+        self.server.shutdown()
+
+
+def rss_mb() -> float:
+    """Current resident memory of the process"""
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max(peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10, rss_mb())
+
+
+def percentile(ordered: List[float], share: float) -> float:
+    """Nearest-rank percentile of sorted values"""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, int(round(share * len(ordered))) - 1))]
+
+
+def latency_stats(seconds: List[float]) -> Dict[str, float]:
+    """p50/p90/p99/max/mean of durations, in milliseconds"""
+    ordered = sorted(seconds)
+    stats = {
+        'p50': percentile(ordered, 0.50),
+        'p90': percentile(ordered, 0.90),
+        'p99': percentile(ordered, 0.99),
+        'max': ordered[-1] if ordered else 0.0,
+        'mean': sum(ordered) / len(ordered) if ordered else 0.0
+    }
+    return {key: round(value * 1000, 3) for key, value in stats.items()}
+
+
+class Case:
+    """
+    Measures one benchmark case: wall time, operations and their latencies,
+    SQL statements and memory
+    
+    Args:
+        name: Case name, e.g. ``dispatch/10000``; cases are matched by name
+            when two results files are compared
+        counter: SqlCounter of the process
+    """
+    
+    def __init__(self, name: str, counter: SqlCounter):
+        self.name = name
+        self.counter = counter
+        self.latencies: List[float] = []
+        self.errors = 0
+        self.extra: Dict[str, Any] = {}
+    
+    def __enter__(self) -> 'Case':
+        self._sql = self.counter.count
+        self._started = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.seconds = time.perf_counter() - self._started
+        self.sql = self.counter.count - self._sql
+    
+    def result(self, operations: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Args:
+            operations: Operations done in the case; defaults to the number
+                of recorded latencies
+        """
+        operations = len(self.latencies) if operations is None else operations
+        result = {
+            'name': self.name,
+            'operations': operations,
+            'errors': self.errors,
+            'seconds': round(self.seconds, 3),
+            'throughput_per_second': round(operations / self.seconds, 2) if self.seconds else None,
+            'latency_ms': latency_stats(self.latencies),
+            'sql_statements': self.sql,
+            'sql_per_operation': round(self.sql / operations, 2) if operations else None,
+            'rss_mb': round(rss_mb(), 1),
+            'peak_rss_mb': round(peak_rss_mb(), 1)
+        }
+        if self.extra:
+            result['extra'] = self.extra
+        return result
+
+
+def _git(*args: str) -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', *args], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment(connection=None) -> Dict[str, Any]:
+    """
+    Commit and machine the results were taken on
+    
+    Args:
+        connection: Connection to the benchmark database, for its version;
+            None when the database is out of reach (replays)
+    """
+    return {
+        'commit': _git('rev-parse', 'HEAD'),
+        'dirty': bool(_git('status', '--porcelain', '--untracked-files=no')),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'postgres': connection.exec_driver_sql('SHOW server_version').scalar() if connection is not None else None
+    }
+
+
+def write_results(scenario: str, params: Dict[str, Any], env: Dict[str, Any],
+                  cases: List[Dict[str, Any]], path: Optional[str] = None) -> str:
+    """
+    Write the results of a run as JSON; returns the file path
+    
+    Args:
+        path: Defaults to ``benchmarks/results/<scenario>-<commit>-<time>.json``
+    """
+    if path is None:
+        stamp = datetime.utcnow().strftime('%Y%m%dT%H%M%S')
+        path = os.path.join(RESULTS_DIR, f"{scenario}-{(env['commit'] or 'unknown')[:10]}-{stamp}.json")
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'version': RESULTS_VERSION,
+            'scenario': scenario,
+            'created_at': datetime.utcnow().isoformat(),
+            **env,
+            'params': params,
+            'cases': cases
+        }, f, indent=2)
+    return path
@@ -0,0 +1,247 @@
+"""
+Replay of captured traffic against a test instance
+
+Re-sends the requests recorded with TRAFFIC_CAPTURE=True (app/utils/capture.py)
+in their recorded order and spacing, divided by --speed: 1 is real time, 10
+ten times faster, 0 as fast as --concurrency clients allow. Latency counts
+from the time a request was due, so a target falling behind the recorded pace
+shows up as latency rather than as a slower replay. Results are reported per
+endpoint like the suite's, so two replays can go through ``suite compare``.
+
+Credentials are removed at capture: requests that carried them are sent with
+a token of the target, from --token or a login with --username/--password.
+Webhook updates and admin writes are replayed as they were, so point this at
+a test instance restored from a copy of the data the capture was taken on,
+never at production.
+
+Usage (from backend/):
+    python -m benchmarks.replay logs/capture --target http://localhost:5000 --speed 1 --username admin --password admin123
+    python -m benchmarks.replay logs/capture/*.ndjson.gz --target ... --speed 10 --paths /api/external/update
+    python -m benchmarks.suite compare benchmarks/results/replay-<a>.json benchmarks/results/replay-<b>.json
+"""
+import argparse
+import glob
+import gzip
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+
+from benchmarks.harness import Case, SqlCounter, environment, latency_stats, write_results
+
+# Not sent again: the HTTP client sets its own
+SKIPPED_HEADERS = {'connection', 'content-length', 'host', 'transfer-encoding'}
+
+
+def load(paths: List[str], prefixes: List[str], limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Captured requests of the given files and directories, oldest first
+    
+    Args:
+        paths: Capture files (.ndjson.gz or .ndjson) or directories of them
+        prefixes: Keep only requests under these path prefixes (all when empty)
+        limit: Keep the first ``limit`` requests
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += glob.glob(os.path.join(path, '*.ndjson.gz')) + glob.glob(os.path.join(path, '*.ndjson'))
+        else:
+            files.append(path)
+    
+    records = []
+    for name in sorted(files):
+        with (gzip.open if name.endswith('.gz') else open)(name, 'rt', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if not prefixes or any(record['path'].startswith(prefix) for prefix in prefixes):
+                    records.append(record)
+    records.sort(key=lambda record: record['time'])
+    return records[:limit] if limit else records
+
+
+def endpoint(record: Dict[str, Any]) -> str:
+    """Case name of a request: method and path, numeric ids replaced"""
+    return f"replay/{record['method']} {re.sub(r'/[0-9]+(?=/|$)', '/<id>', record['path'])}"
+
+
+def login(target: str, username: str, password: str) -> str:
+    response = requests.post(f"{target}/api/auth/login", json={'username': username, 'password': password}, timeout=30)
+    response.raise_for_status()
+    return response.json()['token']
+
+
+class Replay:
+    """
+    Sends captured requests to the target and gathers their timings
+    
+    Args:
+        target: Base URL of the test instance
+        token: Token sent in place of removed Authorization headers
+        timeout: Seconds to wait for each response
+    """
+    
+    def __init__(self, target: str, token: Optional[str], timeout: float):
+        self.target = target.rstrip('/')
+        self.token = token
+        self.timeout = timeout
+        self.counter = SqlCounter()
+        self.cases: Dict[str, Case] = {}
+        self.send_lag: List[float] = []
+        self.statuses: Dict[str, Counter] = {}
+        self.mismatches: Counter = Counter()
+        self._lock = threading.Lock()
+        self._sessions = threading.local()
+    
+    def session(self) -> requests.Session:
+        session = getattr(self._sessions, 'session', None)
+        if session is None:
+            session = self._sessions.session = requests.Session()
+        return session
+    
+    def send(self, record: Dict[str, Any]) -> Optional[int]:
+        """Status of the replayed request; None when no response came"""
+        headers = {name: value for name, value in record['headers'].items() if name.lower() not in SKIPPED_HEADERS}
+        if self.token and 'Authorization' in record.get('redacted_headers', []):
+            headers['Authorization'] = f"Bearer {self.token}"
+        body = record.get('body')
+        if body is not None:
+            body = bytes.fromhex(body) if record.get('body_encoding') == 'hex' else body.encode('utf-8')
+        
+        url = self.target + record['path'] + (f"?{record['query']}" if record.get('query') else '')
+        try:
+            response = self.session().request(
+                record['method'], url, headers=headers, data=body, timeout=self.timeout, allow_redirects=False
+            )
+            response.content
+            return response.status_code
+        except requests.RequestException:
+            return None
+    
+    def timed(self, record: Dict[str, Any], scheduled: Optional[float]):
+        sent = time.perf_counter()
+        status = self.send(record)
+        done = time.perf_counter()
+        
+        name = endpoint(record)
+        with self._lock:
+            case = self.cases.setdefault(name, Case(name, self.counter))
+            case.latencies.append(done - (sent if scheduled is None else scheduled))
+            if scheduled is not None:
+                self.send_lag.append(sent - scheduled)
+            self.statuses.setdefault(name, Counter())[str(status)] += 1
+            if status is None or (status >= 500 and record['status'] < 500):
+                case.errors += 1
+            if status != record['status']:
+                self.mismatches[name] += 1
+    
+    def run(self, records: List[Dict[str, Any]], speed: float, concurrency: int) -> float:
+        """
+        Replay ``records``; returns the seconds taken
+        
+        At speed 0 requests go out as soon as a client is free and latency is
+        the response time. Otherwise each one is started at its recorded
+        offset divided by ``speed`` whether or not earlier ones have answered.
+        """
+        first = records[0]['time']
+        started = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as executor:
+            for record in records:
+                scheduled = None
+                if speed:
+                    scheduled = started + (record['time'] - first) / speed
+                    delay = scheduled - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                executor.submit(self.timed, record, scheduled)
+        return time.perf_counter() - started
+    
+    def results(self, seconds: float) -> List[Dict[str, Any]]:
+        """Cases of the replay, all requests first, then by endpoint"""
+        overall = Case('replay/all', self.counter)
+        for name in sorted(self.cases):
+            overall.latencies += self.cases[name].latencies
+            overall.errors += self.cases[name].errors
+        overall.extra['send_lag_ms'] = latency_stats(self.send_lag)
+        overall.extra['status_mismatches'] = sum(self.mismatches.values())
+        
+        results = []
+        for case in [overall] + [self.cases[name] for name in sorted(self.cases)]:
+            if case is not overall:
+                case.extra['statuses'] = dict(self.statuses[case.name])
+                case.extra['status_mismatches'] = self.mismatches[case.name]
+            case.seconds, case.sql = seconds, 0
+            result = case.result()
+            # SQL runs in the target, out of reach of this process
+            result['sql_statements'] = result['sql_per_operation'] = None
+            results.append(result)
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('files', nargs='+', help='Capture files or directories (TRAFFIC_CAPTURE_DIR)')
+    parser.add_argument('--target', required=True, help='Base URL of the test instance, e.g. http://localhost:5000')
+    parser.add_argument('--speed', type=float, default=1, help='1 real time, 10 ten times faster, 0 as fast as possible')
+    parser.add_argument('--concurrency', type=int, default=64, help='Requests in flight at most')
+    parser.add_argument('--token', help='Token of the target for requests captured with credentials')
+    parser.add_argument('--username', help='Log in to the target to get a token')
+    parser.add_argument('--password')
+    parser.add_argument('--paths', nargs='+', default=[], help='Replay only requests under these path prefixes')
+    parser.add_argument('--limit', type=int, help='Replay only the first N requests')
+    parser.add_argument('--timeout', type=float, default=60, help='Seconds to wait for each response')
+    parser.add_argument('--output', help='Results file (default: benchmarks/results/replay-<commit>-<time>.json)')
+    args = parser.parse_args()
+    
+    if args.speed < 0:
+        parser.error('--speed must be 0 or more')
+    records = load(args.files, args.paths, args.limit)
+    if not records:
+        parser.error('No captured requests found')
+    
+    token = args.token
+    if token is None and args.username:
+        token = login(args.target.rstrip('/'), args.username, args.password or '')
+    if token is None and any('Authorization' in record.get('redacted_headers', []) for record in records):
+        print('  no --token or --username: admin requests will be rejected by the target', flush=True)
+    
+    span = records[-1]['time'] - records[0]['time']
+    pace = f"{args.speed:g}x, {span / args.speed:.1f}s" if args.speed else 'as fast as possible'
+    print(f"replaying {len(records)} requests captured over {span:.1f}s to {args.target} ({pace})", flush=True)
+    
+    replay = Replay(args.target, token, args.timeout)
+    seconds = replay.run(records, args.speed, args.concurrency)
+    cases = replay.results(seconds)
+    for case in cases:
+        latency = case['latency_ms']
+        print(
+            f"  {case['name']:<50} {case['operations']:>7} req  p50 {latency['p50']:>9.2f} ms  "
+            f"p99 {latency['p99']:>9.2f} ms  {case['errors']} errors  {case['extra']['status_mismatches']} status changes",
+            flush=True
+        )
+    
+    params = {
+        'target': args.target,
+        'speed': args.speed,
+        'concurrency': args.concurrency,
+        'files': args.files,
+        'paths': args.paths,
+        'requests': len(records),
+        'captured_seconds': round(span, 3)
+    }
+    print(f"results: {write_results('replay', params, environment(), cases, args.output)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""
+Micro-benchmark of list-route serialization
+
+Compares the marshmallow ``Schema.dump(many=True)`` + Flask default JSON path
+with the compiled row serializers + orjson provider used by the list routes.
+Runs without a database: ORM objects and the equivalent column tuples are
+built in memory.
+
+Usage (from backend/):
+    python -m benchmarks.serialization_benchmark --rows 5000 --repeat 5
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from app.models import Area, Customer, ReservationSlot, ReservationAttempt
+from app.schemas import (
+    AreaSchema, CustomerSchema, ReservationAttemptSchema,
+    area_rows, customer_rows, reservation_attempt_rows
+)
+from app.utils.serialization import OrjsonProvider
+
+
+def build_fixtures(count: int):
+    """ORM objects and the matching column tuples for each serializer"""
+    now = datetime(2024, 1, 1, 8, 0, 0)
+    areas, customers, attempts = [], [], []
+    
+    for i in range(count):
+        area = Area(
+            id=i, name=f'منطقة {i}', description='أراضي سكنية في الضاحية الشمالية',
+            link=f'https://maps.example.com/{i}', is_active=True,
+            created_at=now, updated_at=now
+        )
+        customer = Customer(
+            id=i, name=f'محمد عبد الله {i}', phone_number=f'0791{i:06d}',
+            national_id=f'{9000000000 + i}', area_id=i, area=area,
+            reservation_status='OPEN', created_at=now, updated_at=now
+        )
+        slot = ReservationSlot(id=i, area_id=i, area=area, scheduled_datetime=now)
+        attempt = ReservationAttempt(
+            id=i, customer_id=i, reservation_slot_id=i, reservation_slot=slot,
+            request_sent_at=now, request_payload={'national_id': customer.national_id, 'area': area.name},
+            response_received_at=now + timedelta(seconds=3), response_status='SUCCESS',
+            response_code=200, response_message='تم الحجز بنجاح',
+            response_payload={'status': 'SUCCESS', 'code': 200}, created_at=now, updated_at=now
+        )
+        areas.append(area)
+        customers.append(customer)
+        attempts.append(attempt)
+    
+    def as_rows(serializer, objects, resolve):
+        return [tuple(resolve(obj, key) for key in serializer.keys) for obj in objects]
+    
+    def attribute(obj, key):
+        if key == 'area_name':
+            owner = getattr(obj, 'area', None) or obj.reservation_slot.area
+            return owner.name
+        return getattr(obj, key)
+    
+    return [
+        ('areas', AreaSchema(many=True), areas, area_rows, as_rows(area_rows, areas, attribute)),
+        ('customers', CustomerSchema(many=True), customers, customer_rows, as_rows(customer_rows, customers, attribute)),
+        ('attempts', ReservationAttemptSchema(many=True), attempts,
+         reservation_attempt_rows, as_rows(reservation_attempt_rows, attempts, attribute)),
+    ]
+
+
+def best_of(repeat: int, func) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=5000, help='Rows per list')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per case; the best is reported')
+    args = parser.parse_args()
+    
+    app = Flask(__name__)
+    default_json = DefaultJSONProvider(app)
+    fast_json = OrjsonProvider(app)
+    
+    print(f"{args.rows} rows, best of {args.repeat}")
+    print(f"{'list':<10} {'marshmallow+json':>18} {'rows+orjson':>14} {'speedup':>9} {'bytes':>18}")
+    
+    for name, schema, objects, serializer, rows in build_fixtures(args.rows):
+        baseline_body = default_json.dumps({'success': True, 'data': schema.dump(objects)})
+        fast_body = fast_json.dumps({'success': True, 'data': serializer.dump(rows)})
+        assert fast_json.loads(fast_body) == default_json.loads(baseline_body), f"{name}: output differs"
+        
+        baseline = best_of(args.repeat, lambda: default_json.dumps({'success': True, 'data': schema.dump(objects)}))
+        fast = best_of(args.repeat, lambda: fast_json.dumps({'success': True, 'data': serializer.dump(rows)}))
+        
+        sizes = f"{len(baseline_body.encode())}/{len(fast_body.encode())}"
+        print(f"{name:<10} {baseline * 1000:>15.1f} ms {fast * 1000:>11.1f} ms {baseline / fast:>8.1f}x {sizes:>18}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,375 @@
+"""
+Reproducible end-to-end benchmarks, runnable offline
+
+Serves the app in this process against a dedicated Postgres database (its
+tables are truncated and reseeded) and a local UiPath stub
+(benchmarks/uipath_stub.py), then runs one scenario:
+
+    dispatch    process a reservation slot of N OPEN customers
+    webhooks    open-loop POST /api/external/update at R requests/s
+    analytics   analytics endpoints over N reservation attempts
+    lists       list endpoints over N customers and attempts
+
+Each case reports throughput, p50/p90/p99/max latency, SQL statements and
+memory, written as JSON to benchmarks/results/ with the git commit, so runs
+of two commits can be put side by side with ``compare``. Data and UiPath
+outcomes are drawn from --seed.
+
+Usage (from backend/):
+    python -m benchmarks.suite dispatch --database-url postgresql://localhost/hedri_sakni_bench --sizes 1000 10000 100000
+    python -m benchmarks.suite webhooks --database-url ... --rates 50 200 500 --duration 30
+    python -m benchmarks.suite analytics --database-url ... --sizes 1000000 10000000
+    python -m benchmarks.suite lists --database-url ... --sizes 10000 100000
+    python -m benchmarks.suite compare benchmarks/results/lists-<a>.json benchmarks/results/lists-<b>.json
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+
+from benchmarks import fixtures
+from benchmarks.harness import AppServer, Case, SqlCounter, environment, write_results
+from benchmarks.uipath_stub import UiPathStub
+
+SCENARIOS = ('dispatch', 'webhooks', 'analytics', 'lists')
+DEFAULT_SIZES = {
+    'dispatch': [1000, 10000, 100000],
+    'webhooks': [10000],
+    'analytics': [1000000, 10000000],
+    'lists': [10000, 100000]
+}
+
+# Compared by ``compare``: (label, key path, True when higher is better)
+METRICS = (
+    ('throughput/s', ('throughput_per_second',), True),
+    ('p50 ms', ('latency_ms', 'p50'), False),
+    ('p99 ms', ('latency_ms', 'p99'), False),
+    ('SQL/op', ('sql_per_operation',), False),
+    ('peak MB', ('peak_rss_mb',), False)
+)
+
+
+class Bench:
+    """App, UiPath stub and HTTP clients shared by the cases of a run"""
+    
+    def __init__(self, args):
+        self.args = args
+        self.stub = UiPathStub(
+            latency_ms=args.uipath_latency_ms, latency_p99_ms=args.uipath_latency_p99_ms,
+            reject_rate=args.uipath_reject_rate, error_rate=args.uipath_error_rate, seed=args.seed
+        ).start()
+        
+        os.environ.update({
+            'DATABASE_URL': args.database_url,
+            'UIPATH_API_URL': self.stub.url,
+            # Every request has to reach the database
+            'ANALYTICS_CACHE_BACKEND': 'none'
+        })
+        from app import create_app
+        from app.models import db
+        from app.schema_updates import apply_schema_updates
+        from app.services.scheduler import reservation_scheduler
+        from app.utils.auth import generate_token
+        
+        self.app = create_app('production')
+        # The maintenance jobs would compete with the measured requests and
+        # add their SQL to every case; ``seed`` runs them once instead
+        reservation_scheduler.shutdown()
+        self.scheduler = reservation_scheduler
+        self.counter = SqlCounter()
+        with self.app.app_context():
+            db.create_all()
+            apply_schema_updates()
+            self.engine = db.engine
+            self.headers = {'Authorization': f"Bearer {generate_token(self.app.config['ADMIN_USERNAME'])}"}
+        self.server = AppServer(self.app).start()
+        if args.uipath_callback_delay_ms is not None:
+            self.stub.callback_url = f"{self.server.url}/api/external/update"
+            self.stub.callback_delay = args.uipath_callback_delay_ms / 1000
+        self._sessions = threading.local()
+    
+    def session(self) -> requests.Session:
+        """HTTP session of the calling thread"""
+        session = getattr(self._sessions, 'session', None)
+        if session is None:
+            session = self._sessions.session = requests.Session()
+        return session
+    
+    def seed(self, **sizes):
+        if not self.args.no_seed:
+            started = time.perf_counter()
+            fixtures.seed(self.engine, seed=self.args.seed, **sizes)
+            print(f"  seeded {sizes} in {time.perf_counter() - started:.1f}s", flush=True)
+        self.settle()
+    
+    def settle(self):
+        """
+        Fold pending changes into the derived tables, as the maintenance jobs
+        would have by the time the data is read in production
+        """
+        from app.services.rollups import compact_attempt_rollups
+        from app.services.slot_reports import refresh_slot_reports
+        from app.services.status_counts import compact_status_counts
+        from app.services.table_versions import compact_table_versions
+        
+        for name, job in (
+            ('compact_status_counts', compact_status_counts),
+            ('compact_attempt_rollups', compact_attempt_rollups),
+            ('refresh_slot_reports', refresh_slot_reports),
+            ('compact_table_versions', compact_table_versions)
+        ):
+            self.scheduler._run_exclusive(name, job)
+    
+    def close(self):
+        self.server.stop()
+        self.stub.stop()
+
+
+def closed_loop(case: Case, call: Callable[[int], bool], total: int, concurrency: int):
+    """``total`` calls from ``concurrency`` clients, each waiting for its last answer"""
+    def timed(index):
+        started = time.perf_counter()
+        ok = call(index)
+        return time.perf_counter() - started, ok
+    
+    with ThreadPoolExecutor(concurrency) as executor:
+        for elapsed, ok in executor.map(timed, range(total)):
+            case.latencies.append(elapsed)
+            case.errors += not ok
+
+
+def open_loop(case: Case, call: Callable[[int], bool], rate: float, duration: float, concurrency: int):
+    """
+    Start a call every 1/``rate`` seconds whether or not earlier ones have
+    answered. Latency counts from the scheduled start, so time spent queued
+    behind a saturated server is included rather than hidden.
+    """
+    lock = threading.Lock()
+    
+    def timed(index, scheduled):
+        ok = call(index)
+        with lock:
+            case.latencies.append(time.perf_counter() - scheduled)
+            case.errors += not ok
+    
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        for index in range(int(rate * duration)):
+            scheduled = started + index / rate
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(timed, index, scheduled)
+
+
+def run_dispatch(bench: Bench) -> List[Dict]:
+    from app.services.scheduler import reservation_scheduler
+    
+    results = []
+    for size in bench.args.sizes:
+        bench.seed(areas=1, customers=size, all_open=True)
+        with bench.engine.begin() as connection:
+            slot_id = connection.exec_driver_sql(
+                "INSERT INTO reservation_slots (area_id, scheduled_datetime, is_processed, created_at, updated_at) "
+                "SELECT min(id), now() AT TIME ZONE 'utc', false, now(), now() FROM areas RETURNING id"
+            ).scalar()
+        
+        counts = dict(bench.stub.counts)
+        with Case(f"dispatch/{size}", bench.counter) as case:
+            reservation_scheduler._process_reservation_slot(slot_id)
+        
+        with bench.engine.connect() as connection:
+            sent = [
+                row[0] for row in connection.exec_driver_sql(
+                    "SELECT request_sent_at FROM reservation_attempts "
+                    "WHERE reservation_slot_id = %(slot_id)s ORDER BY request_sent_at",
+                    {'slot_id': slot_id}
+                )
+            ]
+        # Requests go out one after the other: the gap between two is the
+        # time spent on one customer
+        case.latencies = [(b - a).total_seconds() for a, b in zip(sent, sent[1:])]
+        case.extra['uipath'] = {key: bench.stub.counts[key] - counts[key] for key in counts}
+        case.errors = size - case.extra['uipath']['accepted']
+        results.append(case.result(operations=len(sent)))
+    return results
+
+
+def run_webhooks(bench: Bench) -> List[Dict]:
+    customers = bench.args.sizes[0]
+    bench.seed(areas=10, customers=customers, attempts=customers, days=1, responded=0)
+    order = random.Random(bench.args.seed)
+    outcomes = [order.random() < 0.8 for _ in range(customers)]
+    
+    def call(index):
+        customer = index % customers + 1
+        succeeded = outcomes[index % customers]
+        response = bench.session().post(f"{bench.server.url}/api/external/update", json={
+            'national_id': str(9000000000 + customer),
+            'status': 'SUCCESS' if succeeded else 'FAILED',
+            'response_code': 200 if succeeded else 409,
+            'message': 'تم الحجز بنجاح' if succeeded else 'لا توجد قطع متاحة'
+        }, timeout=60)
+        return response.status_code == 200
+    
+    results = []
+    for rate in bench.args.rates:
+        with Case(f"webhooks/{rate:g}rps", bench.counter) as case:
+            open_loop(case, call, rate, bench.args.duration, bench.args.concurrency)
+        case.extra['target_per_second'] = rate
+        results.append(case.result())
+    return results
+
+
+def _endpoint_cases(bench: Bench, prefix: str, endpoints: List[tuple]) -> List[Dict]:
+    results = []
+    for name, path in endpoints:
+        def call(index, path=path):
+            response = bench.session().get(f"{bench.server.url}{path}", headers=bench.headers, timeout=600)
+            return response.status_code == 200
+        
+        for index in range(bench.args.warmup):
+            call(index)
+        with Case(f"{prefix}/{name}", bench.counter) as case:
+            closed_loop(case, call, bench.args.repeat, bench.args.concurrency)
+        results.append(case.result())
+    return results
+
+
+def run_analytics(bench: Bench) -> List[Dict]:
+    results = []
+    today = datetime.utcnow().date()
+    day = (today - timedelta(days=7)).isoformat()
+    week = f"start_date={(today - timedelta(days=7)).isoformat()}&end_date={today.isoformat()}"
+    for size in bench.args.sizes:
+        bench.seed(areas=50, customers=max(size // 10, 50), attempts=size, days=90)
+        results += _endpoint_cases(bench, f"analytics/{size}", [
+            ('summary', '/api/analytics/summary'),
+            ('attempts_area_day', f"/api/analytics/attempts?area_id=1&start_date={day}&end_date={day}T23:59:59"),
+            ('timeseries_week_hour', f"/api/analytics/timeseries?granularity=hour&{week}"),
+            ('timeseries_all_day', '/api/analytics/timeseries?granularity=day'),
+            ('latency_week', f"/api/analytics/latency?{week}")
+        ])
+    return results
+
+
+def run_lists(bench: Bench) -> List[Dict]:
+    results = []
+    for size in bench.args.sizes:
+        bench.seed(areas=50, customers=size, attempts=size, days=30)
+        results += _endpoint_cases(bench, f"lists/{size}", [
+            ('areas', '/api/areas'),
+            ('customers', '/api/customers'),
+            ('customers_area', '/api/customers?area_id=1'),
+            ('customers_search', '/api/customers/search?q=' + requests.utils.quote('عبد الله 12')),
+            ('reservations', '/api/reservations'),
+            ('dashboard', '/api/dashboard/bootstrap')
+        ])
+    return results
+
+
+RUNNERS = {
+    'dispatch': run_dispatch,
+    'webhooks': run_webhooks,
+    'analytics': run_analytics,
+    'lists': run_lists
+}
+
+
+def _value(case: Dict, path: tuple):
+    for key in path:
+        case = case.get(key) if isinstance(case, dict) else None
+    return case
+
+
+def compare(baseline_path: str, candidate_path: str):
+    """Print the change of every metric for the cases found in both files"""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)
+    with open(candidate_path, encoding='utf-8') as f:
+        candidate = json.load(f)
+    
+    print(f"baseline  {(baseline['commit'] or '?')[:10]}{' (dirty)' if baseline['dirty'] else ''}  {baseline['created_at']}")
+    print(f"candidate {(candidate['commit'] or '?')[:10]}{' (dirty)' if candidate['dirty'] else ''}  {candidate['created_at']}")
+    print(f"{'case':<40} {'metric':<13} {'baseline':>12} {'candidate':>12} {'change':>9}")
+    
+    cases = {case['name']: case for case in baseline['cases']}
+    for case in candidate['cases']:
+        before = cases.get(case['name'])
+        if before is None:
+            continue
+        for label, path, higher_is_better in METRICS:
+            old, new = _value(before, path), _value(case, path)
+            if old is None or new is None:
+                continue
+            change = f"{(new - old) / old * 100:+.1f}%" if old else ''
+            worse = (new < old) if higher_is_better else (new > old)
+            flag = ' !' if old and worse and abs(new - old) / old > 0.1 else ''
+            print(f"{case['name']:<40} {label:<13} {old:>12g} {new:>12g} {change:>9}{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('scenario', choices=SCENARIOS + ('compare',))
+    parser.add_argument('files', nargs='*', help='compare: baseline and candidate results files')
+    parser.add_argument('--database-url', help='Database to run against; its tables are truncated')
+    parser.add_argument('--sizes', type=int, nargs='+', help='Customers (dispatch, webhooks, lists) or attempts (analytics)')
+    parser.add_argument('--rates', type=float, nargs='+', default=[50, 200, 500], help='webhooks: requests per second')
+    parser.add_argument('--duration', type=float, default=30, help='webhooks: seconds per rate')
+    parser.add_argument('--repeat', type=int, default=20, help='analytics, lists: measured calls per endpoint')
+    parser.add_argument('--warmup', type=int, default=2, help='analytics, lists: unmeasured calls per endpoint')
+    parser.add_argument('--concurrency', type=int, help='Concurrent clients (default 1; webhooks: at most, default 64)')
+    parser.add_argument('--uipath-latency-ms', type=float, default=5, help='Median UiPath response time')
+    parser.add_argument('--uipath-latency-p99-ms', type=float, default=50)
+    parser.add_argument('--uipath-reject-rate', type=float, default=0.0)
+    parser.add_argument('--uipath-error-rate', type=float, default=0.0)
+    parser.add_argument('--uipath-callback-delay-ms', type=float,
+                        help='dispatch: have the stub call the webhook this long after accepting')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--no-seed', action='store_true', help='Reuse the data left by the previous run')
+    parser.add_argument('--output', help='Results file (default: benchmarks/results/<scenario>-<commit>-<time>.json)')
+    args = parser.parse_args()
+    
+    if args.scenario == 'compare':
+        if len(args.files) != 2:
+            parser.error('compare takes a baseline and a candidate results file')
+        compare(*args.files)
+        return
+    if not args.database_url:
+        parser.error('--database-url is required; use a database of its own, its tables are truncated')
+    args.concurrency = args.concurrency or (64 if args.scenario == 'webhooks' else 1)
+    args.sizes = args.sizes or DEFAULT_SIZES[args.scenario]
+    
+    bench = Bench(args)
+    try:
+        with bench.engine.connect() as connection:
+            env = environment(connection)
+        print(f"{args.scenario} at {(env['commit'] or 'unknown')[:10]}{' (dirty)' if env['dirty'] else ''}", flush=True)
+        cases = []
+        for case in RUNNERS[args.scenario](bench):
+            latency = case['latency_ms']
+            print(
+                f"  {case['name']:<40} {case['throughput_per_second'] or 0:>10.1f}/s  p50 {latency['p50']:>9.2f} ms  "
+                f"p99 {latency['p99']:>9.2f} ms  {case['sql_per_operation'] or 0:>7.1f} SQL/op  {case['errors']} errors",
+                flush=True
+            )
+            cases.append(case)
+    finally:
+        bench.close()
+    
+    params = {key: value for key, value in vars(args).items() if key not in ('database_url', 'files', 'output')}
+    print(f"Results: {write_results(args.scenario, params, env, cases, args.output)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+"""
+Local stand-in for the UiPath API
+
+Answers ``POST /oauth/token`` and ``POST /reservations`` like UiPath does,
+with a log-normal latency set by its median and 99th percentile, and
+configurable shares of rejected (422), failed (500) and hanging (past the
+client's 60 s timeout) requests. With --callback-url it also posts the
+webhook status update for accepted requests, echoing their correlation_id,
+after --callback-delay-ms. Everything is drawn from --seed, so two runs see
+the same sequence of outcomes.
+
+Usage (from backend/):
+    python -m benchmarks.uipath_stub --port 8089 --latency-ms 50 --latency-p99-ms 400 --error-rate 0.01
+then run the app with UIPATH_API_URL=http://127.0.0.1:8089
+"""
+import argparse
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+import requests
+
+# z-score of the 99th percentile of a normal distribution
+Z_99 = 2.326
+
+
+class UiPathStub:
+    """
+    Threaded HTTP server playing UiPath
+    
+    Args:
+        port: Port to listen on, 0 for any free port
+        latency_ms: Median response time
+        latency_p99_ms: 99th percentile response time
+        reject_rate: Share of requests answered 422
+        error_rate: Share of requests answered 500
+        hang_rate: Share of requests never answered in time
+        callback_url: Webhook receiving the status of accepted requests
+        callback_delay_ms: Delay before the webhook call
+        success_rate: Share of webhook calls reporting SUCCESS
+        seed: Random seed
+    """
+    
+    def __init__(self, port: int = 0, latency_ms: float = 5, latency_p99_ms: Optional[float] = None,
+                 reject_rate: float = 0.0, error_rate: float = 0.0, hang_rate: float = 0.0,
+                 callback_url: Optional[str] = None, callback_delay_ms: float = 1000,
+                 success_rate: float = 0.8, seed: int = 1):
+        self.latency_mu = math.log(max(latency_ms, 0.001) / 1000)
+        self.latency_sigma = math.log(latency_p99_ms / latency_ms) / Z_99 if latency_p99_ms else 0.0
+        self.reject_rate = reject_rate
+        self.error_rate = error_rate
+        self.hang_rate = hang_rate
+        self.callback_url = callback_url
+        self.callback_delay = callback_delay_ms / 1000
+        self.success_rate = success_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts = {'token': 0, 'accepted': 0, 'rejected': 0, 'failed': 0, 'hung': 0, 'callbacks': 0}
+        
+        stub = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            
+            def log_message(self, format, *args):
+                pass
+            
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                if self.path.endswith('/oauth/token'):
+                    stub._count('token')
+                    return self._reply(200, {'access_token': 'stub-token', 'expires_in': 3600})
+                if self.path.endswith('/reservations'):
+                    return self._reply(*stub.reservation(json.loads(body or b'{}')))
+                return self._reply(404, {'message': 'Not found'})
+            
+            def _reply(self, status, payload):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+        
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self._thread = None
+    
+    def _count(self, key: str):
+        with self.lock:
+            self.counts[key] += 1
+    
+    def reservation(self, payload: dict):
+        """Draw the latency and outcome of one reservation request"""
+        with self.lock:
+            latency = math.exp(self.random.gauss(self.latency_mu, self.latency_sigma))
+            draw = self.random.random()
+            succeeded = self.random.random() < self.success_rate
+        
+        if draw < self.hang_rate:
+            self._count('hung')
+            time.sleep(65)
+            return 504, {'message': 'Gateway timeout'}
+        
+        time.sleep(latency)
+        if draw < self.hang_rate + self.error_rate:
+            self._count('failed')
+            return 500, {'message': 'Robot unavailable'}
+        if draw < self.hang_rate + self.error_rate + self.reject_rate:
+            self._count('rejected')
+            return 422, {'message': 'Rejected by queue'}
+        
+        self._count('accepted')
+        if self.callback_url:
+            threading.Timer(self.callback_delay, self._callback, (payload, succeeded)).start()
+        return 201, {'message': 'Queued', 'queue_item_id': self.counts['accepted']}
+    
+    def _callback(self, payload: dict, succeeded: bool):
+        update = {
+            'national_id': payload.get('national_id'),
+            'status': 'SUCCESS' if succeeded else 'FAILED',
+            'response_code': 200 if succeeded else 409,
+            'message': 'تم الحجز بنجاح' if succeeded else 'لا توجد قطع متاحة'
+        }
+        if payload.get('correlation_id'):
+            update['correlation_id'] = payload['correlation_id']
+        try:
+            requests.post(self.callback_url, json=update, timeout=30)
+            self._count('callbacks')
+        except requests.exceptions.RequestException:
+            pass
+    
+    def start(self) -> 'UiPathStub':
+        self._thread = threading.Thread(target=self.server.serve_forever, name='uipath-stub', daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency-ms', type=float, default=50, help='Median latency')
+    parser.add_argument('--latency-p99-ms', type=float, help='99th percentile latency (default: no spread)')
+    parser.add_argument('--reject-rate', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--hang-rate', type=float, default=0.0)
+    parser.add_argument('--callback-url', help='e.g. http://127.0.0.1:5000/api/external/update')
+    parser.add_argument('--callback-delay-ms', type=float, default=1000)
+    parser.add_argument('--success-rate', type=float, default=0.8)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    
+    stub = UiPathStub(
+        args.port, args.latency_ms, args.latency_p99_ms, args.reject_rate, args.error_rate, args.hang_rate,
+        args.callback_url, args.callback_delay_ms, args.success_rate, args.seed
+    )
+    print(f"UiPath stub listening on {stub.url}")
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        print(json.dumps(stub.counts))
+
+
+if __name__ == '__main__':
+    main()
@@ -43,15 +43,10 @@ app = create_app(env)
 with app.app_context():
     db.create_all()
     
-    # Auto-migration: Add link column if it doesn't exist
-    try:
-        from sqlalchemy import text
-        with db.engine.connect() as conn:
-            conn.execute(text('ALTER TABLE areas ADD COLUMN IF NOT EXISTS link VARCHAR(500);'))
-            conn.commit()
-            print('✅ Database schema updated (link column checked/added)')
-    except Exception as e:
-        print(f'⚠️ Schema update warning: {e}')
+    # Auto-migration: idempotent columns, functions and triggers
+    from app.schema_updates import apply_schema_updates
+    apply_schema_updates()
+    print('✅ Database schema updated')
         
     print('✅ Database tables created successfully!')
 "
@@ -0,0 +1,36 @@
+"""
+Gunicorn settings, used by Dockerfile.prod: gunicorn -c gunicorn.conf.py run:app
+
+Prometheus metrics are collected per worker process; with
+PROMETHEUS_MULTIPROC_DIR set, /metrics aggregates every worker's samples.
+"""
+import glob
+import os
+
+from prometheus_client import multiprocess
+
+# Must be set before the app (and app.utils.metrics) is imported
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/hedri-sakni-metrics')
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv('GUNICORN_WORKERS', 4))
+# Threaded workers keep long-lived event streams from occupying a whole
+# worker process
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', 16))
+timeout = 120
+accesslog = '-'
+errorlog = '-'
+
+
+def on_starting(server):
+    """Drop the samples of a previous server run"""
+    directory = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    os.makedirs(directory, exist_ok=True)
+    for path in glob.glob(os.path.join(directory, '*.db')):
+        os.remove(path)
+
+
+def child_exit(server, worker):
+    """Stop counting the live gauges of a dead worker"""
+    multiprocess.mark_process_dead(worker.pid)
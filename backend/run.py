@@ -1,6 +1,7 @@
 import os
 from app import create_app
 from app.models import db
+from app.schema_updates import apply_schema_updates
 
 # Get environment
 env = os.getenv('FLASK_ENV', 'development')
@@ -12,6 +13,7 @@ if __name__ == '__main__':
     # Create database tables if they don't exist
     with app.app_context():
         db.create_all()
+        apply_schema_updates()
     
     # Run the application
     app.run(
@@ -2,9 +2,11 @@
 """Comprehensive API testing script"""
 import requests
 import json
+import os
 from datetime import datetime, timedelta
 
 BASE_URL = "http://localhost:5000/api"
+METRICS_URL = "http://localhost:5000/metrics"
 ADMIN_USERNAME = "admin"
 ADMIN_PASSWORD = "admin123"
 
@@ -13,7 +15,7 @@ class APITester:
         self.token = None
         self.headers = {}
         self.results = []
-        
+    
     def log(self, endpoint, method, status, success, message=""):
         result = {
             "endpoint": endpoint,
@@ -219,6 +221,180 @@ class APITester:
         except Exception as e:
             self.log("/reservations", "POST", 0, False, f"Failed to create test area: {str(e)}")
     
+    def test_sync(self):
+        print("\n=== DELTA SYNC ===")
+        base = f"{BASE_URL}/customers"
+        
+        # Plain updated_since sync of each list
+        since = (datetime.utcnow() - timedelta(minutes=5)).isoformat()
+        for endpoint in ("/customers", "/reservations", "/analytics/attempts"):
+            try:
+                r = requests.get(f"{BASE_URL}{endpoint}", params={"updated_since": since}, headers=self.headers)
+                ok = r.status_code == 200 and "next_updated_since" in r.json()
+                self.log(f"{endpoint}?updated_since", "GET", r.status_code, ok)
+            except Exception as e:
+                self.log(f"{endpoint}?updated_since", "GET", 0, False, str(e))
+        
+        try:
+            r = requests.get(base, params={"cursor": "not-a-cursor"}, headers=self.headers)
+            self.log("/customers?cursor=<invalid>", "GET", r.status_code, r.status_code == 400)
+        except Exception as e:
+            self.log("/customers?cursor=<invalid>", "GET", 0, False, str(e))
+        
+        # Paging one row at a time across a delete: the deleted row must be
+        # skipped by the next page and reported by the following sync
+        area_data = {"name": f"Sync Test Area {datetime.now().timestamp()}", "is_active": True}
+        try:
+            r = requests.post(f"{BASE_URL}/areas", json=area_data, headers=self.headers)
+            area_id = r.json().get('data', {}).get('id')
+            customer_ids = []
+            for i in range(3):
+                customer_data = {
+                    "name": f"Sync Customer {i}",
+                    "phone_number": "1234567890",
+                    "national_id": f"SYNC{datetime.now().timestamp()}-{i}",
+                    "area_id": area_id
+                }
+                r = requests.post(base, json=customer_data, headers=self.headers)
+                customer_ids.append(r.json()['data']['id'])
+            
+            params = {"updated_since": since, "area_id": area_id, "limit": 1}
+            first = requests.get(base, params=params, headers=self.headers).json()
+            requests.delete(f"{base}/{customer_ids[1]}", headers=self.headers)
+            
+            seen = [row['id'] for row in first['data']]
+            page = first
+            while page.get('has_more'):
+                page = requests.get(
+                    base, params={"cursor": page['next_cursor'], "area_id": area_id, "limit": 1}, headers=self.headers
+                ).json()
+                seen += [row['id'] for row in page['data']]
+                if page['next_updated_since'] != first['next_updated_since']:
+                    break
+            ok = seen == [customer_ids[0], customer_ids[2]] and page['next_updated_since'] == first['next_updated_since']
+            self.log("/customers?cursor (pages)", "GET", 200, ok, f"ids {seen}")
+            
+            r = requests.get(
+                base, params={"updated_since": first['next_updated_since'], "area_id": area_id}, headers=self.headers
+            )
+            ok = r.status_code == 200 and customer_ids[1] in r.json().get('deleted', [])
+            self.log("/customers?updated_since (deleted)", "GET", r.status_code, ok)
+            
+            for customer_id in (customer_ids[0], customer_ids[2]):
+                requests.delete(f"{base}/{customer_id}", headers=self.headers)
+            requests.delete(f"{BASE_URL}/areas/{area_id}", headers=self.headers)
+        except Exception as e:
+            self.log("/customers?cursor (pages)", "GET", 0, False, str(e))
+    
+    def test_search(self):
+        print("\n=== CUSTOMER SEARCH ===")
+        base = f"{BASE_URL}/customers/search"
+        
+        try:
+            r = requests.get(base, params={"q": "محمد"}, headers=self.headers)
+            self.log("/customers/search", "GET", r.status_code, r.status_code == 200 and "has_more" in r.json())
+        except Exception as e:
+            self.log("/customers/search", "GET", 0, False, str(e))
+        
+        try:
+            r = requests.get(base, headers=self.headers)
+            self.log("/customers/search (no q)", "GET", r.status_code, r.status_code == 400)
+        except Exception as e:
+            self.log("/customers/search (no q)", "GET", 0, False, str(e))
+        
+        # An exact national ID ranks first, ahead of IDs it is a prefix of
+        area_data = {"name": f"Search Test Area {datetime.now().timestamp()}", "is_active": True}
+        try:
+            r = requests.post(f"{BASE_URL}/areas", json=area_data, headers=self.headers)
+            area_id = r.json().get('data', {}).get('id')
+            national_id = str(int(datetime.now().timestamp() * 1000))
+            for suffix in ["1", "2", "3", ""]:
+                customer_data = {
+                    "name": "Search Customer",
+                    "phone_number": "1234567890",
+                    "national_id": national_id + suffix,
+                    "area_id": area_id
+                }
+                requests.post(f"{BASE_URL}/customers", json=customer_data, headers=self.headers)
+            
+            r = requests.get(base, params={"q": national_id}, headers=self.headers)
+            results = r.json().get('data', []) if r.status_code == 200 else []
+            ok = len(results) == 4 and results[0]['national_id'] == national_id
+            self.log("/customers/search (exact national ID)", "GET", r.status_code, ok)
+            
+            requests.delete(f"{BASE_URL}/areas/{area_id}", headers=self.headers)
+        except Exception as e:
+            self.log("/customers/search (exact national ID)", "GET", 0, False, str(e))
+    
+    def test_dashboard(self):
+        print("\n=== DASHBOARD ===")
+        
+        try:
+            r = requests.get(f"{BASE_URL}/dashboard/bootstrap", headers=self.headers)
+            self.log("/dashboard/bootstrap", "GET", r.status_code, r.status_code == 200)
+        except Exception as e:
+            self.log("/dashboard/bootstrap", "GET", 0, False, str(e))
+    
+    def test_event_stream_token(self):
+        print("\n=== SLOT EVENT STREAM ===")
+        
+        area_data = {"name": f"Stream Test Area {datetime.now().timestamp()}", "is_active": True}
+        try:
+            r = requests.post(f"{BASE_URL}/areas", json=area_data, headers=self.headers)
+            area_id = r.json().get('data', {}).get('id')
+            slot_data = {
+                "area_id": area_id,
+                "scheduled_datetime": (datetime.utcnow() + timedelta(hours=1)).isoformat()
+            }
+            slot_id = requests.post(f"{BASE_URL}/reservations", json=slot_data, headers=self.headers).json()['data']['id']
+            events = f"{BASE_URL}/reservations/{slot_id}/events"
+            
+            r = requests.post(f"{events}/token", headers=self.headers)
+            self.log(f"/reservations/{slot_id}/events/token", "POST", r.status_code, r.status_code == 200)
+            stream_token = r.json().get('token')
+            
+            # Admin tokens are refused in the URL, stream tokens accepted
+            r = requests.get(events, params={"token": self.token}, stream=True)
+            self.log(f"/reservations/{slot_id}/events (admin)", "GET", r.status_code, r.status_code == 401)
+            r.close()
+            r = requests.get(events, params={"token": stream_token}, stream=True)
+            self.log(f"/reservations/{slot_id}/events", "GET", r.status_code, r.status_code == 200)
+            r.close()
+            
+            requests.delete(f"{BASE_URL}/reservations/{slot_id}", headers=self.headers)
+            requests.delete(f"{BASE_URL}/areas/{area_id}", headers=self.headers)
+        except Exception as e:
+            self.log("/reservations/<id>/events", "GET", 0, False, str(e))
+    
+    def test_admin(self):
+        print("\n=== ADMIN ===")
+        
+        for endpoint in ("/admin/db-pools", "/admin/profiles", "/admin/slow-queries"):
+            try:
+                r = requests.get(f"{BASE_URL}{endpoint}", headers=self.headers)
+                self.log(endpoint, "GET", r.status_code, r.status_code == 200)
+            except Exception as e:
+                self.log(endpoint, "GET", 0, False, str(e))
+        
+        try:
+            r = requests.get(f"{BASE_URL}/admin/db-pools")
+            self.log("/admin/db-pools (no auth)", "GET", r.status_code, r.status_code == 401)
+        except Exception as e:
+            self.log("/admin/db-pools (no auth)", "GET", 0, False, str(e))
+    
+    def test_metrics(self):
+        print("\n=== METRICS ===")
+        
+        headers = {}
+        if os.getenv('METRICS_TOKEN'):
+            headers["Authorization"] = f"Bearer {os.getenv('METRICS_TOKEN')}"
+        try:
+            r = requests.get(METRICS_URL, headers=headers)
+            ok = r.status_code == 200 and "http_request" in r.text
+            self.log("/metrics", "GET", r.status_code, ok)
+        except Exception as e:
+            self.log("/metrics", "GET", 0, False, str(e))
+    
     def test_analytics(self):
         print("\n=== ANALYTICS ===")
         
@@ -275,8 +451,14 @@ def main():
     tester.test_areas()
     tester.test_customers()
     tester.test_reservations()
+    tester.test_sync()
+    tester.test_search()
+    tester.test_dashboard()
+    tester.test_event_stream_token()
     tester.test_analytics()
     tester.test_external()
+    tester.test_admin()
+    tester.test_metrics()
     
     tester.print_summary()
 
@@ -1,6 +1,7 @@
 import requests
 import json
 import sys
+from datetime import datetime, timedelta
 
 BASE_URL = "http://localhost:5000/api"
 ADMIN_USERNAME = "admin"
@@ -90,5 +91,32 @@ def test_api():
             print(f"   FAILED: Delete Area failed with status {response.status_code}")
             print(response.text)
 
+    print("\n6. Testing Customers Delta Sync...")
+    customers_url = f"{BASE_URL}/customers"
+    since = (datetime.utcnow() - timedelta(days=1)).isoformat()
+    response = requests.get(customers_url, params={"updated_since": since, "limit": 1}, headers=headers)
+    if response.status_code == 200:
+        page = response.json()
+        print(f"   SUCCESS: {len(page['data'])} changed, {len(page['deleted'])} deleted, has_more={page['has_more']}")
+        if page['has_more']:
+            response = requests.get(customers_url, params={"cursor": page['next_cursor'], "limit": 1}, headers=headers)
+            if response.status_code == 200:
+                print(f"   SUCCESS: Retrieved next page.")
+            else:
+                print(f"   FAILED: Next page failed with status {response.status_code}")
+                print(response.text)
+    else:
+        print(f"   FAILED: Delta sync failed with status {response.status_code}")
+        print(response.text)
+
+    print("\n7. Testing Dashboard Bootstrap...")
+    response = requests.get(f"{BASE_URL}/dashboard/bootstrap", headers=headers)
+    if response.status_code == 200:
+        print(f"   SUCCESS: Retrieved dashboard data.")
+    else:
+        print(f"   FAILED: Dashboard bootstrap failed with status {response.status_code}")
+        print(response.text)
+
+
 if __name__ == "__main__":
     test_api()
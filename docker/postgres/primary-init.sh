@@ -0,0 +1,5 @@
+#!/bin/sh
+# Runs once, when the postgres volume is initialized: lets the
+# postgres-replica service stream WAL from this server
+set -e
+echo "host replication all all scram-sha-256" >> "$PGDATA/pg_hba.conf"
@@ -0,0 +1,15 @@
+#!/bin/sh
+# Hot standby of the compose "postgres" service, for trying read replica
+# routing locally. The first start clones the primary with pg_basebackup;
+# -R writes the primary_conninfo and standby.signal that keep it streaming.
+set -e
+
+if [ ! -s "$PGDATA/PG_VERSION" ]; then
+    until pg_basebackup -h postgres -U "$POSTGRES_USER" -D "$PGDATA" -R -X stream; do
+        echo "Waiting for the primary..."
+        sleep 2
+    done
+    chmod 700 "$PGDATA"
+fi
+
+exec postgres
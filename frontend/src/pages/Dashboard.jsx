@@ -1,12 +1,13 @@
 import { useQuery } from '@tanstack/react-query';
-import { analyticsAPI } from '../services/api';
+import { dashboardAPI } from '../services/api';
 import './Dashboard.css';
 
 export default function Dashboard() {
-    const { data: summary, isLoading } = useQuery({
-        queryKey: ['analytics-summary'],
-        queryFn: () => analyticsAPI.getSummary().then(res => res.data.data)
+    const { data: bootstrap, isLoading } = useQuery({
+        queryKey: ['dashboard-bootstrap'],
+        queryFn: () => dashboardAPI.getBootstrap().then(res => res.data.data)
     });
+    const summary = bootstrap?.summary;
 
     if (isLoading) {
         return (
@@ -55,6 +55,7 @@ export const areasAPI = {
 // Customers API
 export const customersAPI = {
     getAll: (params) => api.get('/customers', { params }),
+    search: (params) => api.get('/customers/search', { params }),
     getById: (id) => api.get(`/customers/${id}`),
     create: (data) => api.post('/customers', data),
     update: (id, data) => api.put(`/customers/${id}`, data),
@@ -77,4 +78,9 @@ export const analyticsAPI = {
     getAttemptById: (id) => api.get(`/analytics/attempts/${id}`),
 };
 
+// Dashboard API
+export const dashboardAPI = {
+    getBootstrap: () => api.get('/dashboard/bootstrap'),
+};
+
 export default api;